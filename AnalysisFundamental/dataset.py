@@ -0,0 +1,47 @@
+"""
+The monthly (ticker, date) dataset of the fundamentals model: prices, fundamentals and the buy target.
+"""
+from pathlib import Path
+
+import pandas as pd
+
+
+DATASET_PATH = Path(__file__).resolve().parent / "data" / "dataset.csv"
+
+# the model's features, see lightgbm.py
+FEATURES = [
+    "price_rate_of_change_1M",
+    "price_rate_of_change_3M",
+    "epsDil",
+    "return_on_assets",
+    "return_on_equity",
+    "price_to_earnings_ratio",
+    "debt_to_equity_ratio",
+]
+
+
+def load_dataset(path=DATASET_PATH) -> pd.DataFrame:
+    """
+    Read the dataset CSV (ticker, date, adjOpen, adjClose and the features) indexed by (ticker, date).
+    """
+    return pd.read_csv(path, parse_dates=["date"]).set_index(["ticker", "date"])
+
+
+def prepare_dataset(df: pd.DataFrame, features: list = FEATURES, threshold: float = 0.05) -> pd.DataFrame:
+    """
+    Add the monthly return and the buy target, and lag the features by one period.
+
+    Parameters:
+    df (pd.DataFrame): The dataset indexed by (ticker, date), see load_dataset.
+    features (list): The feature columns, shifted by one period per ticker so that a month is predicted
+    from the values known at its start.
+    threshold (float): Return within the month from which a month is labelled as a buy (0.05 = 5%).
+
+    Returns:
+    pd.DataFrame: A copy of df with 'return_month' and 'target' added.
+    """
+    df = df.sort_index().copy()
+    df["return_month"] = (df["adjClose"] / df["adjOpen"]) - 1
+    df["target"] = df["return_month"] >= threshold
+    df[features] = df.groupby("ticker")[features].shift(1)
+    return df
@@ -0,0 +1,191 @@
+"""
+Evaluation of many portfolio strategies on the model's scores at once.
+
+A strategy buys, on each date, the tickers whose score passes a threshold or the k best scored ones, with
+equal weights or weights proportional to the score. The tickers of each date are sorted by score once and
+their returns accumulated along that order; every strategy's holdings are then a prefix of the sorted
+tickers, so its return on a date is one lookup in the cumulative sums. Sweeping hundreds of strategies
+costs about the same as evaluating one.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+
+Strategy = namedtuple("Strategy", ["name", "kind", "value", "weighting"])
+
+KINDS = ("threshold", "top_k")
+WEIGHTINGS = ("equal", "score")
+
+
+def strategy_grid(thresholds=(), top_k=(), weightings=("equal",)) -> list:
+    """
+    Every combination of selection rule and weighting.
+
+    Parameters:
+    thresholds (iterable): Scores from which a ticker is bought, e.g. np.arange(0.5, 0.9, 0.01).
+    top_k (iterable): Numbers of best scored tickers bought on each date.
+    weightings (iterable): "equal" weights, or "score" for weights proportional to the score.
+
+    Returns:
+    list: One Strategy (name, kind, value, weighting) per combination.
+    """
+    strategies = []
+    for weighting in weightings:
+        if weighting not in WEIGHTINGS:
+            raise ValueError(f"Unknown weighting: {weighting}")
+        strategies += [Strategy(f"threshold={value:g}/{weighting}", "threshold", float(value), weighting) for value in thresholds]
+        strategies += [Strategy(f"top{int(value)}/{weighting}", "top_k", int(value), weighting) for value in top_k]
+    return strategies
+
+
+def score_matrix(predictions: pd.DataFrame, score: str = "probability", returns: str = "return_month") -> tuple:
+    """
+    The scores and returns of the predictions as (date x ticker) matrices.
+
+    Parameters:
+    predictions (pd.DataFrame): Rows indexed by (ticker, date), see AnalysisFundamental.walk_forward.walk_forward.
+    score (str): The column with the score of each row.
+    returns (str): The column with the return of each row's period.
+
+    Returns:
+    tuple: The scores and the returns, each with one row per date and one column per ticker; NaN where a
+    ticker has no prediction.
+    """
+    wide = predictions[[score, returns]].unstack("ticker").sort_index()
+    return wide[score], wide[returns]
+
+
+def strategy_returns(scores: pd.DataFrame, returns: pd.DataFrame, strategies: list) -> tuple:
+    """
+    The portfolio return of every strategy on every date.
+
+    Parameters:
+    scores (pd.DataFrame): Scores with one row per date and one column per ticker, see score_matrix.
+    returns (pd.DataFrame): Returns of the same shape. Tickers without a score or a return are never bought.
+    strategies (list): The strategies, see strategy_grid.
+
+    Returns:
+    tuple: The (strategy x date) returns, NaN on dates where a strategy holds nothing, and the
+    (strategy x date) numbers of tickers held.
+    """
+    score_values = scores.to_numpy(dtype=float)
+    return_values = returns.reindex_like(scores).to_numpy(dtype=float)
+    valid = ~np.isnan(score_values) & ~np.isnan(return_values)
+    n_dates = len(scores)
+
+    # tickers of each date by descending score, invalid ones last
+    order = np.argsort(np.where(valid, -score_values, np.inf), axis=1, kind="stable")
+    sorted_valid = np.take_along_axis(valid, order, axis=1)
+    sorted_scores = np.where(sorted_valid, np.take_along_axis(score_values, order, axis=1), 0.0)
+    sorted_returns = np.where(sorted_valid, np.take_along_axis(return_values, order, axis=1), 0.0)
+
+    # cumulative sums of the first j tickers in column j
+    def prefix_sums(values):
+        return np.concatenate([np.zeros((n_dates, 1)), np.cumsum(values, axis=1)], axis=1)
+
+    sum_returns = prefix_sums(sorted_returns)
+    sum_weighted = prefix_sums(sorted_scores * sorted_returns)
+    sum_scores = prefix_sums(sorted_scores)
+
+    # number of tickers held by each strategy on each date
+    held = np.zeros((len(strategies), n_dates), dtype=np.int64)
+    kinds = np.array([strategy.kind for strategy in strategies])
+    values = np.array([strategy.value for strategy in strategies], dtype=float)
+    if not np.isin(kinds, KINDS).all():
+        raise ValueError(f"Unknown strategy kinds: {set(kinds) - set(KINDS)}")
+    top_k = kinds == "top_k"
+    held[top_k] = np.minimum(values[top_k, None].astype(np.int64), sorted_valid.sum(axis=1)[None, :])
+    threshold = ~top_k
+    if threshold.any():
+        # the tickers scored at or above each threshold, for all dates in one search: a score is replaced by
+        # the number of thresholds above it, and each date's values are offset past the previous date's, so
+        # the rows of sorted scores form one sorted array
+        descending = np.where(sorted_valid, -sorted_scores, np.inf)
+        bounds = np.unique(-values[threshold])
+        offsets = np.arange(n_dates)[:, None] * (len(bounds) + 1)
+        keys = (np.searchsorted(bounds, descending) + offsets).ravel()
+        found = np.searchsorted(keys, np.arange(len(bounds))[None, :] + offsets, side="right")
+        counts = found - np.arange(n_dates)[:, None] * descending.shape[1]
+        held[threshold] = counts[:, np.searchsorted(bounds, -values[threshold])].T
+
+    dates = np.arange(n_dates)[None, :]
+    score_weighted = np.array([strategy.weighting == "score" for strategy in strategies])[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        equal_returns = sum_returns[dates, held] / held
+        score_returns = sum_weighted[dates, held] / sum_scores[dates, held]
+    portfolio = np.where(held > 0, np.where(score_weighted, score_returns, equal_returns), np.nan)
+
+    names = pd.Index([strategy.name for strategy in strategies], name="strategy")
+    return (pd.DataFrame(portfolio, index=names, columns=scores.index),
+            pd.DataFrame(held, index=names, columns=scores.index))
+
+
+def performance(returns, annualize: int = 12, rf: float = 0) -> pd.DataFrame:
+    """
+    Performance of every strategy from its period returns, computed for all strategies at once.
+
+    Parameters:
+    returns (pd.DataFrame or pd.Series): The (strategy x date) returns, see strategy_returns, or the returns
+    of a single strategy. NaN periods hold cash: they are left out of the Sharpe ratio and hit rate and
+    return nothing.
+    annualize (int): Periods per year for annualization (252 daily, 12 monthly, 4 quarterly).
+    rf (float): Risk-free rate per period.
+
+    Returns:
+    pd.DataFrame: One row per strategy with the annualized Sharpe ratio, the cumulative return, the
+    maximum drawdown, the hit rate (share of invested periods with a positive return) and the share of
+    periods invested.
+    """
+    if isinstance(returns, pd.Series):
+        returns = returns.to_frame().T
+    values = returns.to_numpy(dtype=float)
+    invested = ~np.isnan(values)
+    periods = invested.sum(axis=1)
+    filled = np.where(invested, values, 0.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = filled.sum(axis=1) / periods
+        std = np.sqrt((np.where(invested, values - mean[:, None], 0.0) ** 2).sum(axis=1) / (periods - 1))
+        sharpe = (mean - rf) / std * np.sqrt(annualize)
+        hit_rate = (filled > 0).sum(axis=1) / periods
+
+    wealth = np.cumprod(1 + filled, axis=1)
+    # the drawdown from the highest wealth so far, starting from 1
+    peak = np.maximum(np.maximum.accumulate(wealth, axis=1), 1)
+    return pd.DataFrame({
+        "sharpe": sharpe,
+        "cumulative_return": wealth[:, -1] - 1 if values.shape[1] else np.zeros(len(values)),
+        "max_drawdown": (wealth / peak - 1).min(axis=1, initial=0),
+        "hit_rate": hit_rate,
+        "invested": periods / max(values.shape[1], 1),
+    }, index=returns.index)
+
+
+def evaluate(predictions: pd.DataFrame, strategies: list, score: str = "probability", returns: str = "return_month",
+             annualize: int = 12, rf: float = 0) -> tuple:
+    """
+    Evaluate many strategies on the predictions of a model.
+
+    Parameters:
+    predictions (pd.DataFrame): Rows indexed by (ticker, date) with a score and a return column, see
+    AnalysisFundamental.walk_forward.walk_forward.
+    strategies (list): The strategies, see strategy_grid.
+    score, returns (str): The score and return columns.
+    annualize, rf: See performance.
+
+    Returns:
+    tuple: The performance of each strategy with its mean number of holdings, see performance, and the
+    (strategy x date) returns.
+
+    Example:
+    >>> strategies = strategy_grid(thresholds=np.arange(0.5, 0.8, 0.01), top_k=[10, 20, 50], weightings=["equal", "score"])
+    >>> metrics, portfolio = evaluate(predictions, strategies)
+    >>> metrics.sort_values("sharpe", ascending=False).head()
+    """
+    scores, period_returns = score_matrix(predictions, score, returns)
+    portfolio, held = strategy_returns(scores, period_returns, strategies)
+    metrics = performance(portfolio, annualize, rf)
+    metrics["mean_holdings"] = held.where(held > 0).mean(axis=1)
+    return metrics, portfolio
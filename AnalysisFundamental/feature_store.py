@@ -0,0 +1,281 @@
+"""
+Persistent store of lagged and derived features of the monthly (ticker, date) dataset.
+
+Each version of the store is a directory (v1, v2...) with one .npy file per column (float64 raw columns,
+float32 derived features and boolean targets) with rows sorted by ticker and date, and sidecars:
+tickers.json (the ticker of each code in ticker.npy) and meta.json (the feature specification and the
+columns). The CURRENT file names the current version. Columns are memory-mapped when read, so serving a
+few columns of a few tickers only touches those pages. New months are merged in with update(): only the
+last rows of each ticker, the ones whose lags or windows reach the new data, are derived again.
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from AnalysisFundamental.dataset import FEATURES
+
+
+DEFAULT_FEATURE_DIR = Path(__file__).resolve().parent / "data" / "features"
+PRICE_COLUMNS = ["adjOpen", "adjClose"]
+DEFAULT_SPEC = {
+    "features": FEATURES,
+    "lags": [1, 2, 3],
+    "roc_windows": [1, 3, 6, 12],
+    "thresholds": [0.0, 0.05, 0.1],
+}
+
+
+def lag_name(feature: str, lag: int) -> str:
+    return f"{feature}_lag{lag}"
+
+
+def roc_name(window: int) -> str:
+    return f"roc_{window}M"
+
+
+def target_name(threshold: float) -> str:
+    return f"target_{threshold:g}"
+
+
+def derive_features(raw: pd.DataFrame, spec: dict = DEFAULT_SPEC) -> pd.DataFrame:
+    """
+    Derive the stored columns from the raw dataset.
+
+    Parameters:
+    raw (pd.DataFrame): Rows sorted by ticker and date with a 'ticker' column, the prices and the features.
+    spec (dict): The lags of the features, the windows of the price rate of change (in months, of the
+    close before the month) and the return thresholds of the targets, see DEFAULT_SPEC.
+
+    Returns:
+    pd.DataFrame: return_month, one target per threshold, one column per feature and lag, one rate of
+    change per window; aligned with raw.
+    """
+    grouped = raw.groupby("ticker", sort=False)
+    derived = {"return_month": raw["adjClose"] / raw["adjOpen"] - 1}
+    for threshold in spec["thresholds"]:
+        derived[target_name(threshold)] = derived["return_month"] >= threshold
+    for lag in spec["lags"]:
+        shifted = grouped[spec["features"]].shift(lag)
+        for feature in spec["features"]:
+            derived[lag_name(feature, lag)] = shifted[feature]
+    previous_close = grouped["adjClose"].shift(1)
+    for window in spec["roc_windows"]:
+        derived[roc_name(window)] = previous_close / previous_close.groupby(raw["ticker"], sort=False).shift(window) - 1
+    return pd.DataFrame(derived, index=raw.index)
+
+
+def _context(spec: dict) -> int:
+    # rows of history needed to derive a row
+    return max(spec["lags"] + [window + 1 for window in spec["roc_windows"]] + [0])
+
+
+class FeatureStore:
+    """
+    Columnar on-disk store of the (ticker, date) dataset with its lagged and derived features.
+
+    Parameters:
+    path (str or Path): Directory of the store, AnalysisFundamental/data/features by default.
+
+    Example:
+    >>> store = FeatureStore()
+    >>> store.update(load_dataset())
+    >>> df = store.model_frame(FEATURES, threshold=0.05)  # like prepare_dataset(load_dataset())
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path or DEFAULT_FEATURE_DIR)
+        self._maps = {}
+
+    def exists(self) -> bool:
+        return (self.path / "CURRENT").exists()
+
+    def _snapshot(self) -> dict:
+        # the sidecars and column maps of the current version; a reader keeps using the version it
+        # started with, which stays on disk until the update after the next one
+        directory = self.path / (self.path / "CURRENT").read_text().strip()
+        if self._maps.get("directory") != directory:
+            with open(directory / "meta.json") as f:
+                meta = json.load(f)
+            with open(directory / "tickers.json") as f:
+                tickers = json.load(f)
+            self._maps = {"directory": directory, "meta": meta, "tickers": tickers, "columns": {}}
+        return self._maps
+
+    @property
+    def meta(self) -> dict:
+        return self._snapshot()["meta"]
+
+    @property
+    def tickers(self) -> list:
+        return self._snapshot()["tickers"]
+
+    def columns(self) -> list:
+        return self.meta["columns"]
+
+    def _column(self, name: str, snapshot: dict = None) -> np.ndarray:
+        snapshot = snapshot or self._snapshot()
+        if name not in snapshot["columns"]:
+            snapshot["columns"][name] = np.load(snapshot["directory"] / f"{name}.npy", mmap_mode="r")
+        return snapshot["columns"][name]
+
+    def _rows(self, tickers: list = None, snapshot: dict = None) -> np.ndarray:
+        # rows of some tickers; each ticker is one contiguous run of rows
+        snapshot = snapshot or self._snapshot()
+        codes = self._column("ticker", snapshot)
+        if tickers is None:
+            return np.arange(len(codes))
+        positions = {ticker: code for code, ticker in enumerate(snapshot["tickers"])}
+        wanted = np.array(sorted(positions[ticker] for ticker in tickers if ticker in positions), dtype=codes.dtype)
+        starts, stops = np.searchsorted(codes, wanted, side="left"), np.searchsorted(codes, wanted, side="right")
+        return np.concatenate([np.arange(start, stop) for start, stop in zip(starts, stops)] + [np.array([], dtype=int)])
+
+    def values(self, columns: list, tickers: list = None, start=None, end=None) -> tuple:
+        """
+        Read columns as NumPy arrays, memory-mapped views when all rows of a ticker range are selected.
+
+        Returns:
+        tuple: A dict of arrays per column, and the ticker codes and dates of the rows.
+        """
+        snapshot = self._snapshot()
+        rows = self._rows(tickers, snapshot)
+        dates = self._column("date", snapshot)[rows]
+        keep = np.ones(len(rows), dtype=bool)
+        if start is not None:
+            keep &= dates >= np.datetime64(pd.Timestamp(start))
+        if end is not None:
+            keep &= dates <= np.datetime64(pd.Timestamp(end))
+        rows = rows[keep]
+        if len(rows) and rows[-1] - rows[0] + 1 == len(rows):
+            # contiguous rows: slices are views of the mapped files
+            selection = slice(rows[0], rows[-1] + 1)
+        else:
+            selection = rows
+        arrays = {column: self._column(column, snapshot)[selection] for column in columns}
+        return arrays, self._column("ticker", snapshot)[selection], self._column("date", snapshot)[selection]
+
+    def read(self, columns: list = None, tickers: list = None, start=None, end=None) -> pd.DataFrame:
+        """
+        Read some columns of some tickers and dates, indexed by (ticker, date).
+
+        Parameters:
+        columns (list): The columns to read, all by default (see columns()).
+        tickers (list): The tickers to read, all by default.
+        start, end: Date range, both inclusive. None reads all dates.
+        """
+        snapshot = self._snapshot()
+        columns = snapshot["meta"]["columns"] if columns is None else list(columns)
+        arrays, codes, dates = self.values(columns, tickers, start, end)
+        index = pd.MultiIndex.from_arrays(
+            [pd.Categorical.from_codes(np.asarray(codes), categories=snapshot["tickers"]), pd.DatetimeIndex(np.asarray(dates))],
+            names=["ticker", "date"],
+        )
+        return pd.DataFrame({column: np.asarray(arrays[column]) for column in columns}, index=index)
+
+    def model_frame(self, features: list = FEATURES, lag: int = 1, threshold: float = 0.05, **kwargs) -> pd.DataFrame:
+        """
+        The model's input: the features lagged by `lag` under their own names, 'return_month' and 'target'.
+
+        With the defaults this is AnalysisFundamental.dataset.prepare_dataset of the stored rows.
+        Other arguments select tickers and dates, see read.
+        """
+        columns = [lag_name(feature, lag) for feature in features] + ["return_month", target_name(threshold)]
+        frame = self.read(columns, **kwargs)
+        return frame.set_axis(list(features) + ["return_month", "target"], axis=1)
+
+    def update(self, df: pd.DataFrame, spec: dict = None) -> int:
+        """
+        Merge new or revised rows into the store and derive their features.
+
+        Rows of the store keep their derived values unless their lags or windows reach a new row; only
+        those tail rows of each ticker are derived again, the others are copied column by column from the
+        current version. The update is written to a new version directory and the CURRENT file is then
+        replaced to point to it, so readers never see a partial update.
+
+        Parameters:
+        df (pd.DataFrame): Rows indexed by (ticker, date) with the prices and features, see
+        AnalysisFundamental.dataset.load_dataset. Rows already stored are replaced.
+        spec (dict): The feature specification of a new store, DEFAULT_SPEC by default. An existing store
+        keeps its own.
+
+        Returns:
+        int: The number of rows derived.
+        """
+        existing = self.exists()
+        snapshot = self._snapshot() if existing else None
+        spec = snapshot["meta"]["spec"] if existing else dict(spec or DEFAULT_SPEC)
+        raw_columns = PRICE_COLUMNS + spec["features"]
+        new = df.reset_index()[["ticker", "date"] + raw_columns]
+        new["date"] = pd.to_datetime(new.date).astype("datetime64[ns]")
+        new["ticker"] = new.ticker.astype(str)
+
+        # the keys of the merged rows, with the row each comes from in the store or in df
+        keys = new[["ticker", "date"]].assign(_old_row=-1, _new_row=np.arange(len(new)))
+        if existing:
+            old = pd.DataFrame({
+                "ticker": np.array(snapshot["tickers"], dtype=object)[self._column("ticker", snapshot)],
+                "date": np.asarray(self._column("date", snapshot)),
+            })
+            old["_old_row"], old["_new_row"] = np.arange(len(old)), -1
+            replaced = pd.MultiIndex.from_frame(old[["ticker", "date"]]).isin(pd.MultiIndex.from_frame(keys[["ticker", "date"]]))
+            keys = pd.concat([old.loc[~replaced], keys], ignore_index=True)
+        combined = keys.sort_values(["ticker", "date"], kind="stable").reset_index(drop=True)
+        old_rows = combined["_old_row"].to_numpy(dtype=np.int64)
+        new_rows = combined["_new_row"].to_numpy(dtype=np.int64)
+        from_old = old_rows >= 0
+
+        # rows at or after a ticker's first new row, and the history their lags and windows need
+        position = combined.groupby("ticker", sort=False).cumcount().to_numpy()
+        first_new = pd.Series(np.where(~from_old, position, np.iinfo(np.int64).max)).groupby(combined["ticker"].to_numpy()).transform("min").to_numpy()
+        stale = position >= first_new
+        needed = position >= first_new - _context(spec)
+
+        tickers = sorted(combined.ticker.unique())
+        version = (snapshot["meta"]["version"] + 1) if existing else 1
+        directory = self.path / f"v{version}"
+        shutil.rmtree(directory, ignore_errors=True)
+        directory.mkdir(parents=True)
+        np.save(directory / "ticker.npy", pd.Categorical(combined.ticker, categories=tickers).codes.astype(np.int32))
+        np.save(directory / "date.npy", combined.date.to_numpy(dtype="datetime64[ns]"))
+
+        # raw columns stay exact, as tail rows are derived again from them on updates
+        subset = combined.loc[needed, ["ticker", "date"]]
+        for column in raw_columns:
+            array = np.empty(len(combined), dtype=np.float64)
+            array[~from_old] = new[column].to_numpy(dtype=np.float64)[new_rows[~from_old]]
+            if from_old.any():
+                array[from_old] = self._column(column, snapshot)[old_rows[from_old]]
+            np.save(directory / f"{column}.npy", array)
+            subset[column] = array[needed]
+        derived = derive_features(subset, spec).loc[stale[needed]]
+        columns = list(derived.columns)
+
+        kept = ~stale
+        for column in columns:
+            dtype = bool if column.startswith("target_") else np.float32
+            array = np.empty(len(combined), dtype=dtype)
+            array[stale] = derived[column].to_numpy(dtype=dtype)
+            if kept.any():
+                array[kept] = self._column(column, snapshot)[old_rows[kept]]
+            np.save(directory / f"{column}.npy", array)
+
+        meta = {"spec": spec, "columns": raw_columns + columns, "version": version}
+        self._publish(directory, tickers, meta)
+        return int(stale.sum())
+
+    def _publish(self, directory: Path, tickers: list, meta: dict):
+        with open(directory / "tickers.json", "w") as f:
+            json.dump(tickers, f)
+        with open(directory / "meta.json", "w") as f:
+            json.dump(meta, f)
+        # the switch to the new version is the atomic replacement of the CURRENT file
+        temporary = self.path / "CURRENT.tmp"
+        temporary.write_text(directory.name)
+        os.replace(temporary, self.path / "CURRENT")
+        # keep the previous version for readers that started before the switch
+        for previous in self.path.glob("v*"):
+            if previous.is_dir() and previous.name[1:].isdigit() and int(previous.name[1:]) < meta["version"] - 1:
+                shutil.rmtree(previous, ignore_errors=True)
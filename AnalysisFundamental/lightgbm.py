@@ -1,42 +1,32 @@
 """
 Source: https://medium.com/@Batmaxx/using-machine-learning-and-company-fundamentals-for-beating-the-stock-market-fa2d4ac438a7
 
+Run from the repository root with `python -m AnalysisFundamental.lightgbm`; run from this directory, the
+script would shadow the lightgbm package.
 """
 # best so far!
 
 
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))) # add parent dir - for AnalysisFundamental
 import pandas as pd
 
-# read dataset
-df = pd.read_csv("data\dataset.csv", parse_dates=["date"])
+from AnalysisFundamental.dataset import DATASET_PATH, FEATURES, load_dataset, prepare_dataset
+from AnalysisFundamental.walk_forward import walk_forward
 
-# format index
-df = df.set_index(["ticker", "date"])
+# read dataset, indexed by (ticker, date)
+df = load_dataset()
 
 
 # if the price increases by more than x%, we label it as "True" or "Buy"
 threshold = 0.05  # 5%
 
-# calculate the return within the month
-df["return_month"] = (df["adjClose"] / df["adjOpen"]) - 1
-
-# create the target
-df["target"] = df["return_month"] >= threshold
-
-
 # list of features
-features = [
-    "price_rate_of_change_1M",
-    "price_rate_of_change_3M",
-    "epsDil",
-    "return_on_assets",
-    "return_on_equity",
-    "price_to_earnings_ratio",
-    "debt_to_equity_ratio",
-]
+features = FEATURES
 
-# shift the value of the features by one period (make sure to use groupby!)
-df[features] = df.groupby("ticker")[features].shift(1)
+# add the monthly return and the target, and shift the value of the features by one period per ticker
+df = prepare_dataset(df, features, threshold)
 
 
 
@@ -49,16 +39,9 @@ profile.to_notebook_iframe()
 
 split_date = 2020
 
-df_train = df.loc[df.index.get_level_values("date").year < split_date]
-df_test = df.loc[df.index.get_level_values("date").year == split_date]
-
-
-
-from lightgbm import LGBMClassifier
-# Note: Any model can be used here
-
-# define classifier
-estimator = LGBMClassifier(
+# parameters of the LGBMClassifier; to search them instead, see AnalysisFundamental.tuning.HyperparameterSearch,
+# e.g. params.update(search.best()) after a search on the same split_date
+params = dict(
     is_unbalance=True,
     max_depth=4,
     num_leaves=8,
@@ -66,12 +49,9 @@ estimator = LGBMClassifier(
     n_estimators=50,
 )
 
-# fit classifier on training data
-estimator.fit(df_train[features], df_train["target"])
-
-
-# make prediction using test data
-df_test["buy"] = estimator.predict(df_test[features])
+# train on the years before split_date and test on split_date; drop `end` (or use freq="M") to walk
+# forward through every later period, one model per period trained in parallel
+df_test, df_results = walk_forward(df, features, freq="Y", start=split_date, end=split_date, params=params)
 
 
 from sklearn.metrics import classification_report
@@ -79,40 +59,41 @@ from sklearn.metrics import classification_report
 print(classification_report(df_test["target"], df_test["buy"]))
 
 
-# select only the stocks that were picked by the model
-df_buy = df_test.loc[df_test["buy"] == True][["return_month", "target", "buy"]]
-
-
-df_results = (
-    df_buy.reset_index()
-    .groupby("date")
-    .agg({"ticker": "count", "return_month": "mean"})
-)
-
+from lightgbm import LGBMClassifier
+from AnalysisFundamental.registry import ModelRegistry
+
+# to score new months without retraining, set registry_path to a registry directory (e.g.
+# "AnalysisFundamental/data/models"): the model is then trained on every year up to split_date and saved
+# there, for python -m AnalysisFundamental.scoring lightgbm_fundamentals --registry <registry_path>
+registry_path = None
+
+if registry_path:
+    # the last month of each ticker has no return yet, and so no target
+    df_train = df[(df.index.get_level_values("date").year <= split_date) & df["return_month"].notna()]
+    model = LGBMClassifier(**params).fit(df_train[features].to_numpy(dtype="float32"), df_train["target"])
+    version = ModelRegistry(registry_path).save("lightgbm_fundamentals", model, features, metadata={
+        "params": params,
+        "threshold": threshold,
+        "lag": 1,
+        "train_end": str(df_train.index.get_level_values("date").max().date()),
+        "rows": len(df_train),
+    })
+    print(f"Saved lightgbm_fundamentals version {version} to {registry_path}")
+
+
+# the stocks picked by the model, their count and mean return per month
 df_results.describe()
 
 
-import numpy as np
-
-def sharpe(s_return: pd.Series, annualize: int, rf: float = 0) -> float:
-    """
-    Calculate sharpe ratio
-
-    :param s_return: pd.Series with return
-    :param annualize: int periods to use for annualization (252 daily, 12 monthly, 4 quarterly)
-    :param rf: float risk-free rate
-    :return: float sharpe ratio
-    """
-    # (mean - rf) / std
-    sharpe_ratio = (s_return.mean() - rf) / s_return.std()
-
-    # annualize
-    sharpe_ratio = sharpe_ratio * np.sqrt(annualize)
-
-    return sharpe_ratio
+from AnalysisFundamental.evaluation import evaluate, performance, strategy_grid
 
+# the model's strategy (buy when the probability is at least 0.5, equal weights) next to other thresholds,
+# top-k portfolios and score weighting, all evaluated at once
+strategies = strategy_grid(thresholds=[0.5, 0.55, 0.6], top_k=[10, 50], weightings=["equal", "score"])
+df_metrics, df_strategies = evaluate(df_test, strategies, annualize=12)
+print(df_metrics.sort_values("sharpe", ascending=False))
 
-sharpe_ratio = sharpe(df_results["return_month"], annualize=12)
+sharpe_ratio = df_metrics.loc["threshold=0.5/equal", "sharpe"]
 print(f"Sharpe ratio: {round(sharpe_ratio, 2)}")
 # Sharpe ratio: 1.16
 
@@ -133,10 +114,10 @@ fig.show()
 
 
 # load the historical price DIA (benchmark strategy)
-df_benchmark = pd.read_csv("data/prices_DIA.csv")
+df_benchmark = pd.read_csv(DATASET_PATH.parent / "prices_DIA.csv")
 
 
-sharpe_ratio_benchmark = sharpe(df_benchmark["return_month"], annualize=12)
+sharpe_ratio_benchmark = performance(df_benchmark["return_month"], annualize=12)["sharpe"].iloc[0]
 print(f"Sharpe ratio benchmark: {round(sharpe_ratio_benchmark, 2)}")
 
 
@@ -0,0 +1,164 @@
+"""
+Local registry of trained models.
+
+Each model is saved under <registry>/<name>/<version>/ as model.joblib (the estimator and its scaler) and
+meta.json (the feature list and the training metadata), so a model can be scored again later without
+retraining it. Versions are numbered from 1; a version is written to a temporary directory and renamed
+into place, so a partially saved model is never loaded.
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_REGISTRY_DIR = Path(__file__).resolve().parent / "data" / "models"
+
+
+class RegisteredModel:
+    """
+    A trained estimator with the features it expects and the scaler fitted on its training data.
+
+    Parameters:
+    estimator: The fitted scikit-learn compatible estimator.
+    features (list): The feature columns, in the order of the estimator's inputs.
+    scaler: The fitted scaler applied to the features before the estimator, or None.
+    meta (dict): The name, version and training metadata, see ModelRegistry.save.
+    """
+
+    def __init__(self, estimator, features: list, scaler=None, meta: dict = None):
+        self.estimator = estimator
+        self.features = list(features)
+        self.scaler = scaler
+        self.meta = meta or {}
+
+    @property
+    def name(self) -> str:
+        return self.meta.get("name")
+
+    @property
+    def version(self) -> int:
+        return self.meta.get("version")
+
+    def predict(self, X) -> np.ndarray:
+        """
+        Score rows of features: the probability of the positive class for classifiers, the prediction otherwise.
+
+        Parameters:
+        X (np.ndarray or pd.DataFrame): One row per sample, with the columns of `features` in their order;
+        a DataFrame is reordered by the feature names.
+        """
+        if isinstance(X, pd.DataFrame):
+            X = X[self.features].to_numpy()
+        if self.scaler is not None:
+            X = self.scaler.transform(X)
+        if hasattr(self.estimator, "predict_proba"):
+            return self.estimator.predict_proba(X)[:, 1]
+        return np.asarray(self.estimator.predict(X))
+
+
+class ModelRegistry:
+    """
+    Directory of versioned trained models.
+
+    Parameters:
+    path (str or Path): Directory of the registry, AnalysisFundamental/data/models by default.
+
+    Example:
+    >>> registry = ModelRegistry()
+    >>> version = registry.save("lightgbm_fundamentals", estimator, FEATURES, metadata={"threshold": 0.05})
+    >>> model = registry.load("lightgbm_fundamentals")  # the latest version
+    >>> probabilities = model.predict(df)
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path or DEFAULT_REGISTRY_DIR)
+
+    def versions(self, name: str) -> list:
+        directory = self.path / name
+        if not directory.exists():
+            return []
+        return sorted(int(version.name) for version in directory.iterdir() if version.name.isdigit())
+
+    def save(self, name: str, estimator, features: list, scaler=None, metadata: dict = None) -> int:
+        """
+        Save a trained model as the next version of `name`.
+
+        Parameters:
+        name (str): The name of the model, e.g. "lightgbm_fundamentals".
+        estimator: The fitted estimator.
+        features (list): The feature columns, in the order the estimator was trained on.
+        scaler: The fitted scaler to apply to the features before the estimator, if any.
+        metadata (dict): JSON serializable training metadata, e.g. the parameters, the training period
+        and the validation scores.
+
+        Returns:
+        int: The version of the saved model.
+        """
+        import joblib
+
+        versions = self.versions(name)
+        version = (versions[-1] + 1) if versions else 1
+        meta = {
+            "name": name,
+            "version": version,
+            "features": list(features),
+            "estimator": type(estimator).__name__,
+            "scaler": type(scaler).__name__ if scaler is not None else None,
+            "created": pd.Timestamp.now().isoformat(),
+            "metadata": metadata or {},
+        }
+        target = self.path / name / str(version)
+        temporary = target.with_name(target.name + ".tmp")
+        shutil.rmtree(temporary, ignore_errors=True)
+        temporary.mkdir(parents=True)
+        joblib.dump({"estimator": estimator, "scaler": scaler}, temporary / "model.joblib")
+        with open(temporary / "meta.json", "w") as f:
+            json.dump(meta, f, indent=2, default=str)
+        os.replace(temporary, target)
+        return version
+
+    def meta(self, name: str, version: int = None) -> dict:
+        version = version or self._latest(name)
+        with open(self.path / name / str(version) / "meta.json") as f:
+            return json.load(f)
+
+    def load(self, name: str, version: int = None) -> RegisteredModel:
+        """
+        Load a saved model, the latest version by default.
+
+        Returns:
+        RegisteredModel: The estimator with its features, scaler and metadata.
+        """
+        import joblib
+
+        version = version or self._latest(name)
+        meta = self.meta(name, version)
+        saved = joblib.load(self.path / name / str(version) / "model.joblib")
+        return RegisteredModel(saved["estimator"], meta["features"], saved["scaler"], meta)
+
+    def models(self) -> pd.DataFrame:
+        """
+        Every saved version of every model.
+
+        Returns:
+        pd.DataFrame: One row per version with the name, version, estimator, scaler, number of features,
+        creation time and training metadata.
+        """
+        rows = []
+        if self.path.exists():
+            for directory in sorted(self.path.iterdir()):
+                for version in self.versions(directory.name):
+                    meta = self.meta(directory.name, version)
+                    rows.append({**{key: meta[key] for key in ("name", "version", "estimator", "scaler", "created")},
+                                 "features": len(meta["features"]), **meta["metadata"]})
+        return pd.DataFrame(rows, columns=None if rows else ["name", "version", "estimator", "scaler", "created", "features"])
+
+    def _latest(self, name: str) -> int:
+        versions = self.versions(name)
+        if not versions:
+            raise FileNotFoundError(f"No model named {name} in {self.path}")
+        return versions[-1]
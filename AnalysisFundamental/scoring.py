@@ -0,0 +1,144 @@
+"""
+Batch scoring of the whole universe with a registered model.
+
+The model is loaded once; the latest row of every ticker in the feature store is gathered in chunks of
+contiguous float arrays straight from the memory-mapped columns, scored, and streamed to a Parquet file.
+Run monthly after updating the feature store:
+
+    python -m AnalysisFundamental.scoring lightgbm_fundamentals --output predictions.parquet
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))) # add parent dir - for AnalysisFundamental
+
+import numpy as np
+import pandas as pd
+
+from AnalysisFundamental.feature_store import FeatureStore
+from AnalysisFundamental.registry import ModelRegistry
+
+
+DEFAULT_PREDICTION_DIR = Path(__file__).resolve().parent / "data" / "predictions"
+CHUNK_SIZE = 4096
+
+
+def latest_rows(store: FeatureStore, as_of=None) -> np.ndarray:
+    """
+    The row of the latest date of each ticker in the store, at or before as_of.
+
+    Returns:
+    np.ndarray: Row numbers in the store, in ticker order; tickers without a row by as_of are left out.
+    """
+    codes, dates = store._column("ticker"), store._column("date")
+    if as_of is None:
+        rows, codes = np.arange(len(codes)), np.asarray(codes)
+    else:
+        rows = np.flatnonzero(dates <= np.datetime64(pd.Timestamp(as_of)))
+        codes = codes[rows]
+    if not len(rows):
+        return rows
+    # rows are sorted by ticker and date: the last row of each ticker's run
+    return rows[np.append(codes[1:] != codes[:-1], True)]
+
+
+class BatchScorer:
+    """
+    Scores feature store rows with one registered model, loaded once and reused across calls.
+
+    Parameters:
+    name (str): The name of the model in the registry.
+    version (int): The version of the model, the latest by default.
+    registry (ModelRegistry): The registry, the default one by default.
+    dtype: The float type of the feature arrays passed to the model.
+
+    Example:
+    >>> scorer = BatchScorer("lightgbm_fundamentals")
+    >>> scorer.score_store(FeatureStore(), "predictions.parquet")
+    """
+
+    def __init__(self, name: str, version: int = None, registry: ModelRegistry = None, dtype=np.float32):
+        self.model = (registry or ModelRegistry()).load(name, version)
+        self.dtype = dtype
+
+    def chunks(self, store: FeatureStore, rows: np.ndarray, chunk_size: int = CHUNK_SIZE):
+        """
+        Gather the model's features of some store rows as C-contiguous (rows x features) arrays.
+
+        Yields:
+        tuple: The rows of the chunk and their features.
+        """
+        columns = [store._column(feature) for feature in self.model.features]
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            X = np.empty((len(chunk), len(columns)), dtype=self.dtype)
+            for j, column in enumerate(columns):
+                X[:, j] = column[chunk]
+            yield chunk, X
+
+    def score_store(self, store: FeatureStore, output=None, as_of=None, chunk_size: int = CHUNK_SIZE) -> Path:
+        """
+        Score the latest row of every ticker and write the predictions.
+
+        The features of a ticker's latest row are the ones the model sees lagged by a period, so its score
+        is the prediction for the period after that row's date.
+
+        Parameters:
+        store (FeatureStore): The store holding the model's features under their names.
+        output (str or Path): The Parquet file to write, <model>_<version>_<date>.parquet in
+        AnalysisFundamental/data/predictions by default.
+        as_of: The latest date to score from, the end of the store by default.
+        chunk_size (int): Rows scored at once.
+
+        Returns:
+        Path: The written file, with the columns ticker, date, score, model and version.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        rows = latest_rows(store, as_of)
+        tickers = np.array(store.tickers, dtype=object)
+        codes, dates = store._column("ticker"), store._column("date")
+        if output is None:
+            last = pd.Timestamp(dates[rows].max()) if len(rows) else pd.Timestamp(as_of or "now")
+            output = DEFAULT_PREDICTION_DIR / f"{self.model.name}_{self.model.version}_{last:%Y%m%d}.parquet"
+        output = Path(output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        temporary = output.with_name(output.name + ".tmp")
+
+        schema = pa.schema([("ticker", pa.string()), ("date", pa.timestamp("ns")), ("score", pa.float64()),
+                            ("model", pa.string()), ("version", pa.int32())])
+        with pq.ParquetWriter(temporary, schema) as writer:
+            for chunk, X in self.chunks(store, rows, chunk_size):
+                writer.write_table(pa.table({
+                    "ticker": tickers[codes[chunk]],
+                    "date": dates[chunk],
+                    "score": self.model.predict(X).astype(np.float64),
+                    "model": [self.model.name] * len(chunk),
+                    "version": np.full(len(chunk), self.model.version, dtype=np.int32),
+                }, schema=schema))
+        os.replace(temporary, output)
+        return output
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score the latest feature rows of every ticker with a registered model.")
+    parser.add_argument("model", help="name of the model in the registry")
+    parser.add_argument("--version", type=int, help="version of the model, the latest by default")
+    parser.add_argument("--registry", help="registry directory, AnalysisFundamental/data/models by default")
+    parser.add_argument("--store", help="feature store directory, AnalysisFundamental/data/features by default")
+    parser.add_argument("--as-of", help="latest date to score from, the end of the store by default")
+    parser.add_argument("--output", help="Parquet file of the predictions")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    scorer = BatchScorer(args.model, args.version, ModelRegistry(args.registry))
+    output = scorer.score_store(FeatureStore(args.store), args.output, args.as_of, args.chunk_size)
+    print(f"Predictions written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
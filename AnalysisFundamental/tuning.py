@@ -0,0 +1,261 @@
+"""
+Hyperparameter search for the LightGBM fundamentals classifier.
+
+The training and validation sets are binned once and saved as LightGBM binary datasets; every trial loads
+them instead of binning the features again. Trials run concurrently in a process pool within a CPU budget,
+stop early when the validation score stops improving, and are recorded in a SQLite table. Besides grid and
+random search, successive halving trains many configurations briefly and only the best ones for longer.
+"""
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_SEARCH_DIR = Path(__file__).resolve().parent / "data" / "tuning"
+# metrics where higher is better
+MAXIMIZE = {"auc", "average_precision", "map"}
+# parameters of the binned datasets; changing them requires building the datasets again
+DATASET_PARAMS = {"max_bin": 255, "feature_pre_filter": False, "verbose": -1}
+# the fixed parameters of lightgbm.py, see AnalysisFundamental.walk_forward.DEFAULT_PARAMS
+BASE_PARAMS = {"objective": "binary", "is_unbalance": True, "verbose": -1}
+# aliases of the number of boosting rounds, which the search itself sets
+ROUNDS_PARAMS = {"n_estimators", "num_boost_round", "num_iterations", "num_iteration", "n_iter", "num_tree",
+                 "num_trees", "num_round", "num_rounds", "nrounds"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trials (
+    id INTEGER PRIMARY KEY, search TEXT, config TEXT, rung INTEGER, rounds INTEGER, metric TEXT,
+    score REAL, best_iteration INTEGER, status TEXT, seconds REAL, created TEXT
+);
+CREATE INDEX IF NOT EXISTS trials_search ON trials (search, score);
+"""
+
+# the loaded datasets of a worker process, see _load
+_datasets = {}
+
+
+def _load(directory: str) -> tuple:
+    import lightgbm as lgb
+
+    if _datasets.get("directory") != directory:
+        train = lgb.Dataset(str(Path(directory) / "train.bin"), params=DATASET_PARAMS)
+        valid = lgb.Dataset(str(Path(directory) / "valid.bin"), params=DATASET_PARAMS, reference=train)
+        _datasets.clear()
+        _datasets.update({"directory": directory, "train": train, "valid": valid})
+    return _datasets["train"], _datasets["valid"]
+
+
+def _run_trial(directory: str, config: dict, rounds: int, metric: str, threads: int, early_stopping: int) -> dict:
+    import lightgbm as lgb
+
+    train, valid = _load(directory)
+    params = {**BASE_PARAMS, **config, "metric": metric, "num_threads": threads}
+    callbacks = [lgb.early_stopping(early_stopping, verbose=False)] if early_stopping else []
+    started = time.perf_counter()
+    booster = lgb.train(params, train, num_boost_round=rounds, valid_sets=[valid], valid_names=["valid"], callbacks=callbacks)
+    return {
+        "rounds": rounds,
+        "score": float(booster.best_score["valid"][metric]),
+        "best_iteration": int(booster.best_iteration or booster.current_iteration()),
+        "stopped_early": bool(booster.best_iteration and booster.current_iteration() < rounds),
+        "seconds": time.perf_counter() - started,
+    }
+
+
+class HyperparameterSearch:
+    """
+    Grid, random and successive halving search over LGBMClassifier parameters, sharing cached binned datasets.
+
+    Parameters:
+    directory (str or Path): Directory of the binned datasets and the trials table (trials.sqlite),
+    AnalysisFundamental/data/tuning by default.
+    cpus (int): CPU budget: the number of concurrent trials times the threads of each. All CPUs by default.
+    metric (str): LightGBM validation metric to optimize, "auc" by default.
+    early_stopping (int): Rounds without improvement of the validation score after which a trial stops, 0 never.
+
+    Example:
+    >>> search = HyperparameterSearch(cpus=8)
+    >>> search.build(prepare_dataset(load_dataset()), FEATURES, split_date=2020)
+    >>> search.successive_halving({"num_leaves": [4, 8, 16, 32], "min_child_samples": [50, 100, 200, 400]}, n_trials=16)
+    >>> search.trials().head()
+    """
+
+    def __init__(self, directory=None, cpus: int = None, metric: str = "auc", early_stopping: int = 20):
+        self.directory = Path(directory or DEFAULT_SEARCH_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.cpus = max(1, cpus or os.cpu_count() or 1)
+        self.metric = metric
+        self.early_stopping = early_stopping
+        with sqlite3.connect(self.directory / "trials.sqlite") as connection:
+            connection.executescript(SCHEMA)
+
+    def build(self, df: pd.DataFrame, features: list, target: str = "target", split_date: int = 2020,
+              rebuild: bool = False) -> bool:
+        """
+        Bin the training rows (years before split_date) and validation rows (split_date) and save them.
+
+        The datasets are reused as long as the features, the target, the split and the content of the rows
+        up to the validation year are unchanged.
+
+        Parameters:
+        df (pd.DataFrame): The dataset indexed by (ticker, date), see AnalysisFundamental.dataset.prepare_dataset.
+        features (list): The feature columns.
+        target (str): The boolean target column.
+        split_date (int): The validation year.
+        rebuild (bool): Whether to build the datasets even if they are up to date.
+
+        Returns:
+        bool: Whether the datasets were built.
+        """
+        import lightgbm as lgb
+
+        years = df.index.get_level_values("date").year
+        rows = years <= split_date
+        # a revised dataset with as many rows has another fingerprint
+        fingerprint = pd.util.hash_pandas_object(df.loc[rows, list(features) + [target]], index=True).to_numpy()
+        key = {"features": list(features), "target": target, "split_date": split_date, "rows": int(rows.sum()),
+               "fingerprint": hashlib.sha256(fingerprint.tobytes()).hexdigest(), "params": DATASET_PARAMS}
+        meta_path = self.directory / "datasets.json"
+        if not rebuild and meta_path.exists() and json.loads(meta_path.read_text()) == key:
+            return False
+        train = lgb.Dataset(df.loc[years < split_date, features].to_numpy(dtype=np.float32), df.loc[years < split_date, target].to_numpy(),
+                            feature_name=list(features), params=DATASET_PARAMS).construct()
+        valid = lgb.Dataset(df.loc[years == split_date, features].to_numpy(dtype=np.float32), df.loc[years == split_date, target].to_numpy(),
+                            feature_name=list(features), params=DATASET_PARAMS, reference=train).construct()
+        meta_path.unlink(missing_ok=True)
+        for name, dataset in (("train", train), ("valid", valid)):
+            (self.directory / f"{name}.bin").unlink(missing_ok=True)
+            dataset.save_binary(str(self.directory / f"{name}.bin"))
+        meta_path.write_text(json.dumps(key))
+        _datasets.clear()
+        return True
+
+    def _run(self, search: str, configs: list, rounds: int, rung: int = 0, early_stopping: int = None) -> list:
+        # run trials concurrently, each with an equal share of the CPU budget, and record them
+        if not (self.directory / "datasets.json").exists():
+            raise FileNotFoundError(f"No datasets in {self.directory}, see HyperparameterSearch.build")
+        for config in configs:
+            rounds_params = ROUNDS_PARAMS & set(config)
+            if rounds_params:
+                raise ValueError(f"{', '.join(sorted(rounds_params))} cannot be searched: the number of rounds is set by "
+                                 "the rounds of grid and random or by the rungs of successive_halving")
+        workers = max(1, min(self.cpus, len(configs)))
+        threads = max(1, self.cpus // workers)
+        early_stopping = self.early_stopping if early_stopping is None else early_stopping
+        arguments = [(str(self.directory), config, rounds, self.metric, threads, early_stopping) for config in configs]
+        if workers == 1:
+            results = [_run_trial(*argument) for argument in arguments]
+        else:
+            with ProcessPoolExecutor(workers) as executor:
+                results = list(executor.map(_run_trial, *zip(*arguments)))
+        created = pd.Timestamp.now().isoformat()
+        with sqlite3.connect(self.directory / "trials.sqlite") as connection:
+            connection.executemany(
+                "INSERT INTO trials (search, config, rung, rounds, metric, score, best_iteration, status, seconds, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(search, json.dumps(config, sort_keys=True), rung, result["rounds"], self.metric, result["score"],
+                  result["best_iteration"], "stopped early" if result["stopped_early"] else "complete", result["seconds"], created)
+                 for config, result in zip(configs, results)],
+            )
+        return results
+
+    def _name(self, kind: str) -> str:
+        return f"{kind}-{pd.Timestamp.now():%Y%m%d%H%M%S}"
+
+    def grid(self, param_grid: dict, rounds: int = 50, search: str = None) -> pd.DataFrame:
+        """
+        Try every combination of some parameter values, e.g. {"num_leaves": [8, 16], "max_depth": [4, 6]}.
+
+        Returns:
+        pd.DataFrame: The trials of the search, best first, see trials.
+        """
+        from sklearn.model_selection import ParameterGrid
+
+        search = search or self._name("grid")
+        self._run(search, [dict(config) for config in ParameterGrid(param_grid)], rounds)
+        return self.trials(search)
+
+    def random(self, distributions: dict, n_trials: int = 20, rounds: int = 50, seed: int = 0, search: str = None) -> pd.DataFrame:
+        """
+        Try n_trials random configurations; values are drawn from lists or scipy.stats distributions.
+
+        Returns:
+        pd.DataFrame: The trials of the search, best first, see trials.
+        """
+        from sklearn.model_selection import ParameterSampler
+
+        search = search or self._name("random")
+        configs = [_plain(config) for config in ParameterSampler(distributions, n_trials, random_state=seed)]
+        self._run(search, configs, rounds)
+        return self.trials(search)
+
+    def successive_halving(self, distributions: dict, n_trials: int = 27, min_rounds: int = 10, max_rounds: int = 270,
+                           eta: int = 3, seed: int = 0, search: str = None) -> pd.DataFrame:
+        """
+        Successive halving: train n_trials random configurations for min_rounds, keep the best 1/eta of them
+        and train those eta times longer, until max_rounds. Configurations that fall behind are pruned
+        after a few rounds instead of being trained in full.
+
+        Returns:
+        pd.DataFrame: The trials of every rung of the search, best first, see trials.
+        """
+        from sklearn.model_selection import ParameterSampler
+
+        search = search or self._name("halving")
+        configs = [_plain(config) for config in ParameterSampler(distributions, n_trials, random_state=seed)]
+        rungs = max(0, int(math.floor(math.log(max_rounds / min_rounds, eta) + 1e-9)))
+        for rung in range(rungs + 1):
+            rounds = min(max_rounds, min_rounds * eta ** rung)
+            # no early stopping within a rung, so that the configurations are compared on the same budget
+            results = self._run(search, configs, rounds, rung, early_stopping=0)
+            if rung == rungs or len(configs) <= 1:
+                break
+            order = np.argsort([result["score"] for result in results])
+            if self.metric in MAXIMIZE:
+                order = order[::-1]
+            configs = [configs[i] for i in order[:max(1, len(configs) // eta)]]
+        return self.trials(search)
+
+    def trials(self, search: str = None) -> pd.DataFrame:
+        """
+        The recorded trials, of one search or of all, best first. Within a search the latest rung comes first;
+        across searches, whose rungs are unrelated, the trials are ranked by score only.
+
+        Returns:
+        pd.DataFrame: One row per trial with the search, its configuration (also spread over one column per
+        parameter), the rung, rounds, score, best iteration, status and duration.
+        """
+        query = "SELECT * FROM trials" + (" WHERE search = ?" if search else "")
+        with sqlite3.connect(self.directory / "trials.sqlite") as connection:
+            trials = pd.read_sql_query(query, connection, params=[search] if search else [])
+        trials = trials.join(pd.DataFrame([json.loads(config) for config in trials.config], index=trials.index))
+        ascending = self.metric not in MAXIMIZE
+        if search is None:
+            return trials.sort_values("score", ascending=ascending, kind="stable").reset_index(drop=True)
+        return trials.sort_values(["rung", "score"], ascending=[False, ascending]).reset_index(drop=True)
+
+    def best(self, search: str = None) -> dict:
+        """
+        The parameters of the best trial, of the last rung of one search or of all searches.
+
+        Returns:
+        dict: The configuration with n_estimators set to the best iteration of the trial, ready for
+        LGBMClassifier(**params), or None without trials.
+        """
+        trials = self.trials(search)
+        if not len(trials):
+            return None
+        return {**json.loads(trials.config.iloc[0]), "n_estimators": int(trials.best_iteration.iloc[0])}
+
+
+def _plain(config: dict) -> dict:
+    # NumPy scalars drawn by ParameterSampler are not JSON serializable
+    return {name: value.item() if isinstance(value, np.generic) else value for name, value in config.items()}
@@ -0,0 +1,152 @@
+"""
+Walk-forward backtest of the LightGBM fundamentals classifier.
+
+The dataset is split into yearly or monthly test periods, each predicted by a model trained on the periods
+before it (an expanding window) or on a fixed number of them (a rolling window). The rows are sorted by
+date and saved once as .npy files; worker processes memory-map them, so every fold's training rows are a
+slice of one shared, read-only matrix instead of a copy pickled to each worker.
+"""
+import os
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+# the parameters of lightgbm.py
+DEFAULT_PARAMS = {
+    "is_unbalance": True,
+    "max_depth": 4,
+    "num_leaves": 8,
+    "min_child_samples": 400,
+    "n_estimators": 50,
+    "verbose": -1,
+}
+
+Fold = namedtuple("Fold", ["period", "train_start", "test_start", "test_end"])
+
+# the memory-mapped matrix of a worker process, see _open_shared
+_shared = {}
+
+
+def walk_forward_folds(dates, freq: str = "Y", window: str = "expanding", train_periods: int = None,
+                       start=None, end=None) -> list:
+    """
+    The folds of a walk-forward backtest over some dates.
+
+    Parameters:
+    dates (array-like): The dates of the dataset.
+    freq (str): Length of a test period, "Y" for years or "M" for months.
+    window (str): "expanding" trains on every period before the test period, "rolling" on the last train_periods.
+    train_periods (int): Number of training periods of a rolling window.
+    start, end: The first and last test period, e.g. "2010" and "2020". By default every period after the first.
+
+    Returns:
+    list: One Fold (period, train_start, test_start, test_end) per test period; train_start and test_start
+    are inclusive, test_end is exclusive.
+    """
+    if window not in ("expanding", "rolling"):
+        raise ValueError(f"Unknown window: {window}")
+    if window == "rolling" and not train_periods:
+        raise ValueError("A rolling window needs train_periods")
+    periods = pd.DatetimeIndex(dates).to_period(freq).unique().sort_values()
+    first = periods[0]
+    folds = []
+    for period in periods[1:]:
+        if (start is not None and period < pd.Period(start, freq)) or (end is not None and period > pd.Period(end, freq)):
+            continue
+        train_from = first if window == "expanding" else max(first, period - train_periods)
+        folds.append(Fold(period, train_from.start_time, period.start_time, (period + 1).start_time))
+    return folds
+
+
+def _write_shared(directory: Path, X: np.ndarray, y: np.ndarray, dates: np.ndarray):
+    np.save(directory / "X.npy", np.ascontiguousarray(X, dtype=np.float32))
+    np.save(directory / "y.npy", y.astype(np.int8))
+    np.save(directory / "dates.npy", dates.astype("datetime64[ns]").view(np.int64))
+
+
+def _open_shared(directory: str):
+    # pages of the mapped files are shared between all workers through the page cache
+    _shared.clear()
+    _shared.update({name: np.load(Path(directory) / f"{name}.npy", mmap_mode="r") for name in ("X", "y", "dates")})
+
+
+def _train_fold(fold: Fold, params: dict) -> tuple:
+    from lightgbm import LGBMClassifier
+
+    X, y, dates = _shared["X"], _shared["y"], _shared["dates"]
+    train_start, test_start, test_end = np.searchsorted(
+        dates, pd.DatetimeIndex([fold.train_start, fold.test_start, fold.test_end]).asi8
+    )
+    if train_start == test_start or test_start == test_end or len(np.unique(y[train_start:test_start])) < 2:
+        return test_start, test_end, None
+    estimator = LGBMClassifier(**params)
+    estimator.fit(X[train_start:test_start], y[train_start:test_start])
+    return test_start, test_end, estimator.predict_proba(X[test_start:test_end])[:, 1]
+
+
+def walk_forward(df: pd.DataFrame, features: list, target: str = "target", returns: str = "return_month",
+                 freq: str = "Y", window: str = "expanding", train_periods: int = None, start=None, end=None,
+                 params: dict = None, threshold: float = 0.5, max_workers: int = None):
+    """
+    Backtest the classifier walk-forward: train one model per fold in parallel and predict its test period.
+    Rows without a return are left out of both the training and the test periods.
+
+    Parameters:
+    df (pd.DataFrame): The dataset indexed by (ticker, date) with lagged features, see
+    AnalysisFundamental.dataset.prepare_dataset.
+    features (list): The feature columns.
+    target (str): The boolean target column.
+    returns (str): The column with the return of each row's period.
+    freq, window, train_periods, start, end: The folds, see walk_forward_folds.
+    params (dict): Parameters of the LGBMClassifier, DEFAULT_PARAMS by default.
+    threshold (float): Probability from which a row is bought.
+    max_workers (int): Number of worker processes, one per CPU by default. Each model gets an equal share
+    of the CPUs for its own threads.
+
+    Returns:
+    tuple: The predictions, indexed by (ticker, date) with the columns fold, probability, buy, target and
+    the return, and the portfolio of each date: the number of tickers bought and their mean return.
+
+    Example:
+    >>> predictions, portfolio = walk_forward(prepare_dataset(load_dataset()), FEATURES, freq="M", start="2005")
+    """
+    params = dict(DEFAULT_PARAMS if params is None else params)
+    data = df.reset_index().sort_values(["date", "ticker"], kind="stable")
+    # the last period of each ticker has no return yet: it is neither a negative to train on nor a trade
+    data = data[data[returns].notna()].reset_index(drop=True)
+    folds = walk_forward_folds(data.date, freq, window, train_periods, start, end)
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(folds) or 1))
+    params.setdefault("n_jobs", max(1, (os.cpu_count() or 1) // max_workers))
+
+    probabilities = np.full(len(data), np.nan)
+    fold_of_row = np.full(len(data), None, dtype=object)
+    with tempfile.TemporaryDirectory() as directory:
+        _write_shared(Path(directory), data[features].to_numpy(dtype=np.float32), data[target].to_numpy(), data.date.to_numpy())
+        if max_workers == 1:
+            _open_shared(directory)
+            results = [_train_fold(fold, params) for fold in folds]
+        else:
+            with ProcessPoolExecutor(max_workers, initializer=_open_shared, initargs=(directory,)) as executor:
+                results = list(executor.map(_train_fold, folds, [params] * len(folds)))
+        _shared.clear()
+
+    for fold, (test_start, test_end, fold_probabilities) in zip(folds, results):
+        if fold_probabilities is not None:
+            probabilities[test_start:test_end] = fold_probabilities
+            fold_of_row[test_start:test_end] = str(fold.period)
+
+    tested = ~np.isnan(probabilities)
+    predictions = data.loc[tested, ["ticker", "date", target, returns]].assign(
+        fold=fold_of_row[tested], probability=probabilities[tested]
+    )
+    predictions["buy"] = predictions.probability >= threshold
+    predictions = predictions.set_index(["ticker", "date"])[["fold", "probability", "buy", target, returns]]
+
+    bought = predictions.loc[predictions.buy, returns]
+    portfolio = bought.groupby(level="date").agg(["count", "mean"]).rename(columns={"count": "ticker", "mean": returns})
+    return predictions, portfolio
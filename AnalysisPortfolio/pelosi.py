@@ -6,11 +6,15 @@
 # https://learn.quantscience.io/python-algorithmic-trading-course-waitlist
 
 # Libraries
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))) # add parent dir - for GatherPrices
 import riskfolio as rp
 import pandas as pd
-import yfinance as yf
 import pyfolio as pf
 
+from GatherPrices.panel import load_panel
+
 assets = [
     "PANW",
     "NVDA",
@@ -24,13 +28,13 @@ assets = [
     "^GSPC", # SP500 benchmark
 ]
 
-# Step 1: Collect and format data
-data = yf.download(assets, start = "2018-01-01", end = "2024-07-10")
-data = data.loc[:, "Adj Close"]
+# Step 1: Collect and format data (from the local memory-mapped price panel)
+panel = load_panel(assets, start = "2018-01-01", end = "2024-07-10")
+data = panel.frame("Adj Close", assets, "2018-01-01", "2024-07-09")
 data
 
 # Step 2: Get returns
-returns = data.pct_change().dropna()
+returns = panel.returns("Adj Close", assets, "2018-01-01", "2024-07-09").dropna()
 returns_bench = returns.pop("^GSPC").to_frame()
 
 # Step 3: Create a Portfolio (Max Sharpe)
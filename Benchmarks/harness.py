@@ -0,0 +1,189 @@
+import json
+import multiprocessing
+import platform
+import resource
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import traceback
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str, optional: tuple = ()):
+    """
+    Register a benchmark under a name.
+
+    The decorated function takes (size, workdir) and returns the zero-argument callable to time. It is
+    called again before every repeat, untimed, so it can build fresh inputs (e.g. files the run deletes).
+
+    Parameters:
+    name (str): The name of the benchmark.
+    optional (tuple): Top-level packages the benchmark needs that may not be installed. The benchmark is
+    skipped when one of them is missing; any other ImportError is reported as an error.
+
+    Example:
+    >>> @benchmark("sum")
+    ... def setup_sum(size, workdir):
+    ...     values = list(range(size))
+    ...     return lambda: sum(values)
+    """
+    def register(setup):
+        setup.optional = tuple(optional)
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def _missing_optional(error: ImportError, optional: tuple) -> bool:
+    # only a missing declared package skips a benchmark, not an import bug in the project itself
+    return isinstance(error, ModuleNotFoundError) and (error.name or "").split(".")[0] in optional
+
+
+def _measure(setup, size: int, repeats: int, connection):
+    # runs in a child process, so that peak RSS and allocations belong to this benchmark only
+    try:
+        # a forked child starts with the parent's pages: report the growth of the peak beyond them
+        # (ru_maxrss is in kilobytes on Linux)
+        baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        with tempfile.TemporaryDirectory() as workdir:
+            wall_times = []
+            for _ in range(repeats):
+                run = setup(size, Path(workdir))
+                start = time.perf_counter()
+                run()
+                wall_times.append(time.perf_counter() - start)
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 - baseline_rss
+
+            # allocations are traced in a separate run, tracing slows the timed runs down too much
+            run = setup(size, Path(workdir))
+            tracemalloc.start()
+            run()
+            _, allocated_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        connection.send({
+            "status": "ok",
+            "wall_time_s": statistics.median(wall_times),
+            "wall_time_min_s": min(wall_times),
+            "wall_times_s": wall_times,
+            "peak_rss_mb": peak_rss,
+            "baseline_rss_mb": baseline_rss,
+            "allocated_peak_mb": allocated_peak / 1024 ** 2,
+        })
+    except ImportError as error:
+        if _missing_optional(error, getattr(setup, "optional", ())):
+            connection.send({"status": "skipped", "error": f"{type(error).__name__}: {error}"})
+        else:
+            connection.send({"status": "error", "error": f"{type(error).__name__}: {error}", "traceback": traceback.format_exc()})
+    except Exception as error:
+        connection.send({"status": "error", "error": f"{type(error).__name__}: {error}", "traceback": traceback.format_exc()})
+    finally:
+        connection.close()
+
+
+def run_benchmark(name: str, size: int, repeats: int = 3) -> dict:
+    """
+    Run one benchmark at one universe size in a fresh process.
+
+    Returns:
+    dict: The median and minimum wall time in seconds, the peak RSS of the process in MB beyond the RSS
+    it started with (the forked parent's pages, reported as baseline_rss_mb) and the peak of memory
+    allocated by Python in MB, or the error if the benchmark could not run.
+    """
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_measure, args=(BENCHMARKS[name], size, repeats, sender))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = {"status": "error", "error": "benchmark process died"}
+    process.join()
+    return {"benchmark": name, "size": size, "repeats": repeats, **result}
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_suite(names: list, sizes: list, repeats: int = 3, log=print) -> dict:
+    """
+    Run benchmarks at several universe sizes.
+
+    Returns:
+    dict: The commit, timestamp, machine and one result per (benchmark, size), ready to be written as JSON.
+    """
+    results = []
+    for name in names:
+        for size in sizes:
+            result = run_benchmark(name, size, repeats)
+            results.append(result)
+            if result["status"] == "ok":
+                log(f"{name:<24} {size:>7} {result['wall_time_s']:>9.3f}s {result['peak_rss_mb']:>9.1f}MB RSS growth {result['allocated_peak_mb']:>9.1f}MB allocated")
+            else:
+                log(f"{name:<24} {size:>7} {result['status']}: {result['error']}")
+    return {
+        "commit": _commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, time_threshold: float = 0.1, memory_threshold: float = 0.1,
+            min_time: float = 0.01, min_memory: float = 1.0) -> list:
+    """
+    Compare two suite results and return the regressions.
+
+    A metric regresses when it grows by more than its threshold (relative) and by more than a small
+    absolute amount, so that noise on very fast or very small runs is not reported.
+
+    Parameters:
+    baseline (dict): Results of the reference commit, as returned by run_suite.
+    current (dict): Results of the commit under test.
+    time_threshold (float): Allowed relative increase of the median wall time.
+    memory_threshold (float): Allowed relative increase of peak RSS and allocated memory.
+    min_time (float): Smallest wall time increase in seconds that counts as a regression.
+    min_memory (float): Smallest memory increase in MB that counts as a regression.
+
+    Returns:
+    list: One dictionary per regression with the benchmark, size, metric, both values and the change.
+    """
+    reference = {(result["benchmark"], result["size"]): result for result in baseline["results"] if result["status"] == "ok"}
+    checks = [("wall_time_s", time_threshold, min_time), ("peak_rss_mb", memory_threshold, min_memory),
+              ("allocated_peak_mb", memory_threshold, min_memory)]
+    regressions = []
+    for result in current["results"]:
+        before = reference.get((result["benchmark"], result["size"]))
+        if before is None or result["status"] != "ok":
+            continue
+        for metric, threshold, minimum in checks:
+            old, new = before[metric], result[metric]
+            if new > old * (1 + threshold) and new - old > minimum:
+                regressions.append({
+                    "benchmark": result["benchmark"], "size": result["size"], "metric": metric,
+                    "baseline": old, "current": new, "change": new / old - 1 if old else float("inf"),
+                })
+    return regressions
+
+
+def load_results(path) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_results(results: dict, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
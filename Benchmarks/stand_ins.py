@@ -0,0 +1,80 @@
+"""
+Local stand-ins for remote services, so that benchmarks run without network access.
+"""
+import re
+import threading
+from contextlib import contextmanager
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """
+    Static file handler supporting single HTTP range requests ("Range: bytes=<start>-").
+
+    When fail_after is set, the first response for every path is cut off after that many bytes, like a
+    dropped connection, so that resuming downloads can be exercised.
+    """
+
+    fail_after = None
+    _served = set()
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        match = re.match(r"bytes=(\d+)-$", self.headers.get("Range", ""))
+        try:
+            handle = open(path, "rb")
+        except OSError:
+            self.send_error(404, "File not found")
+            return None
+        size = handle.seek(0, 2)
+        start = int(match.group(1)) if match else 0
+        if start >= size and size:
+            handle.close()
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.end_headers()
+            return None
+        handle.seek(start)
+        self.send_response(206 if match else 200)
+        self.send_header("Content-Type", "application/zip")
+        self.send_header("Content-Length", str(size - start))
+        self.send_header("Accept-Ranges", "bytes")
+        if match:
+            self.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+        self.end_headers()
+        return handle
+
+    def copyfile(self, source, outputfile):
+        if self.fail_after is not None and self.path not in self._served:
+            self._served.add(self.path)
+            outputfile.write(source.read(self.fail_after))
+            self.close_connection = True
+            return
+        super().copyfile(source, outputfile)
+
+
+@contextmanager
+def serve_directory(directory, fail_after: int = None):
+    """
+    Serve a directory over HTTP on a free local port.
+
+    Parameters:
+    directory (str or Path): The directory to serve.
+    fail_after (int): Cut the first response for every file off after this many bytes. None serves all.
+
+    Returns:
+    str: The base URL of the directory, ending with a slash.
+    """
+    handler = type("Handler", (RangeRequestHandler,), {"fail_after": fail_after, "_served": set()})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(handler, directory=str(directory)))
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,354 @@
+"""
+Benchmarks of the project's hot paths on synthetic data, see GatherSynthetic.
+
+Run from the repository root, e.g.
+
+    python -m Benchmarks.suite --sizes 100 1000
+    python -m Benchmarks.suite --sizes 100 1000 --compare Benchmarks/results/<baseline commit>.json
+
+Results are written as JSON to Benchmarks/results/<commit>.json. With --compare, regressions beyond the
+thresholds are listed and the exit code is 1.
+"""
+import argparse
+import os
+import shutil
+import sys
+import zipfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# silence the progress bars of the EDGAR conversion
+os.environ.setdefault("TQDM_DISABLE", "1")
+
+from Benchmarks.harness import BENCHMARKS, benchmark, compare, load_results, run_suite, save_results
+from Benchmarks.stand_ins import serve_directory
+from GatherSynthetic.generator import SyntheticMarket, SyntheticProvider
+
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS_DIR = ROOT / "Benchmarks" / "results"
+N_YEARS = 10
+SEED = 0
+
+
+def _revenue_forecast_path():
+    # RevenueForecast uses flat imports, see RevenueForecast/main.py
+    path = str(ROOT / "RevenueForecast")
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+@benchmark("get_fundamentals_dict")
+def setup_get_fundamentals_dict(size, workdir):
+    from GatherFundamental.calculate_ratios import get_fundamentals_dict
+
+    market = SyntheticMarket(n_tickers=size, n_years=N_YEARS, seed=SEED)
+    provider = SyntheticProvider(market)
+    return lambda: get_fundamentals_dict(market.tickers, [], provider=provider)
+
+
+@benchmark("filter_tickers")
+def setup_filter_tickers(size, workdir):
+    from GatherFundamental.calculate_ratios import filter_tickers
+
+    market = SyntheticMarket(n_tickers=size, n_years=N_YEARS, seed=SEED)
+    provider = SyntheticProvider(market)
+    ratio_filters = {"Market Cap": ">=1e9", "PE Ratio": "<=25", "Current Ratio": ">=1", "P_FS": ">=0.5"}
+    return lambda: filter_tickers(market.tickers, ratio_filters, provider=provider)
+
+
+@benchmark("edgar_to_parquet")
+def setup_edgar_to_parquet(size, workdir):
+    from GatherAlternative.edgar import convert_to_parquet
+
+    # one year of filings, rewritten before every run as the conversion removes the TSV files
+    market = SyntheticMarket(n_tickers=size, n_years=N_YEARS, seed=SEED)
+    data_path = workdir / "edgar"
+    for quarter in range(1, 5):
+        path = data_path / f"{market.end_year}_{quarter}" / "source"
+        path.mkdir(parents=True, exist_ok=True)
+        sub, num = market.edgar_quarter(market.end_year, quarter)
+        sub.to_csv(path / "sub.tsv", sep="\t", index=False)
+        num.to_csv(path / "num.tsv", sep="\t", index=False)
+        (path.parent / "parquet" / "sub.parquet").unlink(missing_ok=True)
+        (path.parent / "parquet" / "num.parquet").unlink(missing_ok=True)
+    return lambda: convert_to_parquet(data_path)
+
+
+@benchmark("edgar_ingest")
+def setup_edgar_ingest(size, workdir):
+    # one year of notes archives served by a local HTTP stand-in, ingested from scratch
+    from GatherAlternative.edgar_ingest import ingest_quarters
+
+    market = SyntheticMarket(n_tickers=size, n_years=N_YEARS, seed=SEED)
+    served = workdir / "served"
+    if not served.exists():
+        served.mkdir()
+        for quarter in range(1, 5):
+            sub, num = market.edgar_quarter(market.end_year, quarter)
+            with zipfile.ZipFile(served / f"{market.end_year}q{quarter}_notes.zip", "w", zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr("sub.tsv", sub.to_csv(sep="\t", index=False))
+                archive.writestr("num.tsv", num.to_csv(sep="\t", index=False))
+    shutil.rmtree(workdir / "edgar", ignore_errors=True)
+    periods = [(market.end_year, quarter) for quarter in range(1, 5)]
+
+    def run():
+        with serve_directory(served) as url:
+            ingest_quarters(periods, workdir / "edgar", base_url=url, requests_per_second=None)
+    return run
+
+
+@benchmark("edgar_query")
+def setup_edgar_query(size, workdir):
+    # the 10-K/10-Q diluted EPS of up to 500 companies from a consolidated year of filings
+    from GatherAlternative.edgar import build_dataset, convert_to_parquet
+    from GatherAlternative.edgar_dataset import query_numbers
+
+    market = SyntheticMarket(n_tickers=size, n_years=N_YEARS, seed=SEED)
+    data_path = workdir / "edgar"
+    if not (data_path / "dataset").exists():
+        for quarter in range(1, 5):
+            path = data_path / f"{market.end_year}_{quarter}" / "source"
+            path.mkdir(parents=True, exist_ok=True)
+            sub, num = market.edgar_quarter(market.end_year, quarter)
+            sub.to_csv(path / "sub.tsv", sep="\t", index=False)
+            num.to_csv(path / "num.tsv", sep="\t", index=False)
+        convert_to_parquet(data_path)
+        build_dataset(data_path)
+    ciks = list(range(1000000, 1000000 + min(size, 500)))
+    return lambda: query_numbers(data_path / "dataset", ciks=ciks, forms=["10-K", "10-Q"], tags=["EarningsPerShareDiluted"])
+
+
+@benchmark("edgar_index_lookup")
+def setup_edgar_index_lookup(size, workdir):
+    # ticker -> CIK -> diluted EPS history of one company through the index, on the dataset of edgar_query
+    from GatherAlternative.edgar_index import EdgarIndex
+
+    market = SyntheticMarket(n_tickers=size, n_years=N_YEARS, seed=SEED)
+    setup_edgar_query(size, workdir)
+    index = EdgarIndex(workdir / "edgar" / "dataset")
+    index.add_tickers(market.company_tickers())
+    ticker = market.tickers[size // 2]
+    return lambda: index.company_numbers(index.cik(ticker), tags=["EarningsPerShareDiluted"], forms=["10-K", "10-Q"])
+
+
+@benchmark("edgar_tag_panel")
+def setup_edgar_tag_panel(size, workdir):
+    # six tags of every company, pivoted to one column per tag, on the dataset of edgar_query
+    from GatherAlternative.edgar_panel import tag_panel
+
+    setup_edgar_query(size, workdir)
+    tags = ["EarningsPerShareDiluted", "OperatingIncomeLoss", "NetIncomeLoss", "GrossProfit", "Revenues", "Assets"]
+    return lambda: tag_panel(workdir / "edgar" / "dataset", tags)
+
+
+@benchmark("edgar_ttm")
+def setup_edgar_ttm(size, workdir):
+    # TTM values of two flows, the diluted share count and EPS for every company, on the dataset of edgar_query
+    from GatherAlternative.edgar_panel import tag_panel
+    from GatherAlternative.edgar_ttm import trailing_twelve_months
+
+    setup_edgar_query(size, workdir)
+    tags = ["Revenues", "NetIncomeLoss", "WeightedAverageNumberOfDilutedSharesOutstanding", "EarningsPerShareDiluted"]
+    panel = tag_panel(workdir / "edgar" / "dataset", tags, qtrs=[1, 4])
+    return lambda: trailing_twelve_months(panel)
+
+
+@benchmark("edgar_point_in_time")
+def setup_edgar_point_in_time(size, workdir):
+    # daily trailing P/E of every company: TTM EPS joined to closing prices by filing date
+    from GatherAlternative.edgar_point_in_time import point_in_time, valuation_ratios
+    from GatherAlternative.edgar_ttm import ttm_panel
+
+    market = SyntheticMarket(n_tickers=size, n_years=N_YEARS, seed=SEED)
+    setup_edgar_query(size, workdir)
+    ttm = ttm_panel(workdir / "edgar" / "dataset", ["EarningsPerShareDiluted"])
+    closes = pd.DataFrame({ticker: market.prices(ticker).Close for ticker in market.tickers})
+    ciks = dict(zip(market.tickers, market.ciks))
+    return lambda: valuation_ratios(point_in_time(ttm, closes, ciks))
+
+
+@benchmark("preprocess_data")
+def setup_preprocess_data(size, workdir):
+    _revenue_forecast_path()
+    from data_processing import preprocess_data
+
+    data = SyntheticMarket(n_tickers=size, n_years=N_YEARS, seed=SEED).eps_dataset()
+    return lambda: preprocess_data(data.copy())
+
+
+@benchmark("run_classification", optional=("matplotlib", "financetoolkit"))
+def setup_run_classification(size, workdir):
+    _revenue_forecast_path()
+    import matplotlib
+    matplotlib.use("Agg")
+    from workflows import Workflows
+
+    SyntheticMarket(n_tickers=size, n_years=N_YEARS, seed=SEED).eps_dataset().to_pickle(workdir / "nn_data.pkl")
+    (workdir / "plots").mkdir(exist_ok=True)
+    config = load_results(ROOT / "RevenueForecast" / "config.json")
+    config["data_path"] = str(workdir / "nn_data.pkl")
+    config["registry_path"] = str(workdir / "models")
+    # the workflow saves its plot relative to the working directory
+    os.chdir(workdir)
+    return Workflows(config).run_classification
+
+
+@benchmark("walk_forward")
+def setup_walk_forward(size, workdir):
+    # yearly expanding-window walk-forward of the LightGBM fundamentals model over the last five years
+    from AnalysisFundamental.dataset import FEATURES, prepare_dataset
+    from AnalysisFundamental.walk_forward import walk_forward
+
+    market = SyntheticMarket(n_tickers=size, n_years=N_YEARS, seed=SEED)
+    df = prepare_dataset(market.monthly_dataset().set_index(["ticker", "date"]))
+    return lambda: walk_forward(df, FEATURES, freq="Y", start=str(market.end_year - 4))
+
+
+@benchmark("feature_store_update")
+def setup_feature_store_update(size, workdir):
+    # the monthly refresh: merge the last month into a store holding the months before it
+    from AnalysisFundamental.feature_store import FeatureStore
+
+    market = SyntheticMarket(n_tickers=size, n_years=N_YEARS, seed=SEED)
+    raw = market.monthly_dataset().set_index(["ticker", "date"])
+    dates = raw.index.get_level_values("date")
+    store = FeatureStore(workdir / "features")
+    shutil.rmtree(store.path, ignore_errors=True)
+    store.update(raw[dates < dates.max()])
+    return lambda: store.update(raw[dates == dates.max()])
+
+
+@benchmark("hyperparameter_search")
+def setup_hyperparameter_search(size, workdir):
+    # successive halving of 9 configurations on the cached binned datasets of the last year's split
+    from AnalysisFundamental.dataset import FEATURES, prepare_dataset
+    from AnalysisFundamental.tuning import HyperparameterSearch
+
+    market = SyntheticMarket(n_tickers=size, n_years=N_YEARS, seed=SEED)
+    df = prepare_dataset(market.monthly_dataset().set_index(["ticker", "date"]))
+    search = HyperparameterSearch(workdir / "tuning")
+    search.build(df, FEATURES, split_date=market.end_year)
+    space = {"num_leaves": [4, 8, 16, 32], "max_depth": [4, 6, -1], "min_child_samples": [100, 200, 400]}
+    return lambda: search.successive_halving(space, n_trials=9, min_rounds=10, max_rounds=90)
+
+
+@benchmark("strategy_sweep")
+def setup_strategy_sweep(size, workdir):
+    # 500 threshold and top-k strategies, equal and score weighted, on five years of walk-forward predictions
+    from AnalysisFundamental.dataset import FEATURES, prepare_dataset
+    from AnalysisFundamental.evaluation import evaluate, strategy_grid
+    from AnalysisFundamental.walk_forward import walk_forward
+
+    market = SyntheticMarket(n_tickers=size, n_years=N_YEARS, seed=SEED)
+    df = prepare_dataset(market.monthly_dataset().set_index(["ticker", "date"]))
+    predictions, _ = walk_forward(df, FEATURES, freq="Y", start=str(market.end_year - 4))
+    strategies = strategy_grid(thresholds=np.linspace(0.3, 0.8, 200), top_k=range(1, 51), weightings=["equal", "score"])
+    return lambda: evaluate(predictions, strategies)
+
+
+@benchmark("batch_scoring")
+def setup_batch_scoring(size, workdir):
+    # the monthly rescoring: the latest row of every ticker scored with a saved model
+    from lightgbm import LGBMClassifier
+
+    from AnalysisFundamental.dataset import FEATURES, prepare_dataset
+    from AnalysisFundamental.feature_store import FeatureStore
+    from AnalysisFundamental.registry import ModelRegistry
+    from AnalysisFundamental.scoring import BatchScorer
+    from AnalysisFundamental.walk_forward import DEFAULT_PARAMS
+
+    market = SyntheticMarket(n_tickers=size, n_years=N_YEARS, seed=SEED)
+    raw = market.monthly_dataset().set_index(["ticker", "date"])
+    store = FeatureStore(workdir / "features")
+    if not store.exists():
+        store.update(raw)
+    registry = ModelRegistry(workdir / "models")
+    if not registry.versions("lightgbm_fundamentals"):
+        df = prepare_dataset(raw).dropna(subset=["target"])
+        model = LGBMClassifier(**DEFAULT_PARAMS).fit(df[FEATURES].to_numpy(dtype=np.float32), df["target"])
+        registry.save("lightgbm_fundamentals", model, FEATURES)
+    scorer = BatchScorer("lightgbm_fundamentals", registry=registry)
+    return lambda: scorer.score_store(store, workdir / "predictions.parquet")
+
+
+def _synthetic_store(market, root):
+    from GatherPrices.store import PriceStore
+
+    def download(tickers, start, end):
+        bars = {ticker: market.prices(ticker).loc[start:end - pd.Timedelta(days=1)] for ticker in tickers}
+        return pd.concat(bars, axis=1).swaplevel(axis=1)
+
+    return PriceStore(root, download=download)
+
+
+@benchmark("price_store_read")
+def setup_price_store_read(size, workdir):
+    market = SyntheticMarket(n_tickers=size, n_years=N_YEARS, seed=SEED)
+    store = _synthetic_store(market, workdir / "prices")
+    if not store.tickers():
+        store.update(market.tickers, start=market.days[0], end=market.days[-1])
+    start = market.days[-1] - pd.DateOffset(years=5)
+    return lambda: store.read(market.tickers, start=start, fields=["Adj Close"])
+
+
+@benchmark("price_store_refresh")
+def setup_price_store_refresh(size, workdir):
+    # the daily refresh: one new bar per ticker
+    market = SyntheticMarket(n_tickers=size, n_years=N_YEARS, seed=SEED)
+    store = _synthetic_store(market, workdir / "prices")
+    if not store.tickers():
+        store.update(market.tickers, start=market.days[0], end=market.days[-2])
+    # rewind the last year to the day before, undoing the previous repeat
+    last_year = market.days[-1].year
+    for ticker in market.tickers:
+        shutil.rmtree(store.root / f"ticker={ticker}" / f"year={last_year}", ignore_errors=True)
+        store.append(ticker, market.prices(ticker).loc[str(last_year):market.days[-2]])
+    return lambda: store.update(market.tickers, end=market.days[-1] + pd.Timedelta(days=1))
+
+
+@benchmark("price_panel_returns")
+def setup_price_panel_returns(size, workdir):
+    # opening the panel and slicing five years of returns, after the returns have been derived once
+    from GatherPrices.panel import PricePanel
+
+    market = SyntheticMarket(n_tickers=size, n_years=N_YEARS, seed=SEED)
+    if not (workdir / "panel" / "meta.json").exists():
+        store = _synthetic_store(market, workdir / "prices")
+        store.update(market.tickers, start=market.days[0], end=market.days[-1] + pd.Timedelta(days=1))
+        PricePanel.from_store(store, workdir / "panel").returns()
+    start = market.days[-1] - pd.DateOffset(years=5)
+    return lambda: PricePanel(workdir / "panel").returns("Adj Close", market.tickers, start).to_numpy().sum()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--benchmarks", nargs="+", default=list(BENCHMARKS), choices=list(BENCHMARKS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 1000], help="universe sizes (number of tickers)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="results file, Benchmarks/results/<commit>.json by default")
+    parser.add_argument("--compare", help="results file of the baseline commit")
+    parser.add_argument("--time-threshold", type=float, default=0.1, help="allowed relative increase of wall time")
+    parser.add_argument("--memory-threshold", type=float, default=0.1, help="allowed relative increase of memory")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.benchmarks, args.sizes, args.repeats)
+    output = args.output or RESULTS_DIR / f"{results['commit']}.json"
+    save_results(results, output)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        regressions = compare(load_results(args.compare), results, args.time_threshold, args.memory_threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression['benchmark']} at {regression['size']}: {regression['metric']} "
+                  f"{regression['baseline']:.3f} -> {regression['current']:.3f} ({regression['change']:+.0%})")
+        if regressions:
+            return 1
+        print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,7 +8,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', ))
 import streamlit as st
 import plotly.express as px
 import pandas as pd
-from GatherFundamental.calculate_ratios import get_fundamentals_dict
+from GatherFundamental.calculate_ratios import get_fundamentals
 
 # Define ticker collections
 ticker_collections = {
@@ -29,22 +29,8 @@ with right_column:
     stocks = ticker_collections[selected_collection]
 
 # Prepare data
-data = {
-    'Stock': [],
-    'PE Ratio': [],
-    'Cash Ratio': [],
-    'Market Cap': []
-}
-
-for stock in stocks:
-    metrics = get_fundamentals_dict(stock, ["PE Ratio", "Cash Ratio", "Market Cap"])
-    data['Stock'].append(stock)
-    data['PE Ratio'].append(metrics['PE Ratio'])
-    data['Cash Ratio'].append(metrics['Cash Ratio'])
-    data['Market Cap'].append(metrics['Market Cap'])
-
-# Convert to DataFrame
-df = pd.DataFrame(data)
+df = get_fundamentals(stocks, ["PE Ratio", "Cash Ratio", "Market Cap"])
+df = df.rename_axis("Stock").reset_index()
 
 # Create bubble chart using plotly express
 fig = px.scatter(
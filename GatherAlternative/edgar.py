@@ -1,106 +1,149 @@
-import requests
-from io import BytesIO
-from zipfile import ZipFile, BadZipFile
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))) # add parent dir - for GatherFundamental
 from pathlib import Path
-from tqdm import tqdm
 import pandas as pd
-from openbb import obb
-
-# Set the URLs to Edgar's data repository
-SEC_URL = "<https://www.sec.gov/>"
-FSN_PATH = "files/dera/data/financial-statement-and-notes-data-sets/"
-DATA_PATH = Path("edgar")
-user_agent = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
-
-
-
-
-filing_periods = [
-    (d.year, d.quarter) for d in pd.date_range("2015", "2015-12-31", freq="QE")
-]
-
-for yr, qtr in tqdm(filing_periods):
-    path = DATA_PATH / f"{yr}_{qtr}" / "source"
-    if not path.exists():
-        path.mkdir(parents=True)
-    filing = f"{yr}q{qtr}_notes.zip"
-    url = f"{SEC_URL}{FSN_PATH}{filing}"
-    response = requests.get(url, headers={"User-Agent": user_agent}).content
-    with ZipFile(BytesIO(response)) as zip_file:
-        for file in zip_file.namelist():
-            local_file = path / file
-            if local_file.exists():
-                continue
-            with local_file.open("wb") as output:
-                for line in zip_file.open(file).readlines():
-                    output.write(line)
-                    
-                    
-for f in tqdm(sorted(list(DATA_PATH.glob("**/*.tsv")))):
-    parquet_path = f.parent.parent / "parquet"
-    if not parquet_path.exists():
-        parquet_path.mkdir(parents=True)
-    file_name = f.stem + ".parquet"
-    if not (parquet_path / file_name).exists():
-        df = pd.read_csv(
-            f, sep="\\t", encoding="latin1", low_memory=False, on_bad_lines="skip"
-        )
-        df.to_parquet(parquet_path / file_name)
-        f.unlink()
-        
-sub = pd.read_parquet(DATA_PATH / '2015_3' / 'parquet' / 'sub.parquet')
-name = "APPLE INC"
-cik = sub[sub.name == name].T.dropna().squeeze().cik
-aapl_subs = pd.DataFrame()
-for sub in DATA_PATH.glob("**/sub.parquet"):
-    sub = pd.read_parquet(sub)
-    aapl_sub = sub[
-        (sub.cik.astype(int) == cik) & (sub.form.isin(["10-Q", "10-K"]))
-    ]
-    aapl_subs = pd.concat([aapl_subs, aapl_sub])
-    
-    
-aapl_nums = pd.DataFrame()
-for num in DATA_PATH.glob("**/num.parquet"):
-    num = pd.read_parquet(num).drop("dimh", axis=1)
-    aapl_num = num[num.adsh.isin(aapl_subs.adsh)]
-    aapl_nums = pd.concat([aapl_nums, aapl_num])
-aapl_nums.ddate = pd.to_datetime(aapl_nums.ddate, format="%Y%m%d")
-aapl_nums.to_parquet(DATA_PATH / "aapl_nums.parquet")
-
-eps = aapl_nums[
-    (aapl_nums.tag == "EarningsPerShareDiluted") & (aapl_nums.qtrs == 1)
-].drop("tag", axis=1)
-eps = eps.groupby("adsh").apply(
-    lambda x: x.nlargest(n=1, columns=["ddate"]), include_groups=False
-)
-eps = eps[["ddate", "value"]].set_index("ddate").squeeze().sort_index()
-ax = eps.plot.bar()
-ax.set_xticklabels(eps.index.to_period("Q"));
-
-
-aapl = (
-    obb.equity.price.historical(
-        "AAPL", start_date="2014-12-31", end_date=eps.index.max(), provider="yfinance"
-    )
-    .to_df()
-    .resample("D")
-    .last()
-    .loc["2014":"2015"]
-)
-
-pe = aapl.close.to_frame("price").join(eps.to_frame("eps")).ffill().dropna()
-pe["pe_ratio"] = pe.price.div(pe.eps)
-ax = pe.plot(subplots=True, figsize=(16, 8), legend=False, lw=0.5)
-ax[0].set_title("Adj Close")
-ax[1].set_title("Diluted EPS")
-ax[2].set_title("Trailing P/E")
-
-
-
-# possible next ones:
-# • PaymentsOfDividendsCommonStock
-# • WeightedAverageNumberOfDilutedSharesOutstanding
-# • OperatingIncomeLoss
-# • NetIncomeLoss
-# • GrossProfit
\ No newline at end of file
+
+# The URLs to Edgar's data repository are set in edgar_ingest
+from GatherAlternative.edgar_ingest import SEC_URL, FSN_PATH, DATA_PATH, ingest_quarters
+from GatherAlternative.edgar_convert import convert_all
+from GatherAlternative.edgar_dataset import consolidate, query_numbers, query_submissions
+from GatherAlternative.edgar_index import EdgarIndex
+from GatherAlternative.edgar_panel import pivot_tags, tag_panel
+from GatherAlternative.edgar_ttm import ttm_panel
+from GatherAlternative.edgar_point_in_time import point_in_time
+
+
+def get_filing_periods(start="2015", end="2015-12-31") -> list:
+    """
+    Return the (year, quarter) pairs of the EDGAR financial statement and notes data sets between two dates.
+    """
+    return [(d.year, d.quarter) for d in pd.date_range(start, end, freq="QE")]
+
+
+def download_filings(filing_periods: list, data_path: Path = DATA_PATH, max_workers: int = 4):
+    """
+    Download and unzip the EDGAR financial statement and notes data sets into {data_path}/{yr}_{qtr}/source.
+
+    Archives are streamed to disk and several quarters are processed concurrently, see
+    GatherAlternative.edgar_ingest.ingest_quarters. Quarters that fail are logged and resumed on the next run.
+
+    Parameters:
+    filing_periods (list): The (year, quarter) pairs to download, see get_filing_periods.
+    data_path (Path): Root directory of the EDGAR data.
+    max_workers (int): Number of quarters downloaded concurrently.
+
+    Returns:
+    tuple: The extracted files per ingested quarter and the error per failed quarter.
+    """
+    return ingest_quarters(filing_periods, data_path, max_workers=max_workers)
+
+
+def convert_to_parquet(data_path: Path = DATA_PATH, max_workers: int = None):
+    """
+    Convert every downloaded TSV file to Parquet in {data_path}/{yr}_{qtr}/parquet, removing the TSV files.
+
+    Tables are converted with explicit column types, block by block and in parallel processes, see
+    GatherAlternative.edgar_convert.convert_all.
+    """
+    return convert_all(data_path, max_workers=max_workers)
+
+
+def build_dataset(data_path: Path = DATA_PATH) -> list:
+    """
+    Add the converted periods to the partitioned dataset in {data_path}/dataset and to its index, see
+    GatherAlternative.edgar_dataset.consolidate and GatherAlternative.edgar_index.EdgarIndex.
+    Periods already in the dataset are skipped.
+    """
+    added = consolidate(data_path)
+    EdgarIndex(data_path / "dataset").update()
+    return added
+
+
+def get_company_cik(name: str, data_path: Path = DATA_PATH) -> int:
+    """
+    Look up the CIK of a company by its registrant name (e.g. "APPLE INC") or ticker in the dataset's index.
+    """
+    return EdgarIndex(data_path / "dataset").cik(name)
+
+
+def get_company_filings(cik: int, data_path: Path = DATA_PATH, forms: list = ["10-Q", "10-K"]):
+    """
+    Collect the submissions and numbers of one company from the partitioned dataset (see build_dataset).
+
+    Parameters:
+    cik (int): Central index key of the company.
+    data_path (Path): Root directory of the EDGAR data.
+    forms (list): The forms to keep.
+
+    Returns:
+    tuple: The company's `sub` rows and its `num` rows (without 'dimh').
+    """
+    company_subs = query_submissions(data_path / "dataset", ciks=[int(cik)], forms=forms)
+    company_nums = query_numbers(data_path / "dataset", ciks=[int(cik)], forms=forms).drop("dimh", axis=1)
+    return company_subs, company_nums
+
+
+def get_quarterly_values(nums: pd.DataFrame, tag: str = "EarningsPerShareDiluted") -> pd.Series:
+    """
+    Return the quarterly (qtrs == 1) values of a tag, taking the latest period reported in each filing.
+
+    Use GatherAlternative.edgar_panel.pivot_tags for many tags or companies at once.
+    """
+    values = pivot_tags(nums, [tag], qtrs=[1])[tag].dropna()
+    return values.droplevel(["cik", "qtrs"]).sort_index()
+
+
+def plot_trailing_pe(ticker: str, ttm: pd.DataFrame, start_date="2014-12-31"):
+    """
+    Plot the price, trailing diluted EPS and trailing P/E of a company, reading prices through OpenBB.
+
+    EPS values are used from the day after they were filed, see GatherAlternative.edgar_point_in_time.
+
+    Parameters:
+    ticker (str): The company's ticker.
+    ttm (pd.DataFrame): The company's TTM values with an 'EarningsPerShareDiluted' column, see
+    GatherAlternative.edgar_ttm.ttm_panel.
+    start_date (str): First day of prices.
+    """
+    from openbb import obb
+
+    prices = obb.equity.price.historical(ticker, start_date=start_date, provider="yfinance").to_df()
+    cik = ttm.index.get_level_values("cik")[0]
+    joined = point_in_time(ttm, prices.close.to_frame(ticker), {ticker: cik}).xs(ticker, level="Ticker")
+
+    pe = joined[["price", "EarningsPerShareDiluted"]].set_axis(["price", "eps"], axis=1).dropna()
+    pe["pe_ratio"] = pe.price.div(pe.eps)
+    ax = pe.plot(subplots=True, figsize=(16, 8), legend=False, lw=0.5)
+    ax[0].set_title("Close")
+    ax[1].set_title("Diluted EPS (TTM)")
+    ax[2].set_title("Trailing P/E")
+    return pe
+
+
+if __name__ == "__main__":
+    download_filings(get_filing_periods("2015", "2015-12-31"))
+    convert_to_parquet()
+    build_dataset()
+
+    cik = get_company_cik("APPLE INC")
+    aapl_subs, aapl_nums = get_company_filings(cik)
+    aapl_nums.to_parquet(DATA_PATH / "aapl_nums.parquet")
+
+    eps = get_quarterly_values(aapl_nums, "EarningsPerShareDiluted")
+    ax = eps.plot.bar()
+    ax.set_xticklabels(eps.index.to_period("Q"))
+
+    aapl_ttm = ttm_panel(DATA_PATH / "dataset", ["EarningsPerShareDiluted"], ciks=[cik])
+    plot_trailing_pe("AAPL", aapl_ttm)
+
+    # the same and further tags for every company at once
+    panel = tag_panel(DATA_PATH / "dataset", [
+        "EarningsPerShareDiluted",
+        "PaymentsOfDividendsCommonStock",
+        "WeightedAverageNumberOfDilutedSharesOutstanding",
+        "OperatingIncomeLoss",
+        "NetIncomeLoss",
+        "GrossProfit",
+    ])
+    ttm = ttm_panel(DATA_PATH / "dataset", ["Revenues", "NetIncomeLoss", "EarningsPerShareDiluted"])
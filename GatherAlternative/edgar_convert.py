@@ -0,0 +1,154 @@
+"""
+Typed conversion of the EDGAR financial statement and notes TSV files to Parquet.
+
+Every table has an explicit schema (see SCHEMAS): repeated strings (adsh in num, tag, version, uom, form, ...)
+are dictionary encoded, flags are booleans, counts are small integers and yyyymmdd fields are dates.
+Files are read in blocks and written one row group per block, so memory does not depend on the file
+size, and several files are converted at once in a process pool.
+"""
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.csv as csv
+import pyarrow.parquet as pq
+
+
+logger = logging.getLogger(__name__)
+
+BLOCK_SIZE = 64 * 1024 ** 2
+COMPRESSION = "zstd"
+
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+DATE = pa.timestamp("s")
+
+# column types of the tables of the financial statement and notes data sets, see the SEC's readme
+SCHEMAS = {
+    "sub": {
+        "adsh": pa.string(), "cik": pa.int64(), "name": CATEGORY, "sic": pa.int16(), "countryba": CATEGORY,
+        "stprba": CATEGORY, "cityba": CATEGORY, "zipba": pa.string(), "bas1": pa.string(), "bas2": pa.string(),
+        "baph": pa.string(), "countryma": CATEGORY, "stprma": CATEGORY, "cityma": CATEGORY, "zipma": pa.string(),
+        "mas1": pa.string(), "mas2": pa.string(), "countryinc": CATEGORY, "stprinc": CATEGORY, "ein": pa.int64(),
+        "former": pa.string(), "changed": DATE, "afs": CATEGORY, "wksi": pa.bool_(), "fye": CATEGORY,
+        "form": CATEGORY, "period": DATE, "fy": pa.int16(), "fp": CATEGORY, "filed": DATE,
+        "accepted": pa.timestamp("s"), "prevrpt": pa.bool_(), "detail": pa.bool_(), "instance": pa.string(),
+        "nciks": pa.int16(), "aciks": pa.string(), "pubfloatusd": pa.float64(), "floatdate": DATE,
+        "floataxis": pa.string(), "floatmems": pa.int16(),
+    },
+    "num": {
+        "adsh": CATEGORY, "tag": CATEGORY, "version": CATEGORY, "ddate": DATE, "qtrs": pa.int16(), "uom": CATEGORY,
+        "dimh": CATEGORY, "iprx": pa.int16(), "value": pa.float64(), "footnote": pa.string(), "footlen": pa.int32(),
+        "dimn": pa.int16(), "coreg": CATEGORY, "durp": pa.float32(), "datp": pa.float32(), "dcml": pa.int32(),
+    },
+    "txt": {
+        "adsh": CATEGORY, "tag": CATEGORY, "version": CATEGORY, "ddate": DATE, "qtrs": pa.int16(), "iprx": pa.int16(),
+        "lang": CATEGORY, "dcml": pa.int32(), "durp": pa.float32(), "datp": pa.float32(), "dimh": CATEGORY,
+        "dimn": pa.int16(), "coreg": CATEGORY, "escaped": pa.bool_(), "srclen": pa.int32(), "txtlen": pa.int32(),
+        "footnote": pa.string(), "footlen": pa.int32(), "context": pa.string(), "value": pa.string(),
+    },
+    "tag": {
+        "tag": pa.string(), "version": CATEGORY, "custom": pa.bool_(), "abstract": pa.bool_(), "datatype": CATEGORY,
+        "iord": CATEGORY, "crdr": CATEGORY, "tlabel": pa.string(), "doc": pa.string(),
+    },
+    "pre": {
+        "adsh": CATEGORY, "report": pa.int16(), "line": pa.int16(), "stmt": CATEGORY, "inpth": pa.bool_(),
+        "rfile": CATEGORY, "tag": CATEGORY, "version": CATEGORY, "plabel": pa.string(), "negating": pa.bool_(),
+    },
+    "ren": {
+        "adsh": CATEGORY, "report": pa.int16(), "rfile": CATEGORY, "menucat": CATEGORY, "shortname": pa.string(),
+        "longname": pa.string(), "roleuri": pa.string(), "parentroleuri": pa.string(), "parentreport": pa.int16(),
+        "ultparentrpt": pa.int16(),
+    },
+    "cal": {
+        "adsh": CATEGORY, "grp": pa.int16(), "arc": pa.int16(), "negative": pa.int8(), "ptag": CATEGORY,
+        "pversion": CATEGORY, "ctag": CATEGORY, "cversion": CATEGORY,
+    },
+    "dim": {
+        "dimhash": pa.string(), "segments": pa.string(), "segt": pa.bool_(),
+    },
+}
+
+
+def convert_file(source: Path, destination: Path, block_size: int = BLOCK_SIZE, remove_source: bool = True) -> Path:
+    """
+    Convert one TSV file of the notes data sets to Parquet, reading and writing it block by block.
+
+    Columns of known tables are typed after SCHEMAS; other columns are read as dictionary encoded strings.
+    Lines that cannot be parsed are skipped, like pd.read_csv(on_bad_lines="skip").
+
+    Parameters:
+    source (Path): The TSV file, e.g. {yr}_{qtr}/source/num.tsv.
+    destination (Path): The Parquet file to write.
+    block_size (int): Number of bytes of TSV read at a time, each becoming a row group.
+    remove_source (bool): Whether to remove the TSV file once converted.
+
+    Returns:
+    Path: The destination.
+    """
+    source, destination = Path(source), Path(destination)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    types = SCHEMAS.get(source.stem, {})
+    reader = csv.open_csv(
+        source,
+        read_options=csv.ReadOptions(block_size=block_size, encoding="latin1"),
+        # the files are not quoted, a quote is part of the value
+        parse_options=csv.ParseOptions(delimiter="\t", quote_char=False, invalid_row_handler=lambda row: "skip"),
+        convert_options=csv.ConvertOptions(
+            column_types=types, timestamp_parsers=["%Y%m%d", "%Y-%m-%d %H:%M:%S.0", "%Y-%m-%d %H:%M:%S"],
+            strings_can_be_null=True, auto_dict_encode=True, auto_dict_max_cardinality=2 ** 31 - 1,
+        ),
+    )
+    temporary = destination.with_name(destination.name + ".tmp")
+    schema = pa.schema([
+        pa.field(field.name, types.get(field.name, CATEGORY if pa.types.is_dictionary(field.type) or pa.types.is_string(field.type) else field.type))
+        for field in reader.schema
+    ])
+    try:
+        with pq.ParquetWriter(temporary, schema, compression=COMPRESSION) as writer:
+            for batch in reader:
+                writer.write_batch(batch.cast(schema) if batch.schema != schema else batch)
+        os.replace(temporary, destination)
+    except BaseException:
+        temporary.unlink(missing_ok=True)
+        raise
+    if remove_source:
+        source.unlink()
+    return destination
+
+
+def convert_all(data_path: Path, max_workers: int = None, block_size: int = BLOCK_SIZE) -> dict:
+    """
+    Convert every TSV file below {data_path}/{yr}_{qtr}/source to {data_path}/{yr}_{qtr}/parquet, in parallel.
+
+    Files that were converted before are skipped (and their TSV left in place).
+
+    Parameters:
+    data_path (Path): Root directory of the EDGAR data.
+    max_workers (int): Number of worker processes, one per CPU by default.
+    block_size (int): Number of bytes of TSV read at a time per file.
+
+    Returns:
+    dict: The Parquet file written for each TSV file, and None for the files that failed.
+    """
+    tasks = {}
+    for source in sorted(Path(data_path).glob("**/*.tsv")):
+        destination = source.parent.parent / "parquet" / (source.stem + ".parquet")
+        if not destination.exists():
+            tasks[source] = destination
+    converted = {}
+    if not tasks:
+        return converted
+    # the largest files first, so that they do not end up running alone at the end
+    order = sorted(tasks, key=lambda source: source.stat().st_size, reverse=True)
+    with ProcessPoolExecutor(max_workers=min(max_workers or os.cpu_count() or 1, len(order))) as executor:
+        futures = {executor.submit(convert_file, source, tasks[source], block_size): source for source in order}
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                converted[source] = future.result()
+            except Exception as error:
+                logger.warning(f"Failed to convert {source}: {error}")
+                converted[source] = None
+    return converted
@@ -0,0 +1,177 @@
+"""
+One partitioned Parquet dataset over all converted EDGAR quarters, queried with predicate pushdown.
+
+consolidate() writes {dataset}/sub/quarter={yr}_{qtr}/part.parquet and {dataset}/num/quarter={yr}_{qtr}/part.parquet.
+Submissions are sorted by (cik, adsh). Numbers carry the cik, form and filing fields of their submission and
+are sorted by (cik, adsh, tag), in row groups of 16k rows. The Parquet statistics of every row group therefore
+cover a narrow range of CIKs, and a query for a set of companies only reads the row groups that hold them.
+"""
+import os
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from GatherAlternative.edgar_convert import COMPRESSION, SCHEMAS
+
+
+ROW_GROUP_SIZE = 16 * 1024
+# fields of the submission copied onto every number, so that numbers can be filtered without a join
+SUBMISSION_FIELDS = ["cik", "form", "fy", "fp", "filed"]
+
+
+def _dictionary(table: pa.Table, column: str) -> pa.Table:
+    array = table.column(column)
+    if pa.types.is_dictionary(array.type):
+        return table
+    return table.set_column(table.schema.get_field_index(column), column, pc.dictionary_encode(array))
+
+
+def _plain(table: pa.Table, column: str) -> pa.Table:
+    # joins and sorts need plain values
+    array = table.column(column)
+    if not pa.types.is_dictionary(array.type):
+        return table
+    return table.set_column(table.schema.get_field_index(column), column, array.cast(array.type.value_type))
+
+
+def _write(table: pa.Table, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(path.name + ".tmp")
+    pq.write_table(table, temporary, row_group_size=ROW_GROUP_SIZE, compression=COMPRESSION)
+    os.replace(temporary, path)
+
+
+def consolidate_quarter(quarter_path: Path, dataset_path: Path) -> bool:
+    """
+    Add one converted quarter ({yr}_{qtr}/parquet/sub.parquet and num.parquet) to the dataset.
+
+    Returns:
+    bool: False if the quarter was in the dataset already or has not been converted.
+    """
+    quarter = Path(quarter_path).name
+    sub_target = Path(dataset_path) / "sub" / f"quarter={quarter}" / "part.parquet"
+    num_target = Path(dataset_path) / "num" / f"quarter={quarter}" / "part.parquet"
+    source = Path(quarter_path) / "parquet"
+    if num_target.exists() or not (source / "sub.parquet").exists() or not (source / "num.parquet").exists():
+        return False
+
+    sub = _plain(pq.read_table(source / "sub.parquet"), "adsh")
+    sub = sub.sort_by([("cik", "ascending"), ("adsh", "ascending")])
+
+    num = _plain(_plain(pq.read_table(source / "num.parquet"), "adsh"), "tag")
+    num = num.join(sub.select(["adsh"] + [field for field in SUBMISSION_FIELDS if field in sub.column_names]), "adsh", join_type="inner")
+    num = num.sort_by([("cik", "ascending"), ("adsh", "ascending"), ("tag", "ascending")])
+    for column in ("adsh", "tag", "form"):
+        if column in num.column_names:
+            num = _dictionary(num, column)
+
+    # numbers last: a quarter counts as consolidated once its numbers are written
+    _write(sub, sub_target)
+    _write(num, num_target)
+    return True
+
+
+def consolidate(data_path: Path, dataset_path: Path = None) -> list:
+    """
+    Add every converted quarter below data_path to the dataset, skipping quarters already in it.
+
+    Parameters:
+    data_path (Path): Root directory of the EDGAR data, holding {yr}_{qtr}/parquet.
+    dataset_path (Path): Directory of the dataset, {data_path}/dataset by default.
+
+    Returns:
+    list: The quarters added.
+    """
+    dataset_path = Path(dataset_path or Path(data_path) / "dataset")
+    added = []
+    for quarter_path in sorted(Path(data_path).glob("*_*")):
+        if quarter_path.is_dir() and consolidate_quarter(quarter_path, dataset_path):
+            added.append(quarter_path.name)
+    return added
+
+
+def dataset_schema(table: str) -> pa.Schema:
+    """
+    The schema of the sub or num table of the dataset: every column of the SEC's readme (see
+    GatherAlternative.edgar_convert.SCHEMAS), the submission fields of numbers and the quarter.
+
+    Quarters are read with this schema rather than the one of the first quarter found, so a column that
+    some quarters lack (e.g. coreg in older data sets) reads as nulls there instead of disappearing.
+    """
+    types = dict(SCHEMAS[table])
+    if table == "num":
+        types.update({field: SCHEMAS["sub"][field] for field in SUBMISSION_FIELDS})
+    fields = [
+        # Parquet has no timestamps in seconds, they are stored and read back in milliseconds
+        (name, pa.timestamp("ms") if pa.types.is_timestamp(type_) and type_.unit == "s" else type_)
+        for name, type_ in types.items()
+    ]
+    return pa.schema(fields + [("quarter", pa.string())])
+
+
+def _dataset(dataset_path: Path, table: str) -> ds.Dataset:
+    schema = dataset_schema(table)
+    partitioning = ds.partitioning(pa.schema([schema.field("quarter")]), flavor="hive")
+    return ds.dataset(Path(dataset_path) / table, schema=schema, format="parquet", partitioning=partitioning)
+
+
+def _filter(ciks=None, forms=None, tags=None, qtrs=None, adshs=None):
+    conditions = []
+    if ciks is not None:
+        conditions.append(ds.field("cik").isin(pa.array(list(ciks), pa.int64())))
+    if forms is not None:
+        conditions.append(ds.field("form").isin(list(forms)))
+    if tags is not None:
+        conditions.append(ds.field("tag").isin(list(tags)))
+    if qtrs is not None:
+        conditions.append(ds.field("qtrs").isin(pa.array(list(qtrs), pa.int16())))
+    if adshs is not None:
+        conditions.append(ds.field("adsh").isin(list(adshs)))
+    condition = None
+    for part in conditions:
+        condition = part if condition is None else condition & part
+    return condition
+
+
+def query_submissions(dataset_path: Path, ciks: list = None, forms: list = None, columns: list = None):
+    """
+    Read the submissions of some companies and forms from the dataset.
+
+    Parameters:
+    dataset_path (Path): Directory of the dataset, see consolidate.
+    ciks (list): The CIKs to read, all by default.
+    forms (list): The forms to read (e.g. ["10-K", "10-Q"]), all by default.
+    columns (list): The columns to read, all by default.
+
+    Returns:
+    pd.DataFrame: The matching `sub` rows.
+    """
+    return _dataset(dataset_path, "sub").to_table(columns=columns, filter=_filter(ciks, forms)).to_pandas()
+
+
+def query_numbers(dataset_path: Path, ciks: list = None, forms: list = None, tags: list = None, qtrs: list = None,
+                  columns: list = None):
+    """
+    Read the numbers of some companies, forms and tags from the dataset.
+
+    Only row groups whose statistics overlap the CIKs (and the other conditions) are read, so the cost of
+    a query grows with the size of its result, not with the number of quarters in the dataset.
+
+    Parameters:
+    dataset_path (Path): Directory of the dataset, see consolidate.
+    ciks (list): The CIKs to read, all by default.
+    forms (list): The forms of the submissions to read, e.g. ["10-K", "10-Q"], all by default.
+    tags (list): The tags to read, e.g. ["EarningsPerShareDiluted"], all by default.
+    qtrs (list): The durations in quarters to read, e.g. [1] for quarterly values, all by default.
+    columns (list): The columns to read, all by default.
+
+    Returns:
+    pd.DataFrame: The matching `num` rows, with the cik, form, fy, fp and filed fields of their submission.
+
+    Example:
+    >>> eps = query_numbers(DATA_PATH / "dataset", ciks=[320193], forms=["10-K", "10-Q"], tags=["EarningsPerShareDiluted"])
+    """
+    return _dataset(dataset_path, "num").to_table(columns=columns, filter=_filter(ciks, forms, tags, qtrs)).to_pandas()
@@ -0,0 +1,271 @@
+"""
+Persistent inverted index over the partitioned EDGAR dataset (see GatherAlternative.edgar_dataset).
+
+The index is a SQLite database mapping tickers and registrant names to CIKs, CIKs to their filings (adsh),
+and every (adsh, tag) pair to the rows holding it in {dataset}/num/quarter={yr}_{qtr}/part.parquet. The
+numbers of a quarter are sorted by (cik, adsh, tag), so each pair is one contiguous run of rows, stored as
+a start row and a row count. Quarters are indexed once, when they are added to the dataset, and a lookup
+only touches the index and the row groups holding the requested rows.
+"""
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import requests
+
+from GatherAlternative.edgar_ingest import SEC_URL, USER_AGENT
+
+
+COMPANY_TICKERS_URL = SEC_URL + "files/company_tickers.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quarters (quarter TEXT PRIMARY KEY, rows INTEGER);
+CREATE TABLE IF NOT EXISTS names (name TEXT PRIMARY KEY, cik INTEGER) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tickers (ticker TEXT PRIMARY KEY, cik INTEGER) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tags (id INTEGER PRIMARY KEY, tag TEXT UNIQUE);
+CREATE TABLE IF NOT EXISTS filings (
+    id INTEGER PRIMARY KEY, adsh TEXT UNIQUE, cik INTEGER, name TEXT, form TEXT, fy INTEGER, fp TEXT,
+    period TEXT, filed TEXT, quarter TEXT
+);
+CREATE INDEX IF NOT EXISTS filings_cik ON filings (cik, filed);
+CREATE TABLE IF NOT EXISTS locations (
+    filing INTEGER, tag INTEGER, start INTEGER, count INTEGER, PRIMARY KEY (filing, tag)
+) WITHOUT ROWID;
+"""
+
+
+def _dates(series: pd.Series) -> list:
+    return [None if pd.isna(value) else str(value.date()) for value in pd.to_datetime(series)]
+
+
+def _runs(table: pa.Table):
+    # start row and length of every run of equal (adsh, tag) in a table sorted by (cik, adsh, tag)
+    if not table.num_rows:
+        return pd.DataFrame({"adsh": [], "tag": [], "start": [], "count": []})
+    columns = {}
+    for name in ("adsh", "tag"):
+        array = table.column(name).unify_dictionaries().combine_chunks() if pa.types.is_dictionary(table.column(name).type) \
+            else table.column(name).combine_chunks().dictionary_encode()
+        columns[name] = (array.indices.to_numpy(zero_copy_only=False), array.dictionary.to_numpy(zero_copy_only=False))
+    adsh, adsh_values = columns["adsh"]
+    tag, tag_values = columns["tag"]
+    starts = np.flatnonzero(np.r_[True, (adsh[1:] != adsh[:-1]) | (tag[1:] != tag[:-1])])
+    counts = np.diff(np.r_[starts, len(adsh)])
+    return pd.DataFrame({"adsh": adsh_values[adsh[starts]], "tag": tag_values[tag[starts]], "start": starts, "count": counts})
+
+
+class EdgarIndex:
+    """
+    Inverted index over the EDGAR dataset: ticker/name -> CIK -> filings -> (adsh, tag) -> rows.
+
+    Parameters:
+    dataset_path (Path): Directory of the dataset, see GatherAlternative.edgar_dataset.consolidate.
+    path (Path): The SQLite database, {dataset_path}/index.sqlite by default.
+
+    Example:
+    >>> index = EdgarIndex(DATA_PATH / "dataset")
+    >>> index.update()
+    >>> eps = index.company_numbers(index.cik("APPLE INC"), tags=["EarningsPerShareDiluted"], forms=["10-K", "10-Q"])
+    """
+
+    def __init__(self, dataset_path: Path, path: Path = None):
+        self.dataset_path = Path(dataset_path)
+        self.path = Path(path or self.dataset_path / "index.sqlite")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._files = {}
+        with self._connection() as connection:
+            connection.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # one connection per thread, as sqlite3 connections cannot be shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.path)
+            connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def quarters(self) -> list:
+        """The quarters in the index."""
+        return [row[0] for row in self._connection().execute("SELECT quarter FROM quarters ORDER BY quarter")]
+
+    def update(self) -> list:
+        """
+        Index the quarters of the dataset that are not in the index yet.
+
+        Each quarter is indexed in one transaction, so an interrupted update leaves no partial quarter behind.
+
+        Returns:
+        list: The quarters added.
+        """
+        indexed = set(self.quarters())
+        added = []
+        for part in sorted((self.dataset_path / "num").glob("quarter=*/part.parquet")):
+            quarter = part.parent.name.split("=", 1)[1]
+            sub_part = self.dataset_path / "sub" / part.parent.name / "part.parquet"
+            if quarter not in indexed and sub_part.exists():
+                self._add_quarter(quarter, sub_part, part)
+                added.append(quarter)
+        return added
+
+    def _add_quarter(self, quarter: str, sub_part: Path, num_part: Path):
+        sub = pq.read_table(sub_part, columns=["adsh", "cik", "name", "form", "fy", "fp", "period", "filed"]).to_pandas()
+        num = pq.read_table(num_part, columns=["adsh", "tag"])
+        runs = _runs(num)
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO filings (adsh, cik, name, form, fy, fp, period, filed, quarter) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                zip(sub.adsh.astype(str), sub.cik.astype(int).tolist(), sub.name.astype(str), sub.form.astype(str),
+                    [None if pd.isna(fy) else int(fy) for fy in sub.fy], sub.fp.astype(object).where(sub.fp.notna(), None),
+                    _dates(sub.period), _dates(sub.filed), [quarter] * len(sub)),
+            )
+            # the latest filing decides the current name of a company
+            latest = sub.sort_values("filed").drop_duplicates("cik", keep="last")
+            connection.executemany(
+                "INSERT OR REPLACE INTO names (name, cik) VALUES (?, ?)",
+                zip(latest.name.astype(str).str.upper(), latest.cik.astype(int).tolist()),
+            )
+            connection.executemany("INSERT OR IGNORE INTO tags (tag) VALUES (?)", ((tag,) for tag in runs.tag.unique()))
+            filing_ids = dict(connection.execute("SELECT adsh, id FROM filings WHERE quarter = ?", (quarter,)))
+            tag_ids = dict(connection.execute("SELECT tag, id FROM tags"))
+            connection.executemany(
+                "INSERT OR REPLACE INTO locations (filing, tag, start, count) VALUES (?, ?, ?, ?)",
+                zip(runs.adsh.map(filing_ids).tolist(), runs.tag.map(tag_ids).tolist(), runs.start.tolist(), runs["count"].tolist()),
+            )
+            connection.execute("INSERT OR REPLACE INTO quarters (quarter, rows) VALUES (?, ?)", (quarter, num.num_rows))
+
+    def add_tickers(self, tickers: pd.DataFrame):
+        """
+        Add ticker to CIK mappings, e.g. from download_company_tickers.
+
+        Parameters:
+        tickers (pd.DataFrame): Frame with the columns 'ticker' and 'cik', and optionally 'title'.
+        """
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO tickers (ticker, cik) VALUES (?, ?)",
+                zip(tickers.ticker.astype(str).str.upper(), tickers.cik.astype(int).tolist()),
+            )
+            if "title" in tickers:
+                connection.executemany(
+                    "INSERT OR IGNORE INTO names (name, cik) VALUES (?, ?)",
+                    zip(tickers.title.astype(str).str.upper(), tickers.cik.astype(int).tolist()),
+                )
+
+    def cik(self, company: str):
+        """
+        Resolve a ticker (e.g. "AAPL") or registrant name (e.g. "APPLE INC") to its CIK.
+
+        Returns:
+        int: The CIK, or None if the company is unknown.
+        """
+        connection = self._connection()
+        for table, column in (("tickers", "ticker"), ("names", "name")):
+            row = connection.execute(f"SELECT cik FROM {table} WHERE {column} = ?", (company.upper(),)).fetchone()
+            if row:
+                return row[0]
+        return None
+
+    def filings(self, cik: int, forms: list = None) -> pd.DataFrame:
+        """
+        The filings of a company, oldest first.
+
+        Returns:
+        pd.DataFrame: One row per filing with adsh, cik, name, form, fy, fp, period, filed and quarter.
+        """
+        query = "SELECT adsh, cik, name, form, fy, fp, period, filed, quarter FROM filings WHERE cik = ?"
+        parameters = [int(cik)]
+        if forms is not None:
+            query += f" AND form IN ({', '.join('?' * len(forms))})"
+            parameters += list(forms)
+        filings = pd.read_sql_query(query + " ORDER BY filed, adsh", self._connection(), params=parameters)
+        for column in ("period", "filed"):
+            filings[column] = pd.to_datetime(filings[column])
+        return filings
+
+    def locations(self, adshs: list, tags: list = None) -> pd.DataFrame:
+        """
+        The row locations of some filings, and optionally tags, in the dataset.
+
+        Returns:
+        pd.DataFrame: One row per (adsh, tag) with the quarter of its file, its start row and its row count.
+        """
+        query = ("SELECT filings.adsh, tags.tag, filings.quarter, locations.start, locations.count FROM filings "
+                 "JOIN locations ON locations.filing = filings.id JOIN tags ON tags.id = locations.tag "
+                 f"WHERE filings.adsh IN ({', '.join('?' * len(adshs))})")
+        parameters = list(adshs)
+        if tags is not None:
+            query += f" AND tags.tag IN ({', '.join('?' * len(tags))})"
+            parameters += list(tags)
+        return pd.read_sql_query(query, self._connection(), params=parameters)
+
+    def _file(self, quarter: str) -> tuple:
+        # the Parquet file of a quarter and the first row of each of its row groups
+        if quarter not in self._files:
+            parquet_file = pq.ParquetFile(self.dataset_path / "num" / f"quarter={quarter}" / "part.parquet")
+            sizes = [parquet_file.metadata.row_group(i).num_rows for i in range(parquet_file.num_row_groups)]
+            self._files[quarter] = (parquet_file, np.r_[0, np.cumsum(sizes)])
+        return self._files[quarter]
+
+    def read(self, locations: pd.DataFrame, columns: list = None) -> pd.DataFrame:
+        """
+        Read the rows at some locations (see locations) from the dataset, reading only the row groups holding them.
+
+        Returns:
+        pd.DataFrame: The `num` rows, like GatherAlternative.edgar_dataset.query_numbers.
+        """
+        tables = []
+        for quarter, group in locations.groupby("quarter"):
+            parquet_file, offsets = self._file(quarter)
+            starts = group.start.to_numpy()
+            stops = starts + group["count"].to_numpy()
+            row_groups = np.unique(np.concatenate([
+                np.arange(first, last + 1) for first, last in zip(
+                    np.searchsorted(offsets, starts, side="right") - 1, np.searchsorted(offsets, stops - 1, side="right") - 1
+                )
+            ]))
+            table = parquet_file.read_row_groups(row_groups.tolist(), columns=columns)
+            # rows of the locations, relative to the first row of the row groups read
+            base = np.concatenate([np.arange(offsets[i], offsets[i + 1]) for i in row_groups])
+            rows = np.concatenate([np.arange(start, stop) for start, stop in zip(starts, stops)])
+            table = table.take(np.searchsorted(base, rows))
+            # the taken rows keep the dictionaries of the whole row groups, encode them again
+            for i, field in enumerate(table.schema):
+                if pa.types.is_dictionary(field.type):
+                    table = table.set_column(i, field.name, pc.dictionary_encode(table.column(i).cast(field.type.value_type)))
+            tables.append(table.append_column("quarter", pa.array([quarter] * len(rows))))
+        if not tables:
+            return pd.DataFrame(columns=columns)
+        return pa.concat_tables(tables, promote_options="permissive").to_pandas()
+
+    def company_numbers(self, cik: int, tags: list = None, forms: list = None, columns: list = None) -> pd.DataFrame:
+        """
+        The numbers of a company's filings, optionally of some tags and forms only.
+
+        Returns:
+        pd.DataFrame: The `num` rows of the company.
+        """
+        filings = self.filings(cik, forms)
+        if filings.empty:
+            return pd.DataFrame(columns=columns)
+        return self.read(self.locations(filings.adsh.tolist(), tags), columns)
+
+
+def download_company_tickers(session: requests.Session = None) -> pd.DataFrame:
+    """
+    Download the SEC's ticker to CIK mapping (company_tickers.json).
+
+    Returns:
+    pd.DataFrame: Frame with the columns cik, ticker and title, ready for EdgarIndex.add_tickers.
+    """
+    session = session or requests.Session()
+    response = session.get(COMPANY_TICKERS_URL, headers={"User-Agent": USER_AGENT}, timeout=60)
+    response.raise_for_status()
+    return pd.DataFrame(list(response.json().values())).rename(columns={"cik_str": "cik"})
@@ -0,0 +1,186 @@
+"""
+Streaming ingestion of the EDGAR financial statement and notes data sets.
+
+Archives are downloaded to disk in chunks (resuming partial downloads with HTTP range requests), members
+are extracted with buffered block copies, and several quarters are processed concurrently on a bounded
+thread pool, so memory use does not depend on the size of the archives or the number of quarters.
+"""
+import logging
+import os
+import random
+import shutil
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from urllib.parse import urlparse
+
+import requests
+
+from GatherFundamental.fetching import HostRateLimiter
+
+
+logger = logging.getLogger(__name__)
+
+SEC_URL = "https://www.sec.gov/"
+FSN_PATH = "files/dera/data/financial-statement-and-notes-data-sets/"
+DATA_PATH = Path("edgar")
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
+CHUNK_SIZE = 1024 ** 2
+# sec.gov allows at most 10 requests per second
+REQUESTS_PER_SECOND = 8
+
+
+def download_archive(url: str, destination: Path, session: requests.Session = None, chunk_size: int = CHUNK_SIZE,
+                     retries: int = 3, backoff: float = 1.0, rate_limiter: HostRateLimiter = None) -> Path:
+    """
+    Download a file to disk in chunks, resuming a partial download left by an earlier attempt.
+
+    The file is written to {destination}.part and renamed to destination once complete. An existing
+    destination is not downloaded again.
+
+    Parameters:
+    url (str): The URL of the file.
+    destination (Path): Where to store the file.
+    session (requests.Session): The HTTP session, a new one by default.
+    chunk_size (int): Number of bytes read from the connection and written to disk at a time.
+    retries (int): Number of retries after the first attempt, each resuming where the last one stopped.
+    backoff (float): Base delay in seconds before the first retry, doubled on every retry.
+    rate_limiter (HostRateLimiter): Limiter shared by concurrent downloads, none by default.
+
+    Returns:
+    Path: The destination.
+    """
+    destination = Path(destination)
+    if destination.exists():
+        return destination
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    partial = destination.with_name(destination.name + ".part")
+    session = session or requests.Session()
+    rate_limiter = rate_limiter or HostRateLimiter()
+    for attempt in range(retries + 1):
+        offset = partial.stat().st_size if partial.exists() else 0
+        headers = {"User-Agent": USER_AGENT}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+        rate_limiter.acquire(urlparse(url).netloc)
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=60) as response:
+                if response.status_code == 416:
+                    # the partial file is already complete
+                    break
+                response.raise_for_status()
+                # a server ignoring the range request sends the whole file again
+                mode = "ab" if offset and response.status_code == 206 else "wb"
+                with partial.open(mode) as output:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        output.write(chunk)
+                expected = response.headers.get("Content-Length")
+                if expected is not None and partial.stat().st_size - (offset if mode == "ab" else 0) < int(expected):
+                    raise requests.ConnectionError(f"Incomplete download of {url}")
+            break
+        except requests.RequestException as error:
+            if attempt == retries or (isinstance(error, requests.HTTPError) and error.response.status_code == 404):
+                raise
+            logger.info(f"Retrying {url} from byte {partial.stat().st_size if partial.exists() else 0}: {error}")
+            time.sleep(backoff * 2 ** attempt * (1 + random.random()))
+    os.replace(partial, destination)
+    return destination
+
+
+def extract_archive(archive: Path, destination: Path, buffer_size: int = CHUNK_SIZE) -> list:
+    """
+    Extract the members of a zip archive with buffered block copies, skipping members already extracted.
+
+    Members are written to temporary files that are renamed once complete, so an interrupted extraction
+    never leaves a truncated member behind.
+
+    Returns:
+    list: The paths of the extracted members.
+    """
+    destination = Path(destination)
+    destination.mkdir(parents=True, exist_ok=True)
+    extracted = []
+    with zipfile.ZipFile(archive) as zip_file:
+        for member in zip_file.infolist():
+            if member.is_dir():
+                continue
+            target = destination / member.filename
+            extracted.append(target)
+            if target.exists() and target.stat().st_size == member.file_size:
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            temporary = target.with_name(target.name + ".tmp")
+            with zip_file.open(member) as source, temporary.open("wb") as output:
+                shutil.copyfileobj(source, output, buffer_size)
+            os.replace(temporary, target)
+    return extracted
+
+
+def ingest_quarter(yr: int, qtr: int, data_path: Path = DATA_PATH, base_url: str = SEC_URL + FSN_PATH,
+                   session: requests.Session = None, rate_limiter: HostRateLimiter = None, keep_archive: bool = False) -> list:
+    """
+    Download and extract the {yr}q{qtr} notes data set into {data_path}/{yr}_{qtr}/source.
+
+    A quarter that was ingested before (see the {data_path}/{yr}_{qtr}/ingested marker listing its files)
+    is skipped, even if its files have been converted or removed since.
+
+    Returns:
+    list: The paths of the extracted files.
+    """
+    source = Path(data_path) / f"{yr}_{qtr}" / "source"
+    marker = source.parent / "ingested"
+    if marker.exists():
+        return [source / name for name in marker.read_text().split()]
+    filing = f"{yr}q{qtr}_notes.zip"
+    archive = download_archive(base_url + filing, Path(data_path) / "archives" / filing, session=session, rate_limiter=rate_limiter)
+    try:
+        extracted = extract_archive(archive, source)
+    except zipfile.BadZipFile:
+        # a corrupt download is fetched again on the next run
+        archive.unlink()
+        raise
+    marker.write_text("\n".join(path.name for path in extracted))
+    if not keep_archive:
+        archive.unlink()
+    return extracted
+
+
+def ingest_quarters(filing_periods: list, data_path: Path = DATA_PATH, base_url: str = SEC_URL + FSN_PATH,
+                    max_workers: int = 4, requests_per_second: float = REQUESTS_PER_SECOND, keep_archives: bool = False):
+    """
+    Download and extract many quarters concurrently.
+
+    At most max_workers quarters are in flight at once, each holding one chunk of its download or one
+    block of its extraction in memory. A quarter that fails is logged and left out; running the
+    ingestion again resumes its download and extracts only what is missing.
+
+    Parameters:
+    filing_periods (list): The (year, quarter) pairs to ingest.
+    data_path (Path): Root directory of the EDGAR data.
+    base_url (str): URL of the directory holding the archives.
+    max_workers (int): Number of quarters processed concurrently.
+    requests_per_second (float): Maximum request rate to the host.
+    keep_archives (bool): Whether to keep the zip archives in {data_path}/archives after extraction.
+
+    Returns:
+    tuple: A dictionary mapping each ingested (year, quarter) to its extracted files, and a dictionary
+    mapping each failed one to its exception.
+    """
+    rate_limiter = HostRateLimiter(requests_per_second)
+    ingested, errors = {}, {}
+    with requests.Session() as session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=max_workers))
+        session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=max_workers))
+        futures = {
+            executor.submit(ingest_quarter, yr, qtr, data_path, base_url, session, rate_limiter, keep_archives): (yr, qtr)
+            for yr, qtr in filing_periods
+        }
+        for future in as_completed(futures):
+            period = futures[future]
+            try:
+                ingested[period] = future.result()
+            except Exception as error:
+                logger.warning(f"Failed to ingest {period[0]}q{period[1]}: {error}")
+                errors[period] = error
+    return ingested, errors
@@ -0,0 +1,105 @@
+"""
+Long to wide pivot of EDGAR numbers: one row per (cik, period end, duration) and one column per tag.
+
+Every step is a sort, a mask or a drop_duplicates over the whole `num` table, so the cost grows with the
+number of rows and not with the number of companies, filings or tags.
+"""
+from pathlib import Path
+
+import pandas as pd
+
+from GatherAlternative.edgar_dataset import query_numbers
+
+
+# the dimension hash of facts about the company as a whole, see the SEC's readme
+NO_DIMENSION = "0x00000000"
+PANEL_INDEX = ["cik", "ddate", "qtrs"]
+
+
+def latest_facts(nums: pd.DataFrame, tags: list = None, qtrs: list = None, subs: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Reduce the long `num` table to one fact per (cik, period end, duration, tag).
+
+    Only facts about the company as a whole are kept (no dimensions, no co-registrant). Each filing also
+    reports comparatives for earlier periods, so only the latest period end (ddate) of a tag and duration
+    is kept per filing. A period reported by several filings, e.g. an original and its amendment, takes
+    the value of the latest filed.
+
+    Parameters:
+    nums (pd.DataFrame): The `num` rows, with the cik and filed fields of their submission (see
+    GatherAlternative.edgar_dataset.query_numbers), or without them if subs is given.
+    tags (list): The tags to keep, all by default.
+    qtrs (list): The durations in quarters to keep (0 for point in time, 1 for quarters, 4 for years), all by default.
+    subs (pd.DataFrame): The `sub` rows of the filings, used when nums has no cik or filed column.
+
+    Returns:
+    pd.DataFrame: Columns cik, ddate, qtrs, tag, value, filed and adsh.
+    """
+    if subs is not None and not {"cik", "filed"} <= set(nums.columns):
+        nums = nums.drop(columns=["cik", "filed"], errors="ignore").merge(subs[["adsh", "cik", "filed"]], on="adsh")
+    mask = pd.Series(True, index=nums.index)
+    if tags is not None:
+        mask &= nums.tag.isin(tags)
+    if qtrs is not None:
+        mask &= nums.qtrs.isin(qtrs)
+    if "dimh" in nums:
+        mask &= nums.dimh.isna() | (nums.dimh == NO_DIMENSION)
+    if "coreg" in nums:
+        mask &= nums.coreg.isna()
+    facts = nums.loc[mask, ["adsh", "cik", "tag", "ddate", "qtrs", "value", "filed"]]
+    # sorts and duplicates work on the category codes; unused categories would become empty columns
+    for column in ("adsh", "tag"):
+        facts[column] = facts[column].astype("category").cat.remove_unused_categories()
+    facts["ddate"] = pd.to_datetime(facts.ddate)
+    facts["filed"] = pd.to_datetime(facts.filed)
+
+    # latest period end per filing, then latest filing per period
+    facts = facts.sort_values(["adsh", "tag", "qtrs", "ddate"]).drop_duplicates(["adsh", "tag", "qtrs"], keep="last")
+    facts = facts.sort_values(["filed", "adsh"]).drop_duplicates(["cik", "ddate", "qtrs", "tag"], keep="last")
+    return facts.sort_values(PANEL_INDEX + ["tag"]).reset_index(drop=True)[PANEL_INDEX + ["tag", "value", "filed", "adsh"]]
+
+
+def pivot_tags(nums: pd.DataFrame, tags: list, qtrs: list = None, subs: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Pivot the long `num` table of any number of companies to a wide panel with one column per tag.
+
+    Parameters:
+    nums (pd.DataFrame): The `num` rows, see latest_facts.
+    tags (list): The tags to pivot, e.g. ["EarningsPerShareDiluted", "NetIncomeLoss", "GrossProfit"].
+    qtrs (list): The durations in quarters to keep, all by default.
+    subs (pd.DataFrame): The `sub` rows of the filings, see latest_facts.
+
+    Returns:
+    pd.DataFrame: Index (cik, ddate, qtrs), one column per tag and a 'filed' column with the latest
+    filing date of the row's values.
+
+    Example:
+    >>> panel = pivot_tags(nums, ["EarningsPerShareDiluted", "NetIncomeLoss"], qtrs=[1, 4])
+    >>> panel.loc[320193]  # one company
+    """
+    facts = latest_facts(nums, tags, qtrs, subs)
+    panel = facts.set_index(PANEL_INDEX + ["tag"]).value.unstack("tag").reindex(columns=list(tags))
+    panel.columns.name = None
+    panel["filed"] = facts.groupby(PANEL_INDEX).filed.max()
+    return panel
+
+
+def tag_panel(dataset_path: Path, tags: list, ciks: list = None, forms: list = ["10-K", "10-Q", "10-K/A", "10-Q/A"],
+              qtrs: list = None) -> pd.DataFrame:
+    """
+    Read some tags of some companies from the partitioned dataset and pivot them, see pivot_tags.
+
+    Parameters:
+    dataset_path (Path): Directory of the dataset, see GatherAlternative.edgar_dataset.consolidate.
+    tags (list): The tags to read.
+    ciks (list): The CIKs to read, all by default.
+    forms (list): The forms of the filings to read, the quarterly and annual reports and their amendments by default.
+    qtrs (list): The durations in quarters to read, all by default.
+
+    Returns:
+    pd.DataFrame: The wide panel, see pivot_tags.
+    """
+    # quarters without a co-registrant column read it as nulls, see GatherAlternative.edgar_dataset.dataset_schema
+    columns = ["adsh", "cik", "tag", "ddate", "qtrs", "value", "filed", "dimh", "coreg"]
+    nums = query_numbers(dataset_path, ciks=ciks, forms=forms, tags=tags, qtrs=qtrs, columns=columns)
+    return pivot_tags(nums, tags, qtrs)
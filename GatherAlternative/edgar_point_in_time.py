@@ -0,0 +1,79 @@
+"""
+Point-in-time join of EDGAR fundamentals onto daily prices for a whole universe.
+
+A fundamental value is known from the day after its filing date (`filed`), not from the end of the
+period it describes (`ddate`), which is months earlier. Prices of all tickers are joined to the latest
+values known on each trading day with one sorted pd.merge_asof, so no value is used before it was public.
+"""
+import numpy as np
+import pandas as pd
+
+
+# the ratios of valuation_ratios by default: the column divided into the price for each ratio
+DEFAULT_RATIOS = {"PE": "EarningsPerShareDiluted"}
+
+
+def _known(fundamentals: pd.DataFrame, lag: int) -> pd.DataFrame:
+    # the values known from each date on; a late filing about an older period does not replace newer values
+    facts = fundamentals.reset_index()
+    facts["available"] = (pd.to_datetime(facts.filed) + pd.Timedelta(days=lag)).astype("datetime64[ns]")
+    facts = facts.sort_values(["available", "ddate"], kind="stable")
+    return facts[facts.ddate.ge(facts.groupby("cik").ddate.cummax())]
+
+
+def point_in_time(fundamentals: pd.DataFrame, prices: pd.DataFrame, ciks, lag: int = 1) -> pd.DataFrame:
+    """
+    Attach to every (trading day, ticker) the latest fundamentals filed before that day.
+
+    Parameters:
+    fundamentals (pd.DataFrame): Values with index (cik, ddate) and a 'filed' column, e.g. from
+    GatherAlternative.edgar_ttm.trailing_twelve_months or GatherAlternative.edgar_panel.pivot_tags.
+    prices (pd.DataFrame): Prices with one column per ticker and a DatetimeIndex, e.g. PricePanel.frame("Close").
+    ciks (dict or pd.Series): The CIK of each ticker. Tickers without a CIK are left out.
+    lag (int): Days after the filing date before a value is used; 1 uses filings from the next day on.
+
+    Returns:
+    pd.DataFrame: Index (Date, Ticker) in date order with the columns price, cik, ddate, filed and the
+    fundamentals, empty where no filing was known yet.
+
+    Example:
+    >>> joined = point_in_time(ttm_panel(DATA_PATH / "dataset", ["EarningsPerShareDiluted"]), closes, {"AAPL": 320193})
+    """
+    ciks = pd.Series(ciks, dtype="int64")
+    prices = prices.loc[:, prices.columns.isin(ciks.index)].sort_index()
+    # long (day, ticker) rows in date order, straight from the row-major values
+    n_days, n_tickers = prices.shape
+    days = pd.DataFrame({
+        "Date": np.repeat(pd.DatetimeIndex(prices.index).astype("datetime64[ns]"), n_tickers),
+        "Ticker": pd.Categorical.from_codes(np.tile(np.arange(n_tickers), n_days), categories=prices.columns),
+        "price": prices.to_numpy(dtype=float).ravel(),
+        "cik": np.tile(ciks.reindex(prices.columns).to_numpy(), n_days),
+    })
+    days = days[days.price.notna()]
+
+    facts = _known(fundamentals, lag)
+    facts = facts[facts.cik.isin(ciks)]
+    joined = pd.merge_asof(days, facts, left_on="Date", right_on="available", by="cik", direction="backward")
+    return joined.drop(columns="available").set_index(["Date", "Ticker"])
+
+
+def valuation_ratios(joined: pd.DataFrame, ratios: dict = None, shares: str = None) -> dict:
+    """
+    Price ratio panels from the output of point_in_time.
+
+    Parameters:
+    joined (pd.DataFrame): Prices joined to fundamentals, see point_in_time.
+    ratios (dict): The column divided into the price for each ratio, DEFAULT_RATIOS ({"PE": "EarningsPerShareDiluted"})
+    by default.
+    shares (str): Column with the number of shares outstanding. When given, ratios divide the market value
+    (price times shares) instead of the price, e.g. {"PS": "Revenues"} with
+    shares="EntityCommonStockSharesOutstanding", the cover page count of a pivot_tags panel (qtrs=0) joined
+    as well. The share counts of trailing_twelve_months are averages over the last four quarters, which lag
+    buybacks and issuance.
+
+    Returns:
+    dict: One DataFrame per ratio with one row per trading day and one column per ticker.
+    """
+    ratios = DEFAULT_RATIOS if ratios is None else ratios
+    value = joined.price * joined[shares] if shares else joined.price
+    return {name: value.div(joined[column]).unstack("Ticker") for name, column in ratios.items()}
@@ -0,0 +1,200 @@
+"""
+Trailing twelve month (TTM) values of duration tags (revenue, income, cash flows, EPS, ...) for every company.
+
+Quarters are placed on a grid of calendar quarters per company. Only additive flows (amounts in a currency)
+are summed: their fourth fiscal quarter, which companies rarely report on its own, is derived as the annual
+value less the three quarters before it, and their TTM values are the sums of four consecutive quarters.
+Share counts are averaged over the four quarters instead, and per-share values are the TTM value of their
+numerator divided by the average share count. Everything is done with grouped shifts over the whole panel.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from GatherAlternative.edgar_dataset import query_numbers
+from GatherAlternative.edgar_panel import tag_panel
+
+
+# the numerator and share count each per-share tag is derived from
+PER_SHARE_TAGS = {
+    "EarningsPerShareDiluted": ("NetIncomeLoss", "WeightedAverageNumberOfDilutedSharesOutstanding"),
+    "EarningsPerShareBasic": ("NetIncomeLoss", "WeightedAverageNumberOfSharesOutstandingBasic"),
+}
+
+
+def _quarter(ddate: pd.Series) -> np.ndarray:
+    # calendar quarter of a fiscal period end; 52/53 week years end up to a week either side of a month end
+    return (pd.to_datetime(ddate) - pd.Timedelta(days=15)).dt.to_period("Q").array.asi8
+
+
+def _duration_tags(panel: pd.DataFrame) -> list:
+    durations = panel[panel.index.get_level_values("qtrs") > 0]
+    return [column for column in panel.columns if column != "filed" and durations[column].notna().any()]
+
+
+def tag_kind(tag: str, uom: str = None) -> str:
+    """
+    How the quarters of a duration tag add up to twelve months.
+
+    Parameters:
+    tag (str): The tag.
+    uom (str): Its unit of measure in the num table, e.g. "USD", "shares" or "USD/shares". Without it the
+    kind is guessed from the tag name.
+
+    Returns:
+    str: "flow" for amounts in a currency, which are summed; "shares" for share counts, which are averaged;
+    "per_share" for per-share amounts, derived from PER_SHARE_TAGS where possible; "latest" for other
+    units (ratios, pure numbers), which keep the latest reported value.
+    """
+    if uom is None:
+        if "PerShare" in tag:
+            return "per_share"
+        return "shares" if "Shares" in tag or "NumberOf" in tag else "flow"
+    if uom.endswith("/shares"):
+        return "per_share"
+    if uom == "shares":
+        return "shares"
+    # currencies are ISO codes such as USD or EUR
+    return "flow" if len(uom) == 3 and uom.isalpha() and uom.isupper() else "latest"
+
+
+def tag_units(dataset_path: Path, tags: list) -> dict:
+    """
+    The unit of measure of some tags in the partitioned dataset, the most frequent one of each tag.
+
+    Returns:
+    dict: The uom of each tag found, e.g. {"Revenues": "USD", "EarningsPerShareDiluted": "USD/shares"}.
+    """
+    units = query_numbers(dataset_path, tags=list(tags), columns=["tag", "uom"])
+    if units.empty:
+        return {}
+    counts = units.astype(str).value_counts()
+    return {tag: uom for tag, uom in counts.index[::-1]}
+
+
+def _on_grid(frame: pd.DataFrame) -> pd.DataFrame:
+    # one row per (cik, quarter), the latest period end of a quarter winning
+    frame = frame.reset_index()
+    frame["quarter"] = _quarter(frame.ddate)
+    return frame.sort_values(["cik", "quarter", "ddate"]).drop_duplicates(["cik", "quarter"], keep="last").set_index(["cik", "quarter"])
+
+
+def quarterly_values(panel: pd.DataFrame, tags: list = None, units: dict = None) -> pd.DataFrame:
+    """
+    The quarterly values of duration tags, deriving missing fourth quarters of flows from annual values.
+
+    A fourth quarter is only derived for flows (see tag_kind). Share counts take the annual value, the
+    average of the year, in its place; other tags leave it empty, as an annual value less three quarters
+    is not a quarter of a per-share amount or a ratio.
+
+    Parameters:
+    panel (pd.DataFrame): Panel with index (cik, ddate, qtrs) holding qtrs 1 and 4, see
+    GatherAlternative.edgar_panel.pivot_tags. Amendments are already resolved to the latest filed.
+    tags (list): The duration tags, every tag with quarterly or annual values by default.
+    units (dict): The uom of each tag, see tag_units. Tags without one are classified by name.
+
+    Returns:
+    pd.DataFrame: Index (cik, quarter) with the ordinal of the calendar quarter, columns ddate, the tags,
+    'filed' and 'derived' (whether the row was derived from an annual value).
+    """
+    tags = list(tags or _duration_tags(panel))
+    kinds = {tag: tag_kind(tag, (units or {}).get(tag)) for tag in tags}
+    flows = [tag for tag in tags if kinds[tag] == "flow"]
+    shares = [tag for tag in tags if kinds[tag] == "shares"]
+    qtrs = panel.index.get_level_values("qtrs")
+    quarters = _on_grid(panel.loc[qtrs == 1, tags + ["filed"]])
+    quarters["derived"] = False
+    annual = _on_grid(panel.loc[qtrs == 4, tags + ["filed"]])
+
+    # Q4 = year less the three quarters before it, for years whose last quarter is missing
+    missing = annual[~annual.index.isin(quarters.index)]
+    ciks = missing.index.get_level_values("cik")
+    last = missing.index.get_level_values("quarter")
+    previous = [quarters.reindex(pd.MultiIndex.from_arrays([ciks, last - lag], names=["cik", "quarter"])) for lag in (1, 2, 3)]
+    fourth = pd.DataFrame(np.nan, index=missing.index, columns=tags)
+    fourth[flows] = missing[flows] - sum(frame[flows].to_numpy() for frame in previous)
+    fourth[shares] = missing[shares]
+    fourth["ddate"] = missing.ddate
+    fourth["filed"] = np.maximum.reduce([missing.filed.to_numpy()] + [frame.filed.to_numpy() for frame in previous])
+    fourth["derived"] = True
+    fourth = fourth[fourth[tags].notna().any(axis=1)]
+
+    return pd.concat([quarters, fourth])[["ddate"] + tags + ["filed", "derived"]].sort_index()
+
+
+def trailing_twelve_months(panel: pd.DataFrame, tags: list = None, units: dict = None) -> pd.DataFrame:
+    """
+    The trailing twelve month values of duration tags for every company and quarter.
+
+    Flows are summed over four consecutive quarters (see quarterly_values) and share counts averaged over
+    them; a quarter without three consecutive quarters before it has no TTM value. Per-share tags of
+    PER_SHARE_TAGS are the TTM value of their numerator divided by the average share count, which the
+    panel must hold as well; other per-share tags and ratios keep their latest reported value.
+
+    Parameters:
+    panel (pd.DataFrame): Panel with index (cik, ddate, qtrs) holding qtrs 1 and 4, see
+    GatherAlternative.edgar_panel.pivot_tags.
+    tags (list): The tags, every tag with quarterly or annual values by default.
+    units (dict): The uom of each tag, see tag_units. Tags without one are classified by name.
+
+    Returns:
+    pd.DataFrame: Index (cik, ddate) with the end of the last quarter, the TTM value of each tag and
+    'filed', the date the last of the four quarters became known.
+
+    Example:
+    >>> ttm = trailing_twelve_months(pivot_tags(nums, ["Revenues", "NetIncomeLoss"], qtrs=[1, 4]))
+    """
+    tags = list(tags or _duration_tags(panel))
+    kinds = {tag: tag_kind(tag, (units or {}).get(tag)) for tag in tags}
+    derived = {tag: PER_SHARE_TAGS[tag] for tag in tags if kinds[tag] == "per_share" and tag in PER_SHARE_TAGS}
+    for tag, components in derived.items():
+        absent = [component for component in components if component not in panel.columns]
+        if absent:
+            raise ValueError(f"The TTM value of {tag} needs {', '.join(absent)} in the panel")
+    needed = list(dict.fromkeys(tags + [component for components in derived.values() for component in components]))
+    kinds = {tag: tag_kind(tag, (units or {}).get(tag)) for tag in needed}
+
+    quarters = quarterly_values(panel, needed, units)
+    quarter = quarters.index.get_level_values("quarter").to_series(index=quarters.index)
+    grouped = quarters.groupby(level="cik")
+    previous = [grouped.shift(lag) for lag in (1, 2, 3)]
+    consecutive = (quarter - quarter.groupby(level="cik").shift(3)).eq(3)
+
+    flows = [tag for tag in needed if kinds[tag] == "flow"]
+    shares = [tag for tag in needed if kinds[tag] == "shares"]
+    latest = [tag for tag in needed if kinds[tag] in ("per_share", "latest") and tag not in derived]
+    ttm = pd.DataFrame(index=quarters.index)
+    ttm[flows] = quarters[flows] + sum(frame[flows] for frame in previous)
+    # average of the share counts reported in the four quarters
+    reported = [quarters[shares]] + [frame[shares] for frame in previous]
+    ttm[shares] = sum(frame.fillna(0) for frame in reported) / sum(frame.notna() for frame in reported)
+    ttm[latest] = quarters[latest]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for tag, (numerator, denominator) in derived.items():
+            ttm[tag] = ttm[numerator] / ttm[denominator].where(ttm[denominator] > 0)
+    ttm = ttm[tags].where(consecutive, axis=0)
+    ttm["filed"] = pd.concat([quarters.filed] + [frame.filed for frame in previous], axis=1).max(axis=1)
+    ttm["ddate"] = quarters.ddate
+    ttm = ttm[consecutive & ttm[tags].notna().any(axis=1)]
+    return ttm.reset_index().set_index(["cik", "ddate"])[tags + ["filed"]]
+
+
+def ttm_panel(dataset_path: Path, tags: list, ciks: list = None) -> pd.DataFrame:
+    """
+    Read duration tags from the partitioned dataset and derive their TTM values, see trailing_twelve_months.
+
+    The numerators and share counts of per-share tags (see PER_SHARE_TAGS) are read along with them, and
+    each tag is classified by its unit of measure in the dataset.
+
+    Parameters:
+    dataset_path (Path): Directory of the dataset, see GatherAlternative.edgar_dataset.consolidate.
+    tags (list): The tags, e.g. ["Revenues", "NetIncomeLoss", "EarningsPerShareDiluted"].
+    ciks (list): The CIKs to read, all by default.
+
+    Returns:
+    pd.DataFrame: The TTM values with index (cik, ddate).
+    """
+    read = list(dict.fromkeys(list(tags) + [component for tag in tags for component in PER_SHARE_TAGS.get(tag, ())]))
+    panel = tag_panel(dataset_path, read, ciks=ciks, qtrs=[1, 4])
+    return trailing_twelve_months(panel, tags, tag_units(dataset_path, read))
@@ -0,0 +1,194 @@
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[1] / "data" / "cache"
+
+# statements that hold quote fields (marketCap, previousClose, ...) and therefore expire quickly
+QUOTE_STATEMENTS = {"info"}
+# Parquet metadata key holding the frequency of statements whose periods are a PeriodIndex (financetoolkit)
+PERIOD_FREQ_KEY = b"statement_period_freq"
+
+
+class StatementCache:
+    """
+    Persistent on-disk cache of financial statements, shared between processes.
+
+    Entries are keyed by (provider, ticker, statement, period) and stored as one Parquet file each.
+    Statements and quote data (the yfinance info dict) have separate time-to-live values, and the
+    least recently used entries are evicted once the cache grows beyond its byte budget. Writes go
+    to a temporary file that is atomically renamed, so concurrent processes never see partial entries.
+
+    Parameters:
+    cache_dir (str or Path): Directory holding the cache, data/cache by default.
+    statement_ttl (float): Seconds before a cached statement expires. Statements change quarterly.
+    quote_ttl (float): Seconds before cached quote data expires.
+    max_bytes (int): Byte budget of the cache directory.
+    """
+
+    def __init__(self, cache_dir=None, statement_ttl: float = 7 * 24 * 3600, quote_ttl: float = 15 * 60,
+                 max_bytes: int = 2 * 1024 ** 3):
+        self.cache_dir = Path(cache_dir or DEFAULT_CACHE_DIR)
+        self.statement_ttl = statement_ttl
+        self.quote_ttl = quote_ttl
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "writes": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._size = None
+
+    def _path(self, provider: str, ticker: str, statement: str, period: str) -> Path:
+        return self.cache_dir / provider / period / statement / f"{ticker}.parquet"
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get(self, provider: str, ticker: str, statement: str, period: str = "annual"):
+        """
+        Read an entry from the cache.
+
+        Returns:
+        pd.DataFrame or dict: The cached statement, or None if it is missing or expired.
+        """
+        path = self._path(provider, ticker, statement, period)
+        try:
+            modified = path.stat().st_mtime
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+        ttl = self.quote_ttl if statement in QUOTE_STATEMENTS else self.statement_ttl
+        if time.time() - modified > ttl:
+            self._count("expired")
+            self._count("misses")
+            return None
+        try:
+            table = pq.read_table(path)
+        except (OSError, ValueError):
+            # removed by another process' eviction in the meantime
+            self._count("misses")
+            return None
+        # record the access time for LRU eviction, keeping the modification time used for the TTL
+        os.utime(path, (time.time(), modified))
+        self._count("hits")
+        frame = table.to_pandas()
+        if statement in QUOTE_STATEMENTS:
+            return {key: (None if pd.isna(value) else value) for key, value in frame.iloc[0].items()}
+        freq = (table.schema.metadata or {}).get(PERIOD_FREQ_KEY)
+        if freq is not None:
+            frame.index = pd.PeriodIndex(frame.index, freq=freq.decode(), name=frame.index.name)
+        # statements are stored with periods as rows, as Parquet needs string column names
+        return frame.T
+
+    def put(self, provider: str, ticker: str, statement: str, value, period: str = "annual"):
+        """
+        Write an entry to the cache, evicting the least recently used entries if over budget.
+
+        Parameters:
+        value (pd.DataFrame or dict): A statement with line items as rows, or an info dict.
+        """
+        metadata = {}
+        if statement in QUOTE_STATEMENTS:
+            frame = pd.DataFrame([{key: item for key, item in value.items() if np.isscalar(item)}])
+        else:
+            frame = value.T
+            frame.columns = frame.columns.astype(str)
+            if isinstance(frame.index, pd.PeriodIndex):
+                # stored as strings with the frequency alongside, so a hit returns the same periods as a fetch
+                metadata[PERIOD_FREQ_KEY] = frame.index.freqstr.encode()
+                frame.index = frame.index.astype(str)
+        table = pa.Table.from_pandas(frame)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+        path = self._path(provider, ticker, statement, period)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        os.close(handle)
+        try:
+            pq.write_table(table, temporary)
+            previous_size = path.stat().st_size if path.exists() else 0
+            os.replace(temporary, path)
+        except BaseException:
+            Path(temporary).unlink(missing_ok=True)
+            raise
+        self._count("writes")
+        with self._lock:
+            if self._size is not None:
+                self._size += path.stat().st_size - previous_size
+        self._evict()
+
+    def get_or_fetch(self, provider: str, ticker: str, statement: str, fetch, period: str = "annual"):
+        """
+        Read an entry from the cache, calling fetch() and caching its result on a miss.
+        """
+        value = self.get(provider, ticker, statement, period)
+        if value is None:
+            value = fetch()
+            self.put(provider, ticker, statement, value, period)
+        return value
+
+    def _entries(self) -> list:
+        entries = []
+        for path in self.cache_dir.glob("**/*.parquet"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_atime, stat.st_size, path))
+        return entries
+
+    def _evict(self):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            if self._size <= self.max_bytes:
+                return
+            # rescan, other processes may have written or evicted entries
+            entries = sorted(self._entries(), key=lambda entry: entry[0])
+            self._size = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if self._size <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                self._size -= size
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        for _, _, path in self._entries():
+            path.unlink(missing_ok=True)
+        with self._lock:
+            self._size = 0
+
+
+class CachedProvider:
+    """
+    Wrap a provider (see GatherFundamental.fetching) so that statements are served from a StatementCache.
+
+    Parameters:
+    provider: The provider to fetch from on cache misses.
+    cache (StatementCache): The cache, a StatementCache in data/cache by default.
+    period (str): The statement period the provider returns, e.g. 'annual' or 'quarterly'.
+    """
+
+    def __init__(self, provider, cache: StatementCache = None, period: str = "annual"):
+        self.provider = provider
+        self.cache = cache or StatementCache()
+        self.period = period
+        self.name = provider.name
+        self.host = getattr(provider, "host", provider.name)
+
+    def lookup(self, ticker: str, statement: str):
+        """Return the cached statement, or None on a miss, without touching the network."""
+        return self.cache.get(self.name, ticker, statement, self.period)
+
+    def fetch(self, ticker: str, statement: str):
+        value = self.provider.fetch(ticker, statement)
+        if value is not None:
+            self.cache.put(self.name, ticker, statement, value, self.period)
+        return value
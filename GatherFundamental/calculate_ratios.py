@@ -1,320 +1,1096 @@
-import yfinance as yf
+import operator
+import re
+from collections import namedtuple
+
 import numpy as np
 import pandas as pd
 
+from GatherFundamental.cache import CachedProvider
+from GatherFundamental.fetching import YFinanceProvider, fetch_universe
+
+
+STATEMENTS = ["financials", "balance_sheet", "cash_flow"]
+
+# provider statement holding each of STATEMENTS, per statement frequency
+PANEL_STATEMENTS = {
+    "annual": {"financials": "financials", "balance_sheet": "balance_sheet", "cash_flow": "cash_flow"},
+    "quarterly": {"financials": "quarterly_financials", "balance_sheet": "quarterly_balance_sheet", "cash_flow": "quarterly_cash_flow"},
+}
+PERIOD_DAYS = {"annual": 365, "quarterly": 91}
+
+# column of the price panel holding the market benchmark, used for excess returns
+BENCHMARK = "^GSPC"
+
+METRICS = [
+    "CA", "CL", "DEP", "STA", "SNOA", "COMBOACCRUAL", "DSRI", "GMI", "AQI", "SGI", "DEPI", "SGAI", "LVGI",
+    "TATA", "PROBM", "PMAN", "NIMTAAVG", "MTA", "TLMTA", "CASHMTA", "EXRETAVG", "SIGMA", "RSIZE", "MB",
+    "PRICE", "LPFD", "PFD", "EBIT", "TEV", "8yr_ROA", "P_8yr_ROA", "8yr_ROC", "P_8yr_ROC", "FCFA", "P_CFOA",
+    "MG", "P_MG", "MS", "P_MS", "MM", "P_FP", "ROA", "FS_ROA", "FCFTA", "FS_FCFTA", "ACCRUAL", "FS_ACCRUAL",
+    "LEVER", "FS_LEVER", "LIQUID", "FS_LIQUID", "NEQISS", "FS_NEQISS", "FS_MARGIN", "FS_TURN", "P_FS",
+    "QUALITY", "PE Ratio", "Cash Ratio", "Quick Ratio", "Current Ratio", "Financial Leverage", "PB Ratio",
+    "Dividend Yield", "Market Cap",
+]
+
+
+def fetch_raw_data(tickers: list, provider=None, max_workers: int = 16, requests_per_second: float = None, statements: list = None) -> dict:
+    """
+    Download the financial statements and info of every ticker, using yfinance by default.
+
+    Requests are made concurrently, see GatherFundamental.fetching.fetch_universe. Statements that
+    could not be fetched are left empty, so their metrics come out as NaN.
+
+    Parameters:
+    tickers (list): The stock tickers to download.
+    provider: The data provider, yfinance behind the on-disk statement cache by default.
+    max_workers (int): Maximum number of concurrent requests.
+    requests_per_second (float): Maximum request rate per host. None disables rate limiting.
+    statements (list): The statements to download. If empty, 'financials', 'balance_sheet', 'cash_flow'
+    and 'info' are downloaded.
+
+    Returns:
+    dict: A dictionary mapping each ticker to its statements and 'info'.
+    """
+    provider = provider or CachedProvider(YFinanceProvider())
+    raw_data, _ = fetch_universe(tickers, provider=provider, statements=statements, max_workers=max_workers, requests_per_second=requests_per_second)
+    return raw_data
+
+
+def _period(statement, offset: int = 0) -> pd.Series:
+    # yfinance statements have line items as rows and periods as columns, latest period first
+    if statement is None or statement.shape[1] <= offset:
+        return pd.Series(dtype=float)
+    return statement.iloc[:, offset]
+
+
+def build_universe(raw_data: dict, prices: pd.DataFrame = None) -> dict:
+    """
+    Align the statements and info of all tickers into (ticker x line item) frames.
+
+    Parameters:
+    raw_data (dict): Output of fetch_raw_data, mapping each ticker to its statements and info. Statements
+    that were not fetched may be left out.
+    prices (pd.DataFrame): Optional daily closing prices (date x ticker) including the BENCHMARK column,
+    needed by the market-based metrics (EXRETAVG, SIGMA).
+
+    Returns:
+    dict: A dictionary with one ticker-indexed DataFrame per statement ('financials', 'balance_sheet',
+    'cash_flow') holding the latest period, the same statements suffixed with '_previous' holding the
+    period before, 'info' holding the scalar info fields, 'dates' holding the date each row is measured at
+    (NaT for the latest available data) and 'prices'.
+    """
+    tickers = list(raw_data.keys())
+    universe = {}
+    for statement in STATEMENTS:
+        for key, offset in ((statement, 0), (statement + "_previous", 1)):
+            periods = {ticker: _period(data.get(statement), offset) for ticker, data in raw_data.items()}
+            frame = pd.DataFrame(periods).T.reindex(tickers)
+            universe[key] = frame.apply(pd.to_numeric, errors="coerce")
+    # dict_keys(['address1', 'city', 'state', 'zip', 'country', 'phone', 'website', 'industry', 'industryKey', 'industryDisp', 'sector', 'sectorKey', 'sectorDisp', 'longBusinessSummary', 'fullTimeEmployees', 'companyOfficers', 'auditRisk', 'boardRisk', 'compensationRisk', 'shareHolderRightsRisk', 'overallRisk', 'governanceEpochDate', 'compensationAsOfEpochDate', 'irWebsite', 'maxAge', 'priceHint', 'previousClose', 'open', 'dayLow', 'dayHigh', 'regularMarketPreviousClose', 'regularMarketOpen', 'regularMarketDayLow', 'regularMarketDayHigh', 'dividendRate', 'dividendYield', 'exDividendDate', 'payoutRatio', 'fiveYearAvgDividendYield', 'beta', 'trailingPE', 'forwardPE', 'volume', 'regularMarketVolume', 'averageVolume', 'averageVolume10days', 'averageDailyVolume10Day', 'marketCap', 'fiftyTwoWeekLow', 'fiftyTwoWeekHigh', 'priceToSalesTrailing12Months', 'fiftyDayAverage', 'twoHundredDayAverage', 'trailingAnnualDividendRate', 'trailingAnnualDividendYield', 'currency', 'enterpriseValue', 'profitMargins', 'floatShares', 'sharesOutstanding', 'sharesShort', 'sharesShortPriorMonth', 'sharesShortPreviousMonthDate', 'dateShortInterest', 'sharesPercentSharesOut', 'heldPercentInsiders', 'heldPercentInstitutions', 'shortRatio', 'shortPercentOfFloat', 'impliedSharesOutstanding', 'bookValue', 'priceToBook', 'lastFiscalYearEnd', 'nextFiscalYearEnd', 'mostRecentQuarter', 'earningsQuarterlyGrowth', 'netIncomeToCommon', 'trailingEps', 'forwardEps', 'pegRatio', 'lastSplitFactor', 'lastSplitDate', 'enterpriseToRevenue', 'enterpriseToEbitda', '52WeekChange', 'SandP52WeekChange', 'lastDividendValue', 'lastDividendDate', 'exchange', 'quoteType', 'symbol', 'underlyingSymbol', 'shortName', 'longName', 'firstTradeDateEpochUtc', 'timeZoneFullName', 'timeZoneShortName', 'uuid', 'messageBoardId', 'gmtOffSetMilliseconds', 'currentPrice', 'targetHighPrice', 'targetLowPrice', 'targetMeanPrice', 'targetMedianPrice', 'recommendationMean', 'recommendationKey', 'numberOfAnalystOpinions', 'totalCash', 'totalCashPerShare', 'ebitda', 'totalDebt', 'quickRatio', 'currentRatio', 'totalRevenue', 'debtToEquity', 'revenuePerShare', 'returnOnAssets', 'returnOnEquity', 'freeCashflow', 'operatingCashflow', 'earningsGrowth', 'revenueGrowth', 'grossMargins', 'ebitdaMargins', 'operatingMargins', 'financialCurrency', 'trailingPegRatio'])
+    universe["info"] = _info_frame(raw_data)
+    universe["dates"] = pd.DataFrame({"period": pd.NaT}, index=universe["info"].index)
+    universe["prices"] = prices
+    return universe
+
+
+def _info_frame(raw_data: dict) -> pd.DataFrame:
+    infos = {
+        ticker: {key: value for key, value in (data.get("info") or {}).items() if np.isscalar(value)}
+        for ticker, data in raw_data.items()
+    }
+    return pd.DataFrame.from_dict(infos, orient="index").reindex(list(raw_data.keys()))
+
+
+def _periods_as_rows(statement) -> pd.DataFrame:
+    if statement is None or statement.empty:
+        return pd.DataFrame()
+    frame = statement.T
+    frame.index = pd.to_datetime(frame.index.astype(str) if not isinstance(frame.index, pd.DatetimeIndex) else frame.index, errors="coerce")
+    return frame.loc[frame.index.notna(), ~frame.columns.duplicated()]
+
+
+def _lag(panel: pd.DataFrame, frequency: str) -> pd.DataFrame:
+    # values of the same period a year earlier of the same ticker (four quarters back in a quarterly panel),
+    # NaN where that period is missing from the panel
+    lag = round(PERIOD_DAYS["annual"] / PERIOD_DAYS[frequency])
+    previous = panel.groupby(level="ticker").shift(lag)
+    periods = pd.Series(panel.index.get_level_values("period"), index=panel.index)
+    gap = (periods - periods.groupby(level="ticker").shift(lag)).dt.days
+    previous.loc[~((gap - PERIOD_DAYS["annual"]).abs() <= PERIOD_DAYS["quarterly"] / 2).to_numpy()] = np.nan
+    return previous
+
+
+def build_panel(raw_data: dict, frequency: str = "annual", prices: pd.DataFrame = None) -> dict:
+    """
+    Align the statements and info of all tickers into (ticker, period) x line item frames.
+
+    The periods of the three statements of a ticker are aligned on their period end date. The '_previous'
+    frames hold the same period a year earlier, so that the year-over-year metrics (LEVER, LIQUID, SGI...)
+    compare a quarter with the quarter a year before it; they are aligned by date as well, so a missing
+    period gives NaN instead of an older one.
+
+    Parameters:
+    raw_data (dict): Output of fetch_raw_data, holding the statements of PANEL_STATEMENTS[frequency].
+    frequency (str): 'annual' or 'quarterly'.
+    prices (pd.DataFrame): Optional daily closing prices (date x ticker) including the BENCHMARK column.
+
+    Returns:
+    dict: The same keys as build_universe, with every frame indexed by (ticker, period). The info fields are
+    the current values, repeated for every period.
+    """
+    statements = {}
+    for statement, key in PANEL_STATEMENTS[frequency].items():
+        pieces = {ticker: _periods_as_rows(data.get(key)) for ticker, data in raw_data.items()}
+        pieces = {ticker: piece for ticker, piece in pieces.items() if not piece.empty}
+        if pieces:
+            statements[statement] = pd.concat(pieces, names=["ticker", "period"])
+        else:
+            statements[statement] = pd.DataFrame(index=pd.MultiIndex.from_arrays([[], pd.DatetimeIndex([])], names=["ticker", "period"]))
+
+    index = statements["financials"].index
+    for frame in statements.values():
+        index = index.union(frame.index)
+    index = index.sort_values() if len(index) else index
+
+    universe = {}
+    for statement, frame in statements.items():
+        panel = frame.reindex(index).apply(pd.to_numeric, errors="coerce")
+        universe[statement] = panel
+        universe[statement + "_previous"] = _lag(panel, frequency)
+    info = _info_frame(raw_data)
+    universe["info"] = info.reindex(index.get_level_values("ticker")).set_axis(index)
+    universe["dates"] = pd.DataFrame({"period": index.get_level_values("period")}, index=index)
+    universe["prices"] = prices
+    return universe
+
+
+def _item(statement: pd.DataFrame, item: str) -> pd.Series:
+    # column of a (ticker x line item) frame, NaN for line items the provider did not report
+    if item in statement.columns:
+        return statement[item].astype(float)
+    return pd.Series(np.nan, index=statement.index)
+
+
+def _quote(info: pd.DataFrame, field: str) -> pd.Series:
+    if field in info.columns:
+        return pd.to_numeric(info[field], errors="coerce")
+    return pd.Series(np.nan, index=info.index)
+
+
+def _safe_divide(numerator: pd.Series, denominator: pd.Series) -> pd.Series:
+    return numerator / denominator.where(denominator != 0)
+
+
+def _flag(values: pd.Series) -> pd.Series:
+    # 1 if the value is positive, 0 otherwise (including missing values)
+    return (values > 0).astype(int)
+
+
+def _tickers(index: pd.Index) -> np.ndarray:
+    return np.asarray(index.get_level_values("ticker") if isinstance(index, pd.MultiIndex) else index)
+
+
+def _lagged(values: pd.Series, dates: pd.Series, lags: int, period_days: float) -> np.ndarray:
+    """
+    Stack a panel series with its lags into a (rows x lags + 1) array, column k holding the value k periods back.
+
+    A lag is NaN unless the row k rows back of the same ticker lies k * period_days (give or take a quarter)
+    before, so gaps in the panel never pull in older periods and a panel of the wrong frequency gives NaN.
+    Without a 'period' level (latest-period universe) all lags are NaN.
+    """
+    stacked = np.full((len(values), lags + 1), np.nan)
+    stacked[:, 0] = values.to_numpy(dtype=float)
+    if not isinstance(values.index, pd.MultiIndex):
+        return stacked
+    grouped_values = values.groupby(level="ticker")
+    grouped_dates = dates.groupby(level="ticker")
+    for lag in range(1, lags + 1):
+        gap = (dates - grouped_dates.shift(lag)).dt.days
+        aligned = ((gap - lag * period_days).abs() <= lag * period_days * 0.25).to_numpy()
+        stacked[aligned, lag] = grouped_values.shift(lag).to_numpy(dtype=float)[aligned]
+    return stacked
+
+
+def _sample_at(frame: pd.DataFrame, index: pd.Index, dates: pd.Series) -> pd.Series:
+    """
+    Look up a (date x ticker) frame at every (ticker, date) of a universe, taking the last row at or
+    before the date, or the last row for NaT dates.
+    """
+    if frame is None or frame.empty:
+        return pd.Series(np.nan, index=index)
+    columns = frame.columns.get_indexer(_tickers(index))
+    when = dates.to_numpy(dtype="datetime64[ns]")
+    rows = frame.index.to_numpy(dtype="datetime64[ns]").searchsorted(when, side="right") - 1
+    rows[np.isnat(when)] = len(frame) - 1
+    values = frame.to_numpy(dtype=float)[rows, columns]
+    values[(rows < 0) | (columns < 0)] = np.nan
+    return pd.Series(values, index=index)
+
+
+def _percentile(values: pd.Series, cross_sections: pd.Series) -> pd.Series:
+    # NaN-aware percentile rank within each cross-section, O(n log n)
+    return values.groupby(cross_sections.to_numpy()).rank(pct=True)
+
+
+def percentile_rank(metrics: pd.DataFrame, groups=None) -> pd.DataFrame:
+    """
+    Rank every metric across the universe as a percentile between 0 and 1, ignoring missing values.
+
+    Parameters:
+    metrics (pd.DataFrame): Metric matrix with one row per ticker (or per (ticker, period)).
+    groups: Optional labels (e.g. the sector of every row) to rank within instead of across the whole frame.
+
+    Returns:
+    pd.DataFrame: The percentile ranks, NaN where the metric is missing.
+    """
+    if groups is None:
+        return metrics.rank(pct=True)
+    return metrics.groupby(np.asarray(groups)).rank(pct=True)
+
+
+def _geometric_average(stacked: np.ndarray, phi: float, step: int = 1) -> np.ndarray:
+    # sum_k phi^(step * k) * x_{t-k}, normalised so that the weights sum to one
+    weights = phi ** (step * np.arange(stacked.shape[-1]))
+    return stacked @ (weights / weights.sum())
+
+
+# Registry of metric definitions: name -> (declared inputs, function computing the metric from its inputs).
+# Inputs are either other metrics or raw universe columns written as "<universe key>:<column>", e.g.
+# "balance_sheet:Total Assets" or "info:marketCap". Names starting with an underscore are intermediates
+# that are not part of METRICS.
+METRIC_REGISTRY = {}
+# metrics relative to the whole universe without a "cross_section:" input, e.g. RSIZE (market value
+# relative to the total of the universe); see is_cross_sectional
+UNIVERSE_METRICS = {"RSIZE"}
+
+
+def register_metric(name: str, *inputs: str):
+    """
+    Decorator registering a metric together with the inputs it is computed from.
+
+    The decorated function receives the inputs as ticker-indexed Series, in the declared order,
+    and returns the metric as a Series.
+
+    Parameters:
+    name (str): The name of the metric.
+    inputs (str): Names of the metrics or raw universe columns the metric depends on.
+
+    Example:
+    >>> @register_metric("ROA", "balance_sheet:Total Assets", "financials:Net Income")
+    ... def _roa(total_assets, net_income):
+    ...     return _safe_divide(net_income, total_assets)
+    """
+    def decorator(function):
+        METRIC_REGISTRY[name] = (tuple(inputs), function)
+        return function
+    return decorator
+
+
+def _is_source(name: str) -> bool:
+    return ":" in name and name not in METRIC_REGISTRY
+
+
+@register_metric("CA", "balance_sheet:Total Current Assets", "balance_sheet:Cash And Cash Equivalents")
+def _ca(current_assets, cash):
+    return current_assets - cash
+
+
+@register_metric("CL", "balance_sheet:Total Current Liabilities", "balance_sheet:Long Term Debt", "balance_sheet:Income Taxes Payable")
+def _cl(current_liabilities, long_term_debt, taxes_payable):
+    return current_liabilities - long_term_debt - taxes_payable
+
+
+@register_metric("DEP", "cash_flow:Depreciation")
+def _dep(depreciation):
+    return depreciation
+
+
+@register_metric("STA", "CA", "CL", "DEP", "balance_sheet:Total Assets")
+def _sta(ca, cl, dep, total_assets):
+    return _safe_divide(ca - cl - dep, total_assets)
+
+
+@register_metric("Market Cap", "info:marketCap")
+def _market_cap(market_cap):
+    return market_cap
+
+
+@register_metric("MTA", "balance_sheet:Total Liab", "Market Cap")
+def _mta(total_liabilities, market_cap):
+    return total_liabilities + market_cap
+
+
+@register_metric("TLMTA", "balance_sheet:Total Liab", "MTA")
+def _tlmta(total_liabilities, mta):
+    return _safe_divide(total_liabilities, mta)
+
+
+@register_metric("CASHMTA", "balance_sheet:Cash And Cash Equivalents", "MTA")
+def _cashmta(cash, mta):
+    return _safe_divide(cash, mta)
+
+
+@register_metric("MB", "MTA", "Market Cap", "balance_sheet:Total Stockholder Equity")
+def _mb(mta, market_cap, book_value):
+    adjusted_book_value = book_value + 0.1 * (market_cap - book_value)
+    return _safe_divide(mta, adjusted_book_value)
+
+
+@register_metric("PRICE", "info:previousClose")
+def _price(recent_price):
+    return np.log(recent_price.where(recent_price > 0))
+
+
+@register_metric("EBIT", "financials:EBIT")
+def _ebit(ebit):
+    return ebit
+
+
+@register_metric("TEV", "Market Cap", "balance_sheet:Total Debt", "balance_sheet:Cash And Cash Equivalents")
+def _tev(market_cap, total_debt, cash):
+    return market_cap + total_debt - cash
+
+
+@register_metric("ROA", "financials:Net Income", "balance_sheet:Total Assets")
+def _roa(net_income, total_assets):
+    return _safe_divide(net_income, total_assets)
+
+
+@register_metric("FS_ROA", "ROA")
+def _fs_roa(roa):
+    return _flag(roa)
+
+
+@register_metric("FCFTA", "cash_flow:Free Cash Flow", "balance_sheet:Total Assets")
+def _fcfta(free_cash_flow, total_assets):
+    return _safe_divide(free_cash_flow, total_assets)
+
+
+@register_metric("FS_FCFTA", "FCFTA")
+def _fs_fcfta(fcfta):
+    return _flag(fcfta)
+
+
+@register_metric("ACCRUAL", "FCFTA", "ROA")
+def _accrual(fcfta, roa):
+    return fcfta - roa
+
+
+@register_metric("FS_ACCRUAL", "ACCRUAL")
+def _fs_accrual(accrual):
+    return _flag(accrual)
+
+
+@register_metric("_leverage", "balance_sheet:Long Term Debt", "balance_sheet:Total Assets")
+def _leverage(long_term_debt, total_assets):
+    return _safe_divide(long_term_debt, total_assets)
+
+
+@register_metric("_leverage_previous", "balance_sheet_previous:Long Term Debt", "balance_sheet_previous:Total Assets")
+def _leverage_previous(long_term_debt, total_assets):
+    return _safe_divide(long_term_debt, total_assets)
+
+
+@register_metric("LEVER", "_leverage_previous", "_leverage")
+def _lever(leverage_t_1, leverage_t):
+    return leverage_t_1 - leverage_t
+
+
+@register_metric("FS_LEVER", "LEVER")
+def _fs_lever(lever):
+    return _flag(lever)
+
+
+@register_metric("_current_ratio", "balance_sheet:Total Current Assets", "balance_sheet:Total Current Liabilities")
+def _current_ratio(current_assets, current_liabilities):
+    return _safe_divide(current_assets, current_liabilities)
+
+
+@register_metric("_current_ratio_previous", "balance_sheet_previous:Total Current Assets", "balance_sheet_previous:Total Current Liabilities")
+def _current_ratio_previous(current_assets, current_liabilities):
+    return _safe_divide(current_assets, current_liabilities)
+
+
+@register_metric("LIQUID", "_current_ratio", "_current_ratio_previous")
+def _liquid(current_ratio_t, current_ratio_t_1):
+    return current_ratio_t - current_ratio_t_1
+
+
+@register_metric("FS_LIQUID", "LIQUID")
+def _fs_liquid(liquid):
+    return _flag(liquid)
+
+
+@register_metric("PE Ratio", "Market Cap", "financials:Net Income")
+def _pe_ratio(market_cap, net_income):
+    return _safe_divide(market_cap, net_income)
+
+
+@register_metric("Cash Ratio", "balance_sheet:Cash And Cash Equivalents", "balance_sheet:Current Liabilities")
+def _cash_ratio(cash, current_liabilities):
+    return _safe_divide(cash, current_liabilities)
+
+
+@register_metric("Quick Ratio", "balance_sheet:Current Assets", "balance_sheet:Inventory", "balance_sheet:Current Liabilities")
+def _quick_ratio(current_assets, inventory, current_liabilities):
+    return _safe_divide(current_assets - inventory, current_liabilities)
+
+
+@register_metric("Current Ratio", "balance_sheet:Current Assets", "balance_sheet:Current Liabilities")
+def _current_ratio_metric(current_assets, current_liabilities):
+    return _safe_divide(current_assets, current_liabilities)
+
+
+@register_metric("Financial Leverage", "balance_sheet:Total Debt", "balance_sheet:Current Assets")
+def _financial_leverage(total_debt, current_assets):
+    return _safe_divide(total_debt, current_assets)
+
+
+@register_metric("PB Ratio", "Market Cap", "balance_sheet:Total Assets")
+def _pb_ratio(market_cap, total_assets):
+    return _safe_divide(market_cap, total_assets)
+
+
+@register_metric("Dividend Yield", "info:dividendYield")
+def _dividend_yield(dividend_yield):
+    return dividend_yield
+
+
+# Beneish M-score components, year-over-year ratios of the statement panel
+
+
+@register_metric("DSRI", "balance_sheet:Accounts Receivable", "financials:Total Revenue",
+                 "balance_sheet_previous:Accounts Receivable", "financials_previous:Total Revenue")
+def _dsri(receivables, sales, receivables_t_1, sales_t_1):
+    return _safe_divide(_safe_divide(receivables, sales), _safe_divide(receivables_t_1, sales_t_1))
+
+
+@register_metric("_gross_margin", "financials:Total Revenue", "financials:Cost Of Revenue")
+def _gross_margin(sales, cost_of_revenue):
+    return _safe_divide(sales - cost_of_revenue, sales)
+
+
+@register_metric("_gross_margin_previous", "financials_previous:Total Revenue", "financials_previous:Cost Of Revenue")
+def _gross_margin_previous(sales, cost_of_revenue):
+    return _safe_divide(sales - cost_of_revenue, sales)
+
+
+@register_metric("GMI", "_gross_margin_previous", "_gross_margin")
+def _gmi(gross_margin_t_1, gross_margin_t):
+    return _safe_divide(gross_margin_t_1, gross_margin_t)
+
+
+@register_metric("AQI", "balance_sheet:Current Assets", "balance_sheet:Net PPE", "balance_sheet:Total Assets",
+                 "balance_sheet_previous:Current Assets", "balance_sheet_previous:Net PPE", "balance_sheet_previous:Total Assets")
+def _aqi(current_assets, ppe, total_assets, current_assets_t_1, ppe_t_1, total_assets_t_1):
+    asset_quality = 1 - _safe_divide(current_assets + ppe, total_assets)
+    asset_quality_t_1 = 1 - _safe_divide(current_assets_t_1 + ppe_t_1, total_assets_t_1)
+    return _safe_divide(asset_quality, asset_quality_t_1)
+
+
+@register_metric("SGI", "financials:Total Revenue", "financials_previous:Total Revenue")
+def _sgi(sales, sales_t_1):
+    return _safe_divide(sales, sales_t_1)
+
+
+@register_metric("DEPI", "cash_flow:Depreciation And Amortization", "balance_sheet:Net PPE",
+                 "cash_flow_previous:Depreciation And Amortization", "balance_sheet_previous:Net PPE")
+def _depi(depreciation, ppe, depreciation_t_1, ppe_t_1):
+    return _safe_divide(_safe_divide(depreciation_t_1, depreciation_t_1 + ppe_t_1), _safe_divide(depreciation, depreciation + ppe))
+
+
+@register_metric("SGAI", "financials:Selling General And Administration", "financials:Total Revenue",
+                 "financials_previous:Selling General And Administration", "financials_previous:Total Revenue")
+def _sgai(sga, sales, sga_t_1, sales_t_1):
+    return _safe_divide(_safe_divide(sga, sales), _safe_divide(sga_t_1, sales_t_1))
+
+
+@register_metric("LVGI", "balance_sheet:Current Liabilities", "balance_sheet:Long Term Debt", "balance_sheet:Total Assets",
+                 "balance_sheet_previous:Current Liabilities", "balance_sheet_previous:Long Term Debt", "balance_sheet_previous:Total Assets")
+def _lvgi(current_liabilities, long_term_debt, total_assets, current_liabilities_t_1, long_term_debt_t_1, total_assets_t_1):
+    leverage = _safe_divide(current_liabilities + long_term_debt, total_assets)
+    leverage_t_1 = _safe_divide(current_liabilities_t_1 + long_term_debt_t_1, total_assets_t_1)
+    return _safe_divide(leverage, leverage_t_1)
+
+
+@register_metric("TATA", "financials:Net Income Continuous Operations", "cash_flow:Operating Cash Flow", "balance_sheet:Total Assets")
+def _tata(income_continuing_operations, operating_cash_flow, total_assets):
+    return _safe_divide(income_continuing_operations - operating_cash_flow, total_assets)
 
-def get_fundamentals_dict(tickers:list, wanted_metrics=[]) -> dict:
+
+@register_metric("PROBM", "DSRI", "GMI", "AQI", "SGI", "DEPI", "SGAI", "TATA", "LVGI")
+def _probm(dsri, gmi, aqi, sgi, depi, sgai, tata, lvgi):
+    return (-4.84 + 0.920 * dsri + 0.528 * gmi + 0.404 * aqi + 0.892 * sgi + 0.115 * depi
+            - 0.172 * sgai + 4.679 * tata - 0.327 * lvgi)
+
+
+@register_metric("PMAN", "PROBM")
+def _pman(probm):
+    from scipy.special import ndtr
+
+    return pd.Series(ndtr(probm.to_numpy(dtype=float)), index=probm.index)
+
+
+# Campbell, Hilscher and Szilagyi distress components
+
+# weight halving every quarter for NIMTAAVG (phi^3) and every three months for EXRETAVG (phi)
+DISTRESS_PHI = 2 ** (-1 / 3)
+
+
+@register_metric("_nimta", "financials:Net Income", "MTA")
+def _nimta(net_income, mta):
+    return _safe_divide(net_income, mta)
+
+
+@register_metric("NIMTAAVG", "_nimta", "dates:period")
+def _nimtaavg(nimta, dates):
+    # geometrically weighted average of the last four quarters; needs a quarterly panel, NaN otherwise
+    stacked = _lagged(nimta, dates, lags=3, period_days=PERIOD_DAYS["quarterly"])
+    return pd.Series(_geometric_average(stacked, DISTRESS_PHI, step=3), index=nimta.index)
+
+
+@register_metric("EXRETAVG", "prices:close", "dates:period")
+def _exretavg(prices, dates):
+    if prices is None or BENCHMARK not in prices.columns:
+        return pd.Series(np.nan, index=dates.index)
+    monthly = np.log(prices.resample("ME").last()).diff()
+    excess = monthly.sub(monthly[BENCHMARK], axis=0).drop(columns=BENCHMARK)
+    if len(excess) < 12:
+        return pd.Series(np.nan, index=dates.index)
+    # (months - 11) x tickers x 12 windows, the last element of each window being the latest month
+    windows = np.lib.stride_tricks.sliding_window_view(excess.to_numpy(dtype=float), 12, axis=0)
+    average = pd.DataFrame(_geometric_average(windows[..., ::-1], DISTRESS_PHI), index=excess.index[11:], columns=excess.columns)
+    return _sample_at(average, dates.index, dates)
+
+
+@register_metric("SIGMA", "prices:close", "dates:period")
+def _sigma(prices, dates):
+    if prices is None:
+        return pd.Series(np.nan, index=dates.index)
+    returns = np.log(prices).diff()
+    # annualised standard deviation of daily returns over the past three months, centred on zero
+    squared = (returns ** 2).rolling(63, min_periods=40)
+    sigma = np.sqrt(252 * squared.sum() / (squared.count() - 1))
+    return _sample_at(sigma, dates.index, dates)
+
+
+@register_metric("RSIZE", "Market Cap")
+def _rsize(market_cap):
+    # relative to the total market value of the universe, e.g. the S&P 500
+    per_ticker = market_cap.groupby(level="ticker").first() if isinstance(market_cap.index, pd.MultiIndex) else market_cap
+    return np.log(market_cap.where(market_cap > 0) / per_ticker.sum())
+
+
+# Quantitative Value quality metrics; the 8-year metrics need an annual panel with 8 consecutive years
+
+EIGHT_YEARS = 7  # lags
+
+
+@register_metric("_roa_previous", "financials_previous:Net Income", "balance_sheet_previous:Total Assets")
+def _roa_previous(net_income, total_assets):
+    return _safe_divide(net_income, total_assets)
+
+
+@register_metric("_roc", "financials:EBIT", "balance_sheet:Net PPE", "balance_sheet:Current Assets", "balance_sheet:Current Liabilities")
+def _roc(ebit, ppe, current_assets, current_liabilities):
+    return _safe_divide(ebit, ppe + current_assets - current_liabilities)
+
+
+def _eight_year_geometric_average(values: pd.Series, dates: pd.Series) -> pd.Series:
+    stacked = _lagged(values, dates, lags=EIGHT_YEARS, period_days=PERIOD_DAYS["annual"])
+    with np.errstate(invalid="ignore"):
+        average = np.exp(np.log1p(stacked).mean(axis=1)) - 1
+    return pd.Series(average, index=values.index)
+
+
+@register_metric("8yr_ROA", "ROA", "dates:period")
+def _eight_year_roa(roa, dates):
+    return _eight_year_geometric_average(roa, dates)
+
+
+@register_metric("8yr_ROC", "_roc", "dates:period")
+def _eight_year_roc(roc, dates):
+    return _eight_year_geometric_average(roc, dates)
+
+
+@register_metric("FCFA", "cash_flow:Free Cash Flow", "balance_sheet:Total Assets", "dates:period")
+def _fcfa(free_cash_flow, total_assets, dates):
+    stacked = _lagged(free_cash_flow, dates, lags=EIGHT_YEARS, period_days=PERIOD_DAYS["annual"])
+    return _safe_divide(pd.Series(stacked.sum(axis=1), index=free_cash_flow.index).where(~np.isnan(stacked).any(axis=1)), total_assets)
+
+
+@register_metric("MG", "_gross_margin", "dates:period")
+def _mg(gross_margin, dates):
+    stacked = _lagged(gross_margin, dates, lags=EIGHT_YEARS, period_days=PERIOD_DAYS["annual"])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        growth = (stacked[:, 0] / stacked[:, -1]) ** (1 / EIGHT_YEARS) - 1
+    return pd.Series(growth, index=gross_margin.index)
+
+
+@register_metric("MS", "_gross_margin", "dates:period")
+def _ms(gross_margin, dates):
+    stacked = _lagged(gross_margin, dates, lags=EIGHT_YEARS, period_days=PERIOD_DAYS["annual"])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        stability = stacked.mean(axis=1) / stacked.std(axis=1, ddof=1)
+    return pd.Series(stability, index=gross_margin.index)
+
+
+@register_metric("P_8yr_ROA", "8yr_ROA", "cross_section:key")
+def _p_eight_year_roa(eight_year_roa, cross_sections):
+    return _percentile(eight_year_roa, cross_sections)
+
+
+@register_metric("P_8yr_ROC", "8yr_ROC", "cross_section:key")
+def _p_eight_year_roc(eight_year_roc, cross_sections):
+    return _percentile(eight_year_roc, cross_sections)
+
+
+@register_metric("P_CFOA", "FCFA", "cross_section:key")
+def _p_cfoa(fcfa, cross_sections):
+    return _percentile(fcfa, cross_sections)
+
+
+@register_metric("P_MG", "MG", "cross_section:key")
+def _p_mg(mg, cross_sections):
+    return _percentile(mg, cross_sections)
+
+
+@register_metric("P_MS", "MS", "cross_section:key")
+def _p_ms(ms, cross_sections):
+    return _percentile(ms, cross_sections)
+
+
+@register_metric("MM", "P_MG", "P_MS")
+def _mm(p_mg, p_ms):
+    # composites are NaN unless every component is known, e.g. without the 8 years of history behind MG and MS
+    return pd.concat([p_mg, p_ms], axis=1).max(axis=1, skipna=False)
+
+
+@register_metric("P_FP", "P_8yr_ROA", "P_8yr_ROC", "P_CFOA", "MM", "cross_section:key")
+def _p_fp(p_eight_year_roa, p_eight_year_roc, p_cfoa, mm, cross_sections):
+    franchise_power = pd.concat([p_eight_year_roa, p_eight_year_roc, p_cfoa, mm], axis=1).mean(axis=1, skipna=False)
+    return _percentile(franchise_power, cross_sections)
+
+
+@register_metric("NEQISS", "cash_flow:Repurchase Of Capital Stock", "cash_flow:Issuance Of Capital Stock")
+def _neqiss(repurchases, issuance):
+    # repurchases are reported as negative cash flows; net repurchases are positive
+    neqiss = -repurchases.fillna(0) - issuance.fillna(0)
+    return neqiss.where(repurchases.notna() | issuance.notna())
+
+
+@register_metric("FS_NEQISS", "NEQISS")
+def _fs_neqiss(neqiss):
+    return _flag(neqiss)
+
+
+@register_metric("FS_MARGIN", "_gross_margin", "_gross_margin_previous")
+def _fs_margin(gross_margin, gross_margin_t_1):
+    return _flag(gross_margin - gross_margin_t_1)
+
+
+@register_metric("FS_TURN", "financials:Total Revenue", "balance_sheet:Total Assets",
+                 "financials_previous:Total Revenue", "balance_sheet_previous:Total Assets")
+def _fs_turn(sales, total_assets, sales_t_1, total_assets_t_1):
+    return _flag(_safe_divide(sales, total_assets) - _safe_divide(sales_t_1, total_assets_t_1))
+
+
+@register_metric("_fcfta_previous", "cash_flow_previous:Free Cash Flow", "balance_sheet_previous:Total Assets")
+def _fcfta_previous(free_cash_flow, total_assets):
+    return _safe_divide(free_cash_flow, total_assets)
+
+
+@register_metric("_fs_score", "FS_ROA", "FS_FCFTA", "FS_ACCRUAL", "FS_LEVER", "FS_LIQUID", "FS_NEQISS",
+                 "ROA", "_roa_previous", "FCFTA", "_fcfta_previous", "FS_MARGIN", "FS_TURN")
+def _fs_score(fs_roa, fs_fcfta, fs_accrual, fs_lever, fs_liquid, fs_neqiss, roa, roa_t_1, fcfta, fcfta_t_1, fs_margin, fs_turn):
+    fs_delta_roa = _flag(roa - roa_t_1)
+    fs_delta_fcfta = _flag(fcfta - fcfta_t_1)
+    return fs_roa + fs_fcfta + fs_accrual + fs_lever + fs_liquid + fs_neqiss + fs_delta_roa + fs_delta_fcfta + fs_margin + fs_turn
+
+
+@register_metric("P_FS", "_fs_score", "cross_section:key")
+def _p_fs(fs_score, cross_sections):
+    return _percentile(fs_score, cross_sections)
+
+
+@register_metric("QUALITY", "P_FP", "P_FS")
+def _quality(p_fp, p_fs):
+    # NaN without franchise power, rather than P_FS alone under the QUALITY name
+    return pd.concat([p_fp, p_fs], axis=1).mean(axis=1, skipna=False)
+
+
+#TODO: add info.get("earningsGrowth"- not sure what timeframe this is
+
+
+def resolve_metrics(wanted_metrics: list) -> list:
+    """
+    Order the wanted metrics and everything they depend on so that inputs come before the metrics using them.
+
+    Parameters:
+    wanted_metrics (list): The metrics to resolve.
+
+    Returns:
+    list: Metric names and raw universe columns in a valid evaluation order, each listed once.
+    """
+    order = []
+    state = {}  # name -> "visiting" while its inputs are being resolved, "done" afterwards
+
+    def visit(name):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"Circular metric dependency involving: {name}")
+        if not _is_source(name) and name not in METRIC_REGISTRY and name not in METRICS:
+            raise ValueError(f"Invalid metric: {name}")
+        state[name] = "visiting"
+        for dependency in METRIC_REGISTRY.get(name, ((), None))[0]:
+            visit(dependency)
+        state[name] = "done"
+        order.append(name)
+
+    for metric in wanted_metrics:
+        visit(metric)
+    return order
+
+
+class MetricEngine:
+    """
+    Evaluate registered metrics over a universe, computing every intermediate at most once.
+
+    Parameters:
+    universe (dict): Output of build_universe or build_panel.
+    rank_by (str): Optional info field (e.g. 'sector') to compute percentile ranks within. Ranks are always
+    taken per fiscal year on a panel.
+    """
+
+    def __init__(self, universe: dict, rank_by: str = None):
+        self.universe = universe
+        self.index = universe["info"].index
+        self.rank_by = rank_by
+        self._memo = {}
+
+    def _cross_sections(self) -> pd.Series:
+        # label of the cross-section every row is ranked in
+        keys = self.universe["dates"]["period"].dt.year.fillna(0).astype(int).astype(str)
+        if self.rank_by:
+            info = self.universe["info"]
+            labels = info[self.rank_by] if self.rank_by in info.columns else pd.Series("", index=self.index)
+            keys = keys + "|" + labels.fillna("").astype(str)
+        return keys
+
+    def _source(self, name: str):
+        key, column = name.split(":", 1)
+        frame = self.universe.get(key)
+        if key == "prices":
+            # the whole (date x ticker) price panel, or None when no prices were given
+            return frame
+        if key == "dates":
+            return frame[column]
+        if key == "cross_section":
+            return self._cross_sections()
+        if key == "info":
+            return _quote(frame, column)
+        return _item(frame, column)
+
+    def _evaluate(self, name: str) -> pd.Series:
+        if _is_source(name):
+            return self._source(name)
+        if name not in METRIC_REGISTRY:
+            # Not implemented
+            return pd.Series(np.nan, index=self.index)
+        inputs, function = METRIC_REGISTRY[name]
+        return function(*(self._memo[dependency] for dependency in inputs))
+
+    def compute(self, wanted_metrics: list = None) -> pd.DataFrame:
+        """
+        Calculate the wanted metrics, reusing intermediates computed by earlier calls.
+
+        Parameters:
+        wanted_metrics (list): A list of metrics to calculate. If empty, all metrics are calculated.
+
+        Returns:
+        pd.DataFrame: A ticker-indexed DataFrame with one column per metric.
+        """
+        wanted_metrics = list(wanted_metrics) if wanted_metrics else METRICS
+        for name in resolve_metrics(wanted_metrics):
+            if name not in self._memo:
+                self._memo[name] = self._evaluate(name)
+        return pd.DataFrame({metric: self._memo[metric] for metric in wanted_metrics}, index=self.index, columns=wanted_metrics)
+
+    def invalidate(self, sources: set):
+        """
+        Forget the given raw universe columns and every computed metric depending on them, so the next
+        compute() recalculates only those. Everything else stays resident.
+        """
+        stale = set(sources)
+        for name in resolve_metrics(list(self._memo)):
+            if any(dependency in stale for dependency in METRIC_REGISTRY.get(name, ((), None))[0]):
+                stale.add(name)
+        for name in stale:
+            self._memo.pop(name, None)
+
+    def update_quotes(self, quotes):
+        """
+        Replace quote fields (e.g. marketCap, previousClose) after a price tick.
+
+        Only the metrics depending on the updated fields (PE Ratio, PB Ratio, MTA, TEV, MB, PRICE, ...)
+        are recalculated by the next compute(); statement-derived intermediates are kept.
+
+        Parameters:
+        quotes (pd.DataFrame or dict): New quote fields per ticker, as a ticker-indexed DataFrame or a
+        dictionary mapping tickers to dictionaries of fields. Tickers left out keep their current quotes.
+        """
+        if isinstance(quotes, dict):
+            quotes = pd.DataFrame.from_dict(quotes, orient="index")
+        info = self.universe["info"].copy()
+        quoted = quotes.index.get_indexer(_tickers(info.index)) >= 0
+        for field in quotes.columns:
+            new = pd.Series(quotes[field].reindex(_tickers(info.index)).to_numpy(), index=info.index)
+            current = info[field] if field in info.columns else pd.Series(np.nan, index=info.index)
+            info[field] = new.where(quoted, current)
+        self.universe["info"] = info
+        self.invalidate({f"info:{field}" for field in quotes.columns})
+
+    def update_prices(self, prices: pd.DataFrame):
+        """
+        Replace the (date x ticker) price panel, recalculating only the metrics based on it (EXRETAVG, SIGMA).
+        """
+        self.universe["prices"] = prices
+        self.invalidate({"prices:close"})
+
+
+def compute_metrics(universe: dict, wanted_metrics: list = None, rank_by: str = None) -> pd.DataFrame:
     """
-    Calculate various metrics from a given ticker using yfinance to get the fundamental data.
+    Calculate metrics for all tickers of a universe at once.
 
-    This function takes a ticker as input and computes several metrics,
-    including ratios and other relevant calculations. Most metrics are not directly readable
-    from financial statements and require some form of calculation.
+    Every metric is computed as a single column operation over the aligned (ticker x line item)
+    frames returned by build_universe. Metrics are evaluated in dependency order and shared
+    intermediates (e.g. MTA, ROA) are computed only once.
 
     Parameters:
-    ticker (str): The stock ticker to calculate metrics for.
+    universe (dict): Output of build_universe or build_panel.
     wanted_metrics (list): A list of metrics to calculate. If empty, all metrics are calculated.
+    rank_by (str): Optional info field (e.g. 'sector') within which the percentile metrics (P_*, QUALITY)
+    are ranked, instead of across the whole universe.
 
     Returns:
-    dict: A dictionary containing the calculated metrics.
+    pd.DataFrame: A DataFrame with one column per metric, indexed like the universe: by ticker for
+    build_universe, by (ticker, period) for build_panel.
+    """
+    return MetricEngine(universe, rank_by=rank_by).compute(wanted_metrics)
+
+
+def get_fundamentals(tickers: list, wanted_metrics: list = None, provider=None, max_workers: int = 16, prices: pd.DataFrame = None,
+                     rank_by: str = None) -> pd.DataFrame:
+    """
+    Calculate various metrics for a universe of tickers using yfinance to get the fundamental data.
+
+    The statements of all tickers are loaded once and every metric is computed for the whole
+    universe in a single column operation.
+
+    Parameters:
+    tickers (list): The stock tickers to calculate metrics for.
+    wanted_metrics (list): A list of metrics to calculate. If empty, all metrics are calculated.
+    provider: The data provider, yfinance by default.
+    max_workers (int): Maximum number of concurrent requests.
+    prices (pd.DataFrame): Daily closing prices (date x ticker) including the BENCHMARK column, see
+    GatherFundamental.fetching.download_prices. Only needed for EXRETAVG and SIGMA.
+    rank_by (str): Optional info field (e.g. 'sector') within which the percentile metrics are ranked.
+
+    Returns:
+    pd.DataFrame: A ticker-indexed DataFrame with one column per metric.
 
     Example:
-    >>> metrics = get_fundamentals_dict('AAPL', ['PE Ratio', 'Debt to Equity'])
+    >>> metrics = get_fundamentals(['AAPL', 'MSFT'], ['PE Ratio', 'Market Cap'])
     >>> print(metrics)
-    {'PE Ratio': 28.5, 'Debt to Equity': 1.5}
-    """
-
-    # Fetch data from yfinance
-    stocks = yf.Tickers(" ".join(tickers))
-    metrics_per_ticker = {}
-    for ticker in tickers:
-        stock = stocks.tickers[ticker]
-        financials = stock.financials
-        balance_sheet = stock.balance_sheet
-        cash_flow = stock.cashflow
-        info = stock.info
-        # dict_keys(['address1', 'city', 'state', 'zip', 'country', 'phone', 'website', 'industry', 'industryKey', 'industryDisp', 'sector', 'sectorKey', 'sectorDisp', 'longBusinessSummary', 'fullTimeEmployees', 'companyOfficers', 'auditRisk', 'boardRisk', 'compensationRisk', 'shareHolderRightsRisk', 'overallRisk', 'governanceEpochDate', 'compensationAsOfEpochDate', 'irWebsite', 'maxAge', 'priceHint', 'previousClose', 'open', 'dayLow', 'dayHigh', 'regularMarketPreviousClose', 'regularMarketOpen', 'regularMarketDayLow', 'regularMarketDayHigh', 'dividendRate', 'dividendYield', 'exDividendDate', 'payoutRatio', 'fiveYearAvgDividendYield', 'beta', 'trailingPE', 'forwardPE', 'volume', 'regularMarketVolume', 'averageVolume', 'averageVolume10days', 'averageDailyVolume10Day', 'marketCap', 'fiftyTwoWeekLow', 'fiftyTwoWeekHigh', 'priceToSalesTrailing12Months', 'fiftyDayAverage', 'twoHundredDayAverage', 'trailingAnnualDividendRate', 'trailingAnnualDividendYield', 'currency', 'enterpriseValue', 'profitMargins', 'floatShares', 'sharesOutstanding', 'sharesShort', 'sharesShortPriorMonth', 'sharesShortPreviousMonthDate', 'dateShortInterest', 'sharesPercentSharesOut', 'heldPercentInsiders', 'heldPercentInstitutions', 'shortRatio', 'shortPercentOfFloat', 'impliedSharesOutstanding', 'bookValue', 'priceToBook', 'lastFiscalYearEnd', 'nextFiscalYearEnd', 'mostRecentQuarter', 'earningsQuarterlyGrowth', 'netIncomeToCommon', 'trailingEps', 'forwardEps', 'pegRatio', 'lastSplitFactor', 'lastSplitDate', 'enterpriseToRevenue', 'enterpriseToEbitda', '52WeekChange', 'SandP52WeekChange', 'lastDividendValue', 'lastDividendDate', 'exchange', 'quoteType', 'symbol', 'underlyingSymbol', 'shortName', 'longName', 'firstTradeDateEpochUtc', 'timeZoneFullName', 'timeZoneShortName', 'uuid', 'messageBoardId', 'gmtOffSetMilliseconds', 'currentPrice', 'targetHighPrice', 'targetLowPrice', 'targetMeanPrice', 'targetMedianPrice', 'recommendationMean', 'recommendationKey', 'numberOfAnalystOpinions', 'totalCash', 'totalCashPerShare', 'ebitda', 'totalDebt', 'quickRatio', 'currentRatio', 'totalRevenue', 'debtToEquity', 'revenuePerShare', 'returnOnAssets', 'returnOnEquity', 'freeCashflow', 'operatingCashflow', 'earningsGrowth', 'revenueGrowth', 'grossMargins', 'ebitdaMargins', 'operatingMargins', 'financialCurrency', 'trailingPegRatio'])
-
-        metrics = {}
-
-        def fetch_financial_data(item, statement):
-            try:
-                return statement.loc[item].iloc[0]
-            except KeyError:
-                return np.nan
-
-        for metric in wanted_metrics:
-            if metric == "CA":
-                metrics["CA"] = fetch_financial_data("Total Current Assets", balance_sheet) - fetch_financial_data("Cash And Cash Equivalents", balance_sheet)
-            elif metric == "CL":
-                metrics["CL"] = fetch_financial_data("Total Current Liabilities", balance_sheet) - fetch_financial_data("Long Term Debt", balance_sheet) - fetch_financial_data("Income Taxes Payable", balance_sheet)
-            elif metric == "DEP":
-                metrics["DEP"] = fetch_financial_data("Depreciation", cash_flow)
-            elif metric == "STA":
-                CA = fetch_financial_data("Total Current Assets", balance_sheet) - fetch_financial_data("Cash And Cash Equivalents", balance_sheet)
-                CL = fetch_financial_data("Total Current Liabilities", balance_sheet) - fetch_financial_data("Long Term Debt", balance_sheet) - fetch_financial_data("Income Taxes Payable", balance_sheet)
-                DEP = fetch_financial_data("Depreciation", cash_flow)
-                total_assets = fetch_financial_data("Total Assets", balance_sheet)
-                metrics["STA"] = (CA - CL - DEP) / total_assets if total_assets != 0 else np.nan
-            elif metric == "SNOA":
-                # Not implemented
-                metrics["SNOA"] = np.nan
-            elif metric == "COMBOACCRUAL":
-                # Not implemented
-                metrics["COMBOACCRUAL"] = np.nan
-            elif metric == "DSRI":
-                # Not implemented
-                metrics["DSRI"] = np.nan
-            elif metric == "GMI":
-                # Not implemented
-                metrics["GMI"] = np.nan
-            elif metric == "AQI":
-                # Not implemented
-                metrics["AQI"] = np.nan
-            elif metric == "SGI":
-                # Not implemented
-                metrics["SGI"] = np.nan
-            elif metric == "DEPI":
-                # Not implemented
-                metrics["DEPI"] = np.nan
-            elif metric == "SGAI":
-                # Not implemented
-                metrics["SGAI"] = np.nan
-            elif metric == "LVGI":
-                # Not implemented
-                metrics["LVGI"] = np.nan
-            elif metric == "TATA":
-                # Not implemented
-                metrics["TATA"] = np.nan
-            elif metric == "PROBM":
-                # Not implemented
-                metrics["PROBM"] = np.nan
-            elif metric == "PMAN":
-                # Not implemented
-                metrics["PMAN"] = np.nan
-            elif metric == "NIMTAAVG":
-                # Not implemented
-                metrics["NIMTAAVG"] = np.nan
-            elif metric == "MTA":
-                liabilities = fetch_financial_data("Total Liab", balance_sheet)
-                market_cap = info.get("marketCap", np.nan)
-                metrics["MTA"] = liabilities + market_cap
-            elif metric == "TLMTA":
-                total_liabilities = fetch_financial_data("Total Liab", balance_sheet)
-                mta = liabilities + market_cap
-                metrics["TLMTA"] = total_liabilities / mta if mta != 0 else np.nan
-            elif metric == "CASHMTA":
-                cash_and_equivalents = fetch_financial_data("Cash And Cash Equivalents", balance_sheet)
-                metrics["CASHMTA"] = cash_and_equivalents / mta if mta != 0 else np.nan
-            elif metric == "EXRETAVG":
-                # Not implemented
-                metrics["EXRETAVG"] = np.nan
-            elif metric == "SIGMA":
-                # Not implemented
-                metrics["SIGMA"] = np.nan
-            elif metric == "RSIZE":
-                # Not implemented
-                metrics["RSIZE"] = np.nan
-            elif metric == "MB":
-                book_value = fetch_financial_data("Total Stockholder Equity", balance_sheet)
-                adjusted_book_value = book_value + 0.1 * (market_cap - book_value)
-                metrics["MB"] = mta / adjusted_book_value if adjusted_book_value != 0 else np.nan
-            elif metric == "PRICE":
-                recent_price = info.get("previousClose", np.nan)
-                metrics["PRICE"] = np.log(recent_price) if recent_price > 0 else np.nan
-            elif metric == "LPFD":
-                # Not implemented
-                metrics["LPFD"] = np.nan
-            elif metric == "PFD":
-                # Not implemented
-                metrics["PFD"] = np.nan
-            elif metric == "EBIT":
-                metrics["EBIT"] = fetch_financial_data("EBIT", financials)
-            elif metric == "TEV":
-                total_debt = fetch_financial_data("Total Debt", balance_sheet)
-                metrics["TEV"] = market_cap + total_debt - cash_and_equivalents
-            elif metric == "8yr_ROA":
-                # Not implemented
-                metrics["8yr_ROA"] = np.nan
-            elif metric == "P_8yr_ROA":
-                # Not implemented
-                metrics["P_8yr_ROA"] = np.nan
-            elif metric == "8yr_ROC":
-                # Not implemented
-                metrics["8yr_ROC"] = np.nan
-            elif metric == "P_8yr_ROC":
-                # Not implemented
-                metrics["P_8yr_ROC"] = np.nan
-            elif metric == "FCFA":
-                # Not implemented
-                metrics["FCFA"] = np.nan
-            elif metric == "P_CFOA":
-                # Not implemented
-                metrics["P_CFOA"] = np.nan
-            elif metric == "MG":
-                # Not implemented
-                metrics["MG"] = np.nan
-            elif metric == "P_MG":
-                # Not implemented
-                metrics["P_MG"] = np.nan
-            elif metric == "MS":
-                # Not implemented
-                metrics["MS"] = np.nan
-            elif metric == "P_MS":
-                # Not implemented
-                metrics["P_MS"] = np.nan
-            elif metric == "MM":
-                # Not implemented
-                metrics["MM"] = np.nan
-            elif metric == "P_FP":
-                # Not implemented
-                metrics["P_FP"] = np.nan
-            elif metric == "ROA":
-                net_income = fetch_financial_data("Net Income", financials)
-                total_assets = fetch_financial_data("Total Assets", balance_sheet)
-                metrics["ROA"] = net_income / total_assets if total_assets != 0 else np.nan
-            elif metric == "FS_ROA":
-                net_income = fetch_financial_data("Net Income", financials)
-                total_assets = fetch_financial_data("Total Assets", balance_sheet)
-                metrics["FS_ROA"] = 1 if net_income / total_assets > 0 else 0
-            elif metric == "FCFTA":
-                free_cash_flow = fetch_financial_data("Free Cash Flow", cash_flow)
-                total_assets = fetch_financial_data("Total Assets", balance_sheet)
-                metrics["FCFTA"] = free_cash_flow / total_assets if total_assets != 0 else np.nan
-            elif metric == "FS_FCFTA":
-                free_cash_flow = fetch_financial_data("Free Cash Flow", cash_flow)
-                total_assets = fetch_financial_data("Total Assets", balance_sheet)
-                metrics["FS_FCFTA"] = 1 if free_cash_flow / total_assets > 0 else 0
-            elif metric == "ACCRUAL":
-                free_cash_flow = fetch_financial_data("Free Cash Flow", cash_flow)
-                net_income = fetch_financial_data("Net Income", financials)
-                total_assets = fetch_financial_data("Total Assets", balance_sheet)
-                fcfta = free_cash_flow / total_assets if total_assets != 0 else np.nan
-                roa = net_income / total_assets if total_assets != 0 else np.nan
-                metrics["ACCRUAL"] = fcfta - roa
-            elif metric == "FS_ACCRUAL":
-                free_cash_flow = fetch_financial_data("Free Cash Flow", cash_flow)
-                net_income = fetch_financial_data("Net Income", financials)
-                total_assets = fetch_financial_data("Total Assets", balance_sheet)
-                fcfta = free_cash_flow / total_assets if total_assets != 0 else np.nan
-                roa = net_income / total_assets if total_assets != 0 else np.nan
-                accrual = fcfta - roa
-                metrics["FS_ACCRUAL"] = 1 if accrual > 0 else 0
-            elif metric == "LEVER":
-                long_term_debt_t_1 = fetch_financial_data("Long Term Debt", balance_sheet.shift(1))
-                total_assets_t_1 = fetch_financial_data("Total Assets", balance_sheet.shift(1))
-                long_term_debt_t = fetch_financial_data("Long Term Debt", balance_sheet)
-                total_assets_t = fetch_financial_data("Total Assets", balance_sheet)
-                metrics["LEVER"] = (long_term_debt_t_1 / total_assets_t_1) - (long_term_debt_t / total_assets_t) if total_assets_t_1 != 0 and total_assets_t != 0 else np.nan
-            elif metric == "FS_LEVER":
-                long_term_debt_t_1 = fetch_financial_data("Long Term Debt", balance_sheet.shift(1))
-                total_assets_t_1 = fetch_financial_data("Total Assets", balance_sheet.shift(1))
-                long_term_debt_t = fetch_financial_data("Long Term Debt", balance_sheet)
-                total_assets_t = fetch_financial_data("Total Assets", balance_sheet)
-                lever = (long_term_debt_t_1 / total_assets_t_1) - (long_term_debt_t / total_assets_t) if total_assets_t_1 != 0 and total_assets_t != 0 else np.nan
-                metrics["FS_LEVER"] = 1 if lever > 0 else 0
-            elif metric == "LIQUID":
-                current_ratio_t = fetch_financial_data("Total Current Assets", balance_sheet) / fetch_financial_data("Total Current Liabilities", balance_sheet)
-                current_ratio_t_1 = fetch_financial_data("Total Current Assets", balance_sheet.shift(1)) / fetch_financial_data("Total Current Liabilities", balance_sheet.shift(1))
-                metrics["LIQUID"] = current_ratio_t - current_ratio_t_1
-            elif metric == "FS_LIQUID":
-                current_ratio_t = fetch_financial_data("Total Current Assets", balance_sheet) / fetch_financial_data("Total Current Liabilities", balance_sheet)
-                current_ratio_t_1 = fetch_financial_data("Total Current Assets", balance_sheet.shift(1)) / fetch_financial_data("Total Current Liabilities", balance_sheet.shift(1))
-                liquid = current_ratio_t - current_ratio_t_1
-                metrics["FS_LIQUID"] = 1 if liquid > 0 else 0
-            elif metric == "NEQISS":
-                # Not implemented
-                metrics["NEQISS"] = np.nan
-            elif metric == "FS_NEQISS":
-                # Not implemented
-                metrics["FS_NEQISS"] = np.nan
-            elif metric == "FS_MARGIN":
-                # Not implemented
-                metrics["FS_MARGIN"] = np.nan
-            elif metric == "FS_TURN":
-                # Not implemented
-                metrics["FS_TURN"] = np.nan
-            elif metric == "P_FS":
-                # Not implemented
-                metrics["P_FS"] = np.nan
-            elif metric == "QUALITY":
-                # Not implemented
-                metrics["QUALITY"] = np.nan
-            elif metric == "PE Ratio":
-                market_cap = info.get("marketCap", np.nan)
-                net_income = fetch_financial_data("Net Income", financials)
-                metrics["PE Ratio"] = market_cap / net_income if net_income != 0 else np.nan
-            elif metric == "Cash Ratio":
-                cash_and_equivalents = fetch_financial_data("Cash And Cash Equivalents", balance_sheet)
-                total_current_liabilities = fetch_financial_data("Current Liabilities", balance_sheet)
-                metrics["Cash Ratio"] = cash_and_equivalents / total_current_liabilities if total_current_liabilities != 0 else np.nan
-            elif metric == "Quick Ratio":
-                cash_and_equivalents = fetch_financial_data("Current Assets", balance_sheet)
-                inventory = fetch_financial_data("Inventory", balance_sheet)
-                current_liabilities = fetch_financial_data("Current Liabilities", balance_sheet)
-                metrics["Quick Ratio"] = (cash_and_equivalents - inventory) / current_liabilities if current_liabilities != 0 else np.nan
-            elif metric == "Current Ratio":
-                total_current_assets = fetch_financial_data("Current Assets", balance_sheet)
-                total_current_liabilities = fetch_financial_data("Current Liabilities", balance_sheet)
-                metrics["Current Ratio"] = total_current_assets / total_current_liabilities if total_current_liabilities != 0 else np.nan
-            elif metric == "Financial Leverage":
-                total_debt = fetch_financial_data("Total Debt", balance_sheet)
-                total_current_assets = fetch_financial_data("Current Assets", balance_sheet)
-                metrics["Financial Leverage"] = total_debt / total_current_assets if total_current_assets != 0 else np.nan
-            elif metric == "PB Ratio":
-                total_assets = fetch_financial_data("Total Assets", balance_sheet)
-                market_cap = info.get("marketCap", np.nan)
-                metrics["PB Ratio"] = market_cap / total_assets if total_assets != 0 else np.nan
-            elif metric == "Dividend Yield":
-                metrics["Dividend Yield"] = info.get("dividendYield", np.nan)
-            elif metric == "Market Cap":
-                metrics["Market Cap"] = info.get("marketCap", np.nan)
-            #TODO: add info.get("earningsGrowth"- not sure what timeframe this is
-            else:
-                raise ValueError(f"Invalid metric: {metric}")
-        metrics_per_ticker[ticker] = metrics
-    return metrics_per_ticker
-
-def filter_tickers(input_tickers: list, ratio_filters: dict):
-    valid_booleans = {
-        ticker: np.nan for ticker in input_tickers
-    } # set these to False if any condition is not met
-    filter_outputs = {}
-    
-    metrics_per_ticker = get_fundamentals_dict(input_tickers, list(ratio_filters.keys()))
-    for ticker in input_tickers:
-        metrics = metrics_per_ticker[ticker]
-        filter_output_current = {}
-        for metric, condition in ratio_filters.items():
-            if metrics[metric] is np.nan:
-                check = np.nan
-            else:
-                if "<" in condition and not "=" in condition:
-                    check = metrics[metric] < float(condition[1:])
-                elif "<=" in condition:
-                    check = metrics[metric] <= float(condition[2:])
-                elif ">" in condition and not "=" in condition:
-                    check = metrics[metric] > float(condition[1:])
-                elif ">=" in condition:
-                    check = metrics[metric] >= float(condition[2:])
-                elif "==" in condition:
-                    check = metrics[metric] == float(condition[2:])
-                else:
-                    raise ValueError(f"Invalid condition: {condition}")
-            filter_output_current[metric + condition] = check
-        filter_outputs[ticker] = filter_output_current
-        # 'PE Ratio<=9' =
-        # False
-        # 'Financial Leverage<1.10' =
-        # True
-        # 'PB Ratio<1.20' =
-        # False
-        # 'Current Ratio>1.50' =
-        # False
-        # 'Dividend Yield>0' =
-        # True
-        valid_booleans[ticker] = all(filter_outputs[ticker].values())
-    return [ticker for ticker in input_tickers if valid_booleans[ticker] == True], [ticker for ticker in input_tickers if valid_booleans[ticker] == False or np.isnan(valid_booleans[ticker])], filter_outputs
+          PE Ratio    Market Cap
+    AAPL      28.5  3.4e+12
+    MSFT      35.1  3.1e+12
+    """
+    if isinstance(tickers, str):
+        tickers = [tickers]
+    universe = build_universe(fetch_raw_data(tickers, provider=provider, max_workers=max_workers), prices=prices)
+    return compute_metrics(universe, wanted_metrics, rank_by=rank_by)
+
+
+def get_fundamentals_panel(tickers: list, wanted_metrics: list = None, frequency: str = "annual", provider=None, max_workers: int = 16,
+                           prices: pd.DataFrame = None, rank_by: str = None) -> pd.DataFrame:
+    """
+    Calculate various metrics for every available period of a universe of tickers.
+
+    Parameters:
+    tickers (list): The stock tickers to calculate metrics for.
+    wanted_metrics (list): A list of metrics to calculate. If empty, all metrics are calculated.
+    frequency (str): 'annual' or 'quarterly' statements.
+    provider: The data provider, yfinance behind the on-disk statement cache by default.
+    max_workers (int): Maximum number of concurrent requests.
+    prices (pd.DataFrame): Daily closing prices (date x ticker) including the BENCHMARK column. Only needed
+    for EXRETAVG and SIGMA, which are then measured at each period end.
+    rank_by (str): Optional info field (e.g. 'sector') within which the percentile metrics are ranked.
+    Percentiles are always taken per fiscal year.
+
+    Returns:
+    pd.DataFrame: A DataFrame indexed by (ticker, period) with one column per metric. Metrics using quote
+    fields (e.g. 'PE Ratio') use the current quote for every period.
+
+    Example:
+    >>> panel = get_fundamentals_panel(['AAPL', 'MSFT'], ['ROA', 'LEVER'])
+    >>> panel.loc['AAPL']
+                     ROA     LEVER
+    period
+    2021-09-30  0.269742       NaN
+    2022-09-30  0.282924  0.014791
+    """
+    if isinstance(tickers, str):
+        tickers = [tickers]
+    statements = list(PANEL_STATEMENTS[frequency].values()) + ["info"]
+    raw_data = fetch_raw_data(tickers, provider=provider, max_workers=max_workers, statements=statements)
+    return compute_metrics(build_panel(raw_data, frequency, prices=prices), wanted_metrics, rank_by=rank_by)
+
+
+def get_fundamentals_dict(tickers:list, wanted_metrics=[], provider=None) -> dict:
+    """
+    Calculate various metrics from the given tickers using yfinance to get the fundamental data.
+
+    Compatibility wrapper around get_fundamentals.
+
+    Parameters:
+    tickers (list): The stock tickers to calculate metrics for.
+    wanted_metrics (list): A list of metrics to calculate. If empty, all metrics are calculated.
+    provider: The data provider, yfinance by default.
+
+    Returns:
+    dict: A dictionary mapping each ticker to a dictionary containing the calculated metrics.
+
+    Example:
+    >>> metrics = get_fundamentals_dict(['AAPL'], ['PE Ratio', 'Financial Leverage'])
+    >>> print(metrics)
+    {'AAPL': {'PE Ratio': 28.5, 'Financial Leverage': 1.5}}
+    """
+    return get_fundamentals(tickers, wanted_metrics, provider=provider).to_dict(orient="index")
+
+
+Predicate = namedtuple("Predicate", ["metric", "condition", "compare", "threshold", "statements", "cross_sectional"])
+
+_CONDITION = re.compile(r"^\s*(<=|>=|==|<|>)\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*$")
+_OPERATORS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge, "==": operator.eq}
+
+
+def required_statements(metric: str) -> set:
+    """
+    Return the statements (see STATEMENTS, plus 'info') that have to be fetched to compute a metric.
+    """
+    sources = [name.split(":", 1)[0] for name in resolve_metrics([metric]) if _is_source(name)]
+    return {source.replace("_previous", "") for source in sources} & (set(STATEMENTS) | {"info"})
+
+
+def is_cross_sectional(metric: str) -> bool:
+    """
+    Return whether a metric depends on the rest of the universe (percentile ranks, RSIZE), not just on its own ticker.
+    """
+    return any(name.startswith("cross_section:") or name in UNIVERSE_METRICS for name in resolve_metrics([metric]))
+
+
+def compile_filters(ratio_filters: dict) -> list:
+    """
+    Parse filter conditions once into predicates, ordered from cheapest to most expensive to evaluate.
+
+    Predicates on quote-only metrics (e.g. 'Market Cap', 'Dividend Yield') come first, followed by
+    predicates needing more and more statements. Predicates on percentile metrics come last, as they
+    have to be computed over the whole universe.
+
+    Parameters:
+    ratio_filters (dict): A dictionary mapping metrics to conditions, e.g. {"PE Ratio": "<=9"}.
+
+    Returns:
+    list: The compiled Predicates.
+    """
+    predicates = []
+    for metric, condition in ratio_filters.items():
+        match = _CONDITION.match(condition)
+        if match is None:
+            raise ValueError(f"Invalid condition: {condition}")
+        comparison, threshold = match.groups()
+        statements = frozenset(required_statements(metric) - {"info"})
+        predicates.append(Predicate(metric, condition, _OPERATORS[comparison], float(threshold), statements, is_cross_sectional(metric)))
+    return sorted(predicates, key=lambda predicate: (predicate.cross_sectional, len(predicate.statements)))
+
+
+def filter_tickers(input_tickers: list, ratio_filters: dict, provider=None, max_workers: int = 16):
+    """
+    Screen tickers on metric conditions, fetching statements only for tickers that are still in the running.
+
+    The quote data of every ticker is fetched first and the cheap, quote-only conditions are evaluated
+    over the whole universe at once. Statements are then fetched stage by stage, only for the tickers
+    that passed all previous conditions. A missing metric fails its condition.
+
+    Parameters:
+    input_tickers (list): The stock tickers to screen.
+    ratio_filters (dict): A dictionary mapping metrics to conditions, e.g. {"PE Ratio": "<=9"}.
+    provider: The data provider, yfinance behind the on-disk statement cache by default.
+    max_workers (int): Maximum number of concurrent requests.
+
+    Returns:
+    tuple: The tickers passing all conditions, the other tickers, and a dictionary mapping each ticker
+    to the outcome of each condition (NaN for missing metrics and conditions that were not evaluated).
+    """
+    predicates = compile_filters(ratio_filters)
+    provider = provider or CachedProvider(YFinanceProvider())
+    checks = pd.DataFrame(np.nan, index=pd.Index(input_tickers), columns=[p.metric + p.condition for p in predicates], dtype=object)
+    raw_data = {ticker: {} for ticker in input_tickers}
+    survivors = list(input_tickers)
+
+    for predicate in predicates:
+        if not survivors:
+            break
+        # percentiles are ranked against the whole input universe, everything else only for survivors
+        scope = list(input_tickers) if predicate.cross_sectional else survivors
+        needed = {"info"} | predicate.statements
+        to_fetch = [ticker for ticker in scope if not needed <= raw_data[ticker].keys()]
+        if to_fetch:
+            missing = sorted(set.union(*(needed - raw_data[ticker].keys() for ticker in to_fetch)))
+            fetched, _ = fetch_universe(to_fetch, provider=provider, statements=missing, max_workers=max_workers)
+            for ticker in to_fetch:
+                raw_data[ticker].update(fetched[ticker])
+        values = compute_metrics(build_universe({ticker: raw_data[ticker] for ticker in scope}), [predicate.metric])[predicate.metric]
+        values = values.reindex(survivors)
+        passed = predicate.compare(values, predicate.threshold)
+        column = predicate.metric + predicate.condition
+        checks.loc[survivors, column] = passed.where(values.notna(), np.nan)
+        survivors = [ticker for ticker in survivors if passed[ticker] and pd.notna(values[ticker])]
+
+    valid = set(survivors)
+    filter_outputs = {
+        ticker: {p.metric + p.condition: checks.at[ticker, p.metric + p.condition] for p in predicates}
+        for ticker in input_tickers
+    }
+    return [ticker for ticker in input_tickers if ticker in valid], [ticker for ticker in input_tickers if ticker not in valid], filter_outputs
+
+
+def screen(engine: MetricEngine, ratio_filters: dict):
+    """
+    Screen a universe that is already loaded in a MetricEngine, e.g. again after engine.update_quotes().
+
+    All conditions are evaluated for the whole universe at once, reusing the metrics the engine still
+    holds, so a re-screen after a price tick only recomputes the price-dependent metrics.
+
+    Parameters:
+    engine (MetricEngine): Engine over a latest-period universe (see build_universe).
+    ratio_filters (dict): A dictionary mapping metrics to conditions, e.g. {"PE Ratio": "<=9"}.
+
+    Returns:
+    tuple: The tickers passing all conditions, the other tickers, and a dictionary mapping each ticker
+    to the outcome of each condition (NaN for missing metrics), like filter_tickers.
+    """
+    predicates = compile_filters(ratio_filters)
+    metrics = engine.compute([predicate.metric for predicate in predicates])
+    checks = {}
+    for predicate in predicates:
+        values = metrics[predicate.metric]
+        checks[predicate.metric + predicate.condition] = predicate.compare(values, predicate.threshold).where(values.notna(), np.nan)
+    checks = pd.DataFrame(checks, index=engine.index)
+    valid = (checks == True).all(axis=1)
+    return list(checks.index[valid]), list(checks.index[~valid]), checks.to_dict(orient="index")
+
 
 if __name__ == "__main__":
     wanted_filters = {"PE Ratio":"<=9", "Financial Leverage":"<1.10", "PB Ratio": "<1.20", "Current Ratio": ">1.50", "Dividend Yield": ">0"}
@@ -327,4 +1103,3 @@ if __name__ == "__main__":
     print(filter_outputs)
     for ticker in valid_tickers:
         print(f"Valid: {ticker}")
-    
\ No newline at end of file
@@ -0,0 +1,166 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_KEYS = ["financials", "balance_sheet", "cash_flow", "info"]
+
+
+class YFinanceProvider:
+    """
+    Provider reading financial statements and info from yfinance, one HTTP request per call.
+
+    Any object with a `name`, a `host` and a `fetch(ticker, statement)` method can be used in its place,
+    e.g. a local stand-in serving fixture data.
+    """
+
+    name = "yfinance"
+    host = "query2.finance.yahoo.com"
+
+    # attribute of yf.Ticker holding each statement
+    _attributes = {
+        "financials": "financials", "balance_sheet": "balance_sheet", "cash_flow": "cashflow", "info": "info",
+        "quarterly_financials": "quarterly_financials", "quarterly_balance_sheet": "quarterly_balance_sheet",
+        "quarterly_cash_flow": "quarterly_cashflow",
+    }
+
+    def fetch(self, ticker: str, statement: str):
+        """
+        Fetch one statement of one ticker.
+
+        Parameters:
+        ticker (str): The stock ticker.
+        statement (str): One of 'financials', 'balance_sheet', 'cash_flow', 'info' or the quarterly statements
+        'quarterly_financials', 'quarterly_balance_sheet' and 'quarterly_cash_flow'.
+
+        Returns:
+        pd.DataFrame or dict: The statement with line items as rows and periods as columns, or the info dict.
+        """
+        import yfinance as yf
+
+        return getattr(yf.Ticker(ticker), self._attributes[statement])
+
+
+class HostRateLimiter:
+    """
+    Thread-safe limiter spacing out requests to the same host.
+
+    Parameters:
+    requests_per_second (float): Maximum request rate per host. None disables rate limiting.
+    """
+
+    def __init__(self, requests_per_second: float = None):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def acquire(self, host: str):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _empty_statement(statement: str):
+    return {} if statement == "info" else pd.DataFrame()
+
+
+def _fetch_with_retry(provider, ticker: str, statement: str, rate_limiter: HostRateLimiter, retries: int, backoff: float):
+    host = getattr(provider, "host", provider.name)
+    for attempt in range(retries + 1):
+        rate_limiter.acquire(host)
+        try:
+            return provider.fetch(ticker, statement)
+        except Exception:
+            if attempt == retries:
+                raise
+            # exponential backoff with jitter so that retries of many workers do not line up
+            time.sleep(backoff * 2 ** attempt * (1 + random.random()))
+
+
+def fetch_universe(tickers: list, provider=None, statements: list = None, max_workers: int = 16,
+                   requests_per_second: float = None, retries: int = 3, backoff: float = 0.5):
+    """
+    Fetch the statements of many tickers concurrently.
+
+    Every (ticker, statement) pair is an independent request run on a bounded thread pool, so a
+    large universe takes about as long as its slowest requests instead of the sum of all of them.
+    Failed requests are retried with exponential backoff; a request that keeps failing only leaves
+    that statement of that ticker empty. Providers with a `lookup(ticker, statement)` method (see
+    GatherFundamental.cache.CachedProvider) are asked first, and only misses are requested.
+
+    Parameters:
+    tickers (list): The stock tickers to fetch.
+    provider: The data provider, YFinanceProvider by default.
+    statements (list): The statements to fetch. If empty, all of STATEMENT_KEYS are fetched.
+    max_workers (int): Maximum number of concurrent requests.
+    requests_per_second (float): Maximum request rate per host. None disables rate limiting.
+    retries (int): Number of retries per request after the first attempt.
+    backoff (float): Base delay in seconds before the first retry, doubled on every retry.
+
+    Returns:
+    tuple: A dictionary mapping each ticker to its statements (empty statements for failed requests)
+    and a dictionary mapping each failed (ticker, statement) pair to its exception.
+    """
+    provider = provider or YFinanceProvider()
+    statements = statements or STATEMENT_KEYS
+    rate_limiter = HostRateLimiter(requests_per_second)
+    raw_data = {ticker: {statement: _empty_statement(statement) for statement in statements} for ticker in tickers}
+    errors = {}
+
+    tasks = [(ticker, statement) for ticker in tickers for statement in statements]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        lookup = getattr(provider, "lookup", None)
+        missing = tasks
+        if lookup:
+            # cache hits never go through the rate limiter
+            missing = []
+            for (ticker, statement), cached in zip(tasks, executor.map(lambda task: lookup(*task), tasks)):
+                if cached is None:
+                    missing.append((ticker, statement))
+                else:
+                    raw_data[ticker][statement] = cached
+
+        futures = {
+            executor.submit(_fetch_with_retry, provider, ticker, statement, rate_limiter, retries, backoff): (ticker, statement)
+            for ticker, statement in missing
+        }
+        for future in as_completed(futures):
+            ticker, statement = futures[future]
+            try:
+                result = future.result()
+            except Exception as error:
+                logger.warning(f"Failed to fetch {statement} for {ticker}: {error}")
+                errors[(ticker, statement)] = error
+                continue
+            if result is not None:
+                raw_data[ticker][statement] = result
+    return raw_data, errors
+
+
+def download_prices(tickers: list, start=None, end=None, benchmark: str = "^GSPC") -> pd.DataFrame:
+    """
+    Download daily adjusted closing prices of many tickers, plus a benchmark, in one yfinance request.
+
+    Parameters:
+    tickers (list): The stock tickers to download.
+    start, end: Date range, passed to yf.download.
+    benchmark (str): Benchmark ticker added as an extra column.
+
+    Returns:
+    pd.DataFrame: Closing prices with dates as rows and tickers as columns.
+    """
+    import yfinance as yf
+
+    prices = yf.download(list(tickers) + [benchmark], start=start, end=end, auto_adjust=False, progress=False)
+    return prices["Adj Close"]
@@ -2,12 +2,14 @@
 Only has financial statements data, no machine learning or stock data.
 """
 
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))) # add repo root - for GatherAlternative
 import pandas as pd
 import numpy as np
 from pathlib import Path
-import requests
-from zipfile import ZipFile
-from io import BytesIO
+
+from GatherAlternative.edgar_ingest import ingest_quarters
 
 
 
@@ -20,16 +22,8 @@ past_years = range(2014, this_year)
 filing_periods = [(y, q) for y in past_years for q in range(1, 5)]
 filing_periods.extend([(this_year, q) for q in range(1, this_quarter + 
                                                     1)])
-for i, (yr, qtr) in enumerate(filing_periods, 1):
-    filing = f'{yr}q{qtr}_notes.zip'
-    path = data_path / f'{yr}_{qtr}' / 'source'
-    response = requests.get(SEC_URL + filing).content
-    with ZipFile(BytesIO(response)) as zip_file:
-        for file in zip_file.namelist():
-            local_file = path / file
-            with local_file.open('wb') as output:
-                for line in zip_file.open(file).readlines():
-                    output.write(line)
+# archives are streamed to disk and extracted a few quarters at a time
+ingest_quarters(filing_periods, data_path, base_url=SEC_URL)
                     
 # The data is fairly large, and to enable faster access than the original text files permit, 
 # it is better to convert the text files into a binary, Parquet columnar format 
@@ -0,0 +1,194 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from GatherPrices.store import FIELDS, PriceStore
+
+
+DEFAULT_PANEL_DIR = Path(__file__).resolve().parents[1] / "data" / "panel"
+
+
+class PricePanel:
+    """
+    Persistent (date x ticker x field) float32 array of daily bars, memory-mapped from disk.
+
+    The directory holds the array (ohlcv.f32) and sidecar indexes: dates.npy, tickers.json and meta.json.
+    Opening a panel only reads the sidecars and maps the array, so it takes the same time for any size;
+    slices are NumPy views of the mapping and only the pages they touch are ever read. Returns are derived
+    on first use and kept next to the array (returns_<field>.f32), mapped the same way.
+
+    Build a panel with PricePanel.from_store and open it with PricePanel(path), or use load_panel.
+
+    Parameters:
+    path (str or Path): Directory of the panel, data/panel by default.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path or DEFAULT_PANEL_DIR)
+        with open(self.path / "meta.json") as f:
+            self.meta = json.load(f)
+        self.fields = self.meta["fields"]
+        self.dates = pd.DatetimeIndex(np.load(self.path / "dates.npy", mmap_mode="r"), name="Date")
+        with open(self.path / "tickers.json") as f:
+            self.tickers = json.load(f)
+        self._ticker_positions = None
+        self.array = np.memmap(self.path / "ohlcv.f32", dtype=np.float32, mode="r", shape=self._shape())
+
+    def _shape(self) -> tuple:
+        return (len(self.dates), len(self.tickers), len(self.fields))
+
+    @classmethod
+    def from_store(cls, store: PriceStore = None, path=None, tickers: list = None, start=None, end=None,
+                   chunk_size: int = 500) -> "PricePanel":
+        """
+        Build a panel from a PriceStore.
+
+        Parameters:
+        store (PriceStore): The price store, data/prices by default.
+        path (str or Path): Directory to write the panel to, data/panel by default.
+        tickers (list): The tickers to include, every ticker in the store by default.
+        start, end: Date range, both inclusive. None takes all stored dates.
+        chunk_size (int): Number of tickers read from the store at once.
+
+        Returns:
+        PricePanel: The new panel, opened read-only.
+        """
+        store = store or PriceStore()
+        path = Path(path or DEFAULT_PANEL_DIR)
+        tickers = list(tickers or store.tickers())
+        chunks = [tickers[i:i + chunk_size] for i in range(0, len(tickers), chunk_size)]
+
+        # the date axis is the union of the trading days of all tickers
+        dates = pd.DatetimeIndex([])
+        for chunk in chunks:
+            dates = dates.union(store.read(chunk, start, end, fields=["Close"]).index)
+
+        path.mkdir(parents=True, exist_ok=True)
+        for stale in path.glob("returns_*.f32"):
+            stale.unlink()
+        temporary = path / "ohlcv.f32.tmp"
+        array = np.memmap(temporary, dtype=np.float32, mode="w+", shape=(len(dates), len(tickers), len(FIELDS)))
+        for position, chunk in zip(range(0, len(tickers), chunk_size), chunks):
+            bars = store.read(chunk, start, end).reindex(dates)
+            for k, field in enumerate(FIELDS):
+                array[:, position:position + len(chunk), k] = bars[field].to_numpy(dtype=np.float32)
+        array.flush()
+        del array
+
+        np.save(path / "dates.npy", dates.to_numpy(dtype="datetime64[ns]"))
+        with open(path / "tickers.json", "w") as f:
+            json.dump(tickers, f)
+        with open(path / "meta.json", "w") as f:
+            json.dump({
+                "fields": FIELDS, "dtype": "float32", "order": ["date", "ticker", "field"],
+                # the requested range, which may start or end on a day without bars
+                "start": str(pd.Timestamp(start).date()) if start is not None else str(dates[0].date()) if len(dates) else None,
+                "end": str(pd.Timestamp(end).date()) if end is not None else str(dates[-1].date()) if len(dates) else None,
+            }, f)
+        os.replace(temporary, path / "ohlcv.f32")
+        return cls(path)
+
+    def _positions(self, tickers) -> object:
+        if tickers is None:
+            return slice(None)
+        if isinstance(tickers, str):
+            tickers = [tickers]
+        if self._ticker_positions is None:
+            self._ticker_positions = {ticker: i for i, ticker in enumerate(self.tickers)}
+        positions = np.array([self._ticker_positions[ticker] for ticker in tickers], dtype=np.intp)
+        # a consecutive run of tickers is a slice, and therefore a view
+        if len(positions) and np.array_equal(positions, np.arange(positions[0], positions[0] + len(positions))):
+            return slice(positions[0], positions[0] + len(positions))
+        return positions
+
+    def _date_slice(self, start=None, end=None) -> slice:
+        first = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start), side="left")
+        last = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), side="right")
+        return slice(first, last)
+
+    def values(self, field: str = "Adj Close", tickers: list = None, start=None, end=None) -> np.ndarray:
+        """
+        Return a (date x ticker) array of one field between two dates (both inclusive).
+
+        The array is a view of the memory map unless the tickers are not consecutive in the panel, in
+        which case NumPy has to copy them.
+        """
+        return self.array[self._date_slice(start, end), self._positions(tickers), self.fields.index(field)]
+
+    def frame(self, field: str = "Adj Close", tickers: list = None, start=None, end=None) -> pd.DataFrame:
+        """
+        Return a (date x ticker) DataFrame of one field, wrapping values() without copying it.
+        """
+        dates, positions = self._date_slice(start, end), self._positions(tickers)
+        columns = self.tickers[positions] if isinstance(positions, slice) else [self.tickers[i] for i in positions]
+        return pd.DataFrame(self.array[dates, positions, self.fields.index(field)], index=self.dates[dates], columns=columns, copy=False)
+
+    def bars(self, ticker: str, start=None, end=None) -> pd.DataFrame:
+        """
+        Return the bars of one ticker in the layout of data/stock_data.csv, as a view of the memory map.
+        """
+        dates = self._date_slice(start, end)
+        return pd.DataFrame(self.array[dates, self._positions([ticker]).start, :], index=self.dates[dates], columns=self.fields, copy=False)
+
+    def returns(self, field: str = "Adj Close", tickers: list = None, start=None, end=None) -> pd.DataFrame:
+        """
+        Return the (date x ticker) simple returns of one field, like frame(field).pct_change().
+
+        Returns of the whole panel are computed once, on first use, and persisted next to the panel, so
+        this is a view of a memory map as well. The return at the first date of the panel is NaN.
+        """
+        returns_path = self.path / f"returns_{field.replace(' ', '_')}.f32"
+        if not returns_path.exists():
+            values = self.array[:, :, self.fields.index(field)]
+            temporary = returns_path.with_suffix(".tmp")
+            derived = np.memmap(temporary, dtype=np.float32, mode="w+", shape=values.shape)
+            derived[0] = np.nan
+            # a day at a time keeps memory bounded for large panels
+            for day in range(1, len(values)):
+                np.divide(values[day], values[day - 1], out=derived[day])
+                derived[day] -= 1
+            derived.flush()
+            del derived
+            os.replace(temporary, returns_path)
+        derived = np.memmap(returns_path, dtype=np.float32, mode="r", shape=self._shape()[:2])
+        dates, positions = self._date_slice(start, end), self._positions(tickers)
+        columns = self.tickers[positions] if isinstance(positions, slice) else [self.tickers[i] for i in positions]
+        return pd.DataFrame(derived[dates, positions], index=self.dates[dates], columns=columns, copy=False)
+
+
+def load_panel(tickers: list, start=None, end=None, store: PriceStore = None, path=None) -> PricePanel:
+    """
+    Open the price panel, updating the store and rebuilding the panel first if it does not hold the tickers.
+
+    Parameters:
+    tickers (list): The tickers needed.
+    start, end: The date range needed; end is exclusive, like yf.download.
+    store (PriceStore): The price store, data/prices by default.
+    path (str or Path): Directory of the panel, data/panel by default.
+
+    Returns:
+    PricePanel: A panel holding at least the tickers, up to the last stored bar.
+
+    Example:
+    >>> returns = load_panel(["AAPL", "MSFT"], "2020-01-01", "2024-07-31").returns("Adj Close", ["AAPL", "MSFT"], "2020-01-01", "2024-07-30")
+    """
+    path = Path(path or DEFAULT_PANEL_DIR)
+    start = pd.Timestamp(start) if start is not None else None
+    last = pd.Timestamp(end) - pd.Timedelta(days=1) if end is not None else None
+    if (path / "meta.json").exists():
+        panel = PricePanel(path)
+        built_start, built_end = (pd.Timestamp(panel.meta[key]) if panel.meta.get(key) else None for key in ("start", "end"))
+        covered = built_start is not None and (start is None or built_start <= start) \
+            and (last is None or built_end >= last)
+        if covered and set(tickers) <= set(panel.tickers):
+            return panel
+        # rebuild with everything the current panel holds as well
+        tickers = list(dict.fromkeys(panel.tickers + list(tickers)))
+        start = min(start, built_start) if start is not None and built_start is not None else None
+        last = max(last, built_end) if last is not None and built_end is not None else None
+    store = store or PriceStore()
+    store.update(tickers, start=start if start is not None else "2000-01-01", end=last + pd.Timedelta(days=1) if last is not None else None)
+    return PricePanel.from_store(store, path, tickers, start, last)
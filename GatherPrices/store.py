@@ -0,0 +1,212 @@
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+DEFAULT_STORE_DIR = Path(__file__).resolve().parents[1] / "data" / "prices"
+
+FIELDS = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+SCHEMA = pa.schema([
+    ("Date", pa.timestamp("ns")),
+    ("Open", pa.float64()),
+    ("High", pa.float64()),
+    ("Low", pa.float64()),
+    ("Close", pa.float64()),
+    ("Adj Close", pa.float64()),
+    ("Volume", pa.int64()),
+])
+
+
+def yfinance_download(tickers: list, start, end=None) -> pd.DataFrame:
+    """
+    Download daily OHLCV bars of many tickers in one yfinance request.
+
+    Returns:
+    pd.DataFrame: Bars with dates as rows and (field, ticker) columns, the layout of yf.download.
+    """
+    import yfinance as yf
+
+    return yf.download(list(tickers), start=start, end=end, auto_adjust=False, progress=False, group_by="column")
+
+
+class PriceStore:
+    """
+    Append-only local store of daily OHLCV bars, one Parquet file per ticker and year.
+
+    Files live in {root}/ticker={ticker}/year={year}/data.parquet with typed columns (see SCHEMA), so range
+    reads only open the years they need and read the columns they ask for. update() downloads only the
+    bars after the last stored one, so a daily refresh transfers one new bar per ticker.
+
+    Parameters:
+    root (str or Path): Directory of the store, data/prices by default.
+    download: Function (tickers, start, end) returning bars in the layout of yf.download, yfinance by default.
+    """
+
+    def __init__(self, root=None, download=None):
+        self.root = Path(root or DEFAULT_STORE_DIR)
+        self.download = download or yfinance_download
+
+    def _path(self, ticker: str, year: int) -> Path:
+        return self.root / f"ticker={ticker}" / f"year={year}" / "data.parquet"
+
+    def tickers(self) -> list:
+        """Return the tickers held in the store."""
+        return sorted(path.name.split("=", 1)[1] for path in self.root.glob("ticker=*"))
+
+    def years(self, ticker: str) -> list:
+        """Return the years stored for a ticker, oldest first."""
+        return sorted(int(path.name.split("=", 1)[1]) for path in (self.root / f"ticker={ticker}").glob("year=*")
+                      if (path / "data.parquet").exists())
+
+    def last_date(self, ticker: str):
+        """
+        Return the date of the last stored bar of a ticker, or None if it has none.
+
+        Only the Parquet footer of the latest year is read.
+        """
+        years = self.years(ticker)
+        if not years:
+            return None
+        metadata = pq.ParquetFile(self._path(ticker, years[-1])).metadata
+        column = SCHEMA.get_field_index("Date")
+        latest = [metadata.row_group(i).column(column).statistics.max for i in range(metadata.num_row_groups)]
+        return pd.Timestamp(max(latest)) if latest else None
+
+    def append(self, ticker: str, bars: pd.DataFrame):
+        """
+        Store new bars of one ticker.
+
+        Bars at dates that are already stored replace them (e.g. a revised last bar); older partitions are
+        never rewritten.
+
+        Parameters:
+        ticker (str): The stock ticker.
+        bars (pd.DataFrame): Daily bars with dates as index and the columns of FIELDS.
+        """
+        bars = bars.dropna(how="all")
+        if bars.empty:
+            return
+        bars = bars.reindex(columns=FIELDS).sort_index()
+        bars.index = pd.to_datetime(bars.index).tz_localize(None) if getattr(bars.index, "tz", None) else pd.to_datetime(bars.index)
+        bars.index.name = "Date"
+        bars["Volume"] = bars["Volume"].fillna(0).astype(np.int64)
+        for year, new in bars.groupby(bars.index.year):
+            table = pa.Table.from_pandas(new.reset_index(), schema=SCHEMA, preserve_index=False)
+            path = self._path(ticker, year)
+            if path.exists():
+                # keep the stored bars outside the range of the new ones
+                stored = pq.read_table(path, schema=SCHEMA)
+                dates = stored.column("Date")
+                outside = pc.or_(pc.less(dates, table.column("Date")[0]), pc.greater(dates, table.column("Date")[-1]))
+                table = pa.concat_tables([stored.filter(outside), table]).sort_by("Date")
+            self._write(path, table)
+
+    def _write(self, path: Path, table: pa.Table):
+        # written to a temporary file that is atomically renamed, so readers never see partial files
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        os.close(handle)
+        try:
+            pq.write_table(table, temporary)
+            os.replace(temporary, path)
+        except BaseException:
+            Path(temporary).unlink(missing_ok=True)
+            raise
+
+    def update(self, tickers: list, start="2000-01-01", end=None, max_workers: int = 8) -> dict:
+        """
+        Download and store the bars after the last stored bar of each ticker.
+
+        Tickers are grouped by the date they need bars from, and each group is downloaded in one request,
+        so refreshing a universe that was updated on the same day is a single request of one bar per ticker.
+
+        Parameters:
+        tickers (list): The stock tickers to update.
+        start: First date to download for tickers that are not in the store yet.
+        end: Date to download up to (exclusive, like yf.download), today by default.
+        max_workers (int): Number of threads writing partitions.
+
+        Returns:
+        dict: The number of new bars stored per ticker.
+        """
+        end = pd.Timestamp(end) if end is not None else pd.Timestamp.today().normalize() + pd.Timedelta(days=1)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            last_dates = dict(zip(tickers, executor.map(self.last_date, tickers)))
+        groups = {}
+        for ticker, last in last_dates.items():
+            first = pd.Timestamp(start) if last is None else last + pd.Timedelta(days=1)
+            if first < end:
+                groups.setdefault(first, []).append(ticker)
+
+        stored = {ticker: 0 for ticker in tickers}
+        for first, group in groups.items():
+            bars = self.download(group, first, end)
+            if bars is None or bars.empty:
+                continue
+            per_ticker = {ticker: _ticker_bars(bars, ticker, len(group)) for ticker in group}
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(lambda item: self.append(*item), per_ticker.items()))
+            for ticker, frame in per_ticker.items():
+                stored[ticker] = int(frame.dropna(how="all").shape[0])
+        return stored
+
+    def read(self, tickers, start=None, end=None, fields: list = None) -> pd.DataFrame:
+        """
+        Read the stored bars of one or many tickers between two dates.
+
+        Parameters:
+        tickers (str or list): One ticker, or a list of tickers.
+        start, end: Date range, both inclusive. None reads from the first or up to the last bar.
+        fields (list): The fields to read, all of FIELDS by default.
+
+        Returns:
+        pd.DataFrame: For one ticker, its bars with dates as rows and fields as columns (the layout of
+        data/stock_data.csv). For a list, dates as rows and (field, ticker) columns (the layout of
+        yf.download), e.g. store.read(tickers)["Adj Close"] for a date x ticker frame of closing prices.
+        """
+        single = isinstance(tickers, str)
+        tickers = [tickers] if single else list(tickers)
+        fields = fields or FIELDS
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+
+        paths = [
+            str(self._path(ticker, year)) for ticker in tickers for year in self.years(ticker)
+            if (start is None or year >= start.year) and (end is None or year <= end.year)
+        ]
+        if not paths:
+            empty = pd.DataFrame(columns=fields, index=pd.DatetimeIndex([], name="Date"))
+            return empty if single else pd.DataFrame(index=empty.index, columns=pd.MultiIndex.from_product([fields, tickers]))
+        dataset = ds.dataset(paths, format="parquet", partitioning="hive", partition_base_dir=str(self.root),
+                             schema=SCHEMA.append(pa.field("ticker", pa.string())).append(pa.field("year", pa.int32())))
+        condition = None
+        if start is not None:
+            condition = ds.field("Date") >= pa.scalar(start.to_pydatetime(), pa.timestamp("ns"))
+        if end is not None:
+            upper = ds.field("Date") <= pa.scalar(end.to_pydatetime(), pa.timestamp("ns"))
+            condition = upper if condition is None else condition & upper
+        bars = dataset.to_table(columns=["ticker", "Date"] + fields, filter=condition).to_pandas()
+
+        if single:
+            return bars.drop(columns="ticker").set_index("Date").sort_index()
+        wide = bars.pivot(index="Date", columns="ticker", values=fields)
+        wide.columns.names = ["Price", "Ticker"]
+        return wide.reindex(columns=pd.MultiIndex.from_product([fields, tickers], names=["Price", "Ticker"])).sort_index()
+
+
+def _ticker_bars(bars: pd.DataFrame, ticker: str, n_tickers: int) -> pd.DataFrame:
+    # yf.download returns (field, ticker) columns for several tickers and, depending on the version,
+    # plain field columns for one
+    if isinstance(bars.columns, pd.MultiIndex):
+        if ticker not in bars.columns.get_level_values(1):
+            return pd.DataFrame(columns=FIELDS)
+        return bars.xs(ticker, axis=1, level=1)
+    return bars if n_tickers == 1 else pd.DataFrame(columns=FIELDS)
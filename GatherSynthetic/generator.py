@@ -0,0 +1,701 @@
+"""
+Deterministic synthetic market and fundamentals data for offline development and benchmarking.
+
+SyntheticMarket simulates a universe of companies (quarterly statement drivers plus daily prices) from a
+seed and emits it in the layouts used across the repository:
+
+- financial statements in the financetoolkit layout of data/income_statement.csv, balance_sheet_statement.csv
+  and cash_flow_statement.csv (line items as rows, years as columns),
+- daily OHLCV in the yf.download layout of data/stock_data.csv,
+- yfinance statements and info dicts, served by SyntheticProvider (see GatherFundamental.fetching),
+- EDGAR financial statement and notes `sub`/`num` tables per filing quarter (see GatherAlternative/edgar.py),
+- the model datasets of RevenueForecast (nn_data.pkl) and AnalysisFundamental (dataset.csv).
+
+Companies are generated in fixed blocks, so a ticker gets the same data for a given seed and number of years
+whatever the size of the universe it is part of.
+"""
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+BLOCK_SIZE = 256
+SECTORS = ["Technology", "Healthcare", "Financial Services", "Consumer Cyclical", "Industrials",
+           "Consumer Defensive", "Energy", "Utilities", "Real Estate", "Basic Materials", "Communication Services"]
+SIC_CODES = [3571, 2834, 6022, 5331, 3560, 2080, 1311, 4911, 6798, 2800, 4813]
+
+# EDGAR tags emitted for every filing, as (tag, driver, kind); kind is 'flow' (duration) or 'stock' (instant)
+EDGAR_TAGS = [
+    ("Revenues", "revenue", "flow"),
+    ("CostOfRevenue", "cost_of_revenue", "flow"),
+    ("GrossProfit", "gross_profit", "flow"),
+    ("OperatingIncomeLoss", "operating_income", "flow"),
+    ("NetIncomeLoss", "net_income", "flow"),
+    ("EarningsPerShareBasic", "eps", "flow"),
+    ("EarningsPerShareDiluted", "eps_diluted", "flow"),
+    ("WeightedAverageNumberOfDilutedSharesOutstanding", "shares_diluted", "flow"),
+    ("PaymentsOfDividendsCommonStock", "dividends", "flow"),
+    ("NetCashProvidedByUsedInOperatingActivities", "operating_cash_flow", "flow"),
+    ("Assets", "total_assets", "stock"),
+    ("AssetsCurrent", "current_assets", "stock"),
+    ("Liabilities", "total_liabilities", "stock"),
+    ("LiabilitiesCurrent", "current_liabilities", "stock"),
+    ("StockholdersEquity", "equity", "stock"),
+    ("CashAndCashEquivalentsAtCarryingValue", "cash", "stock"),
+]
+EDGAR_UNITS = {"eps": "USD/shares", "eps_diluted": "USD/shares", "shares_diluted": "shares"}
+
+# drivers that are stocks (balance sheet, measured at period end); all other drivers are flows
+STOCK_DRIVERS = {
+    "cash", "short_term_investments", "receivables", "inventory", "other_current_assets", "current_assets",
+    "ppe", "goodwill", "intangibles", "other_assets", "total_assets", "accounts_payable", "short_term_debt",
+    "taxes_payable", "other_current_liabilities", "current_liabilities", "long_term_debt", "other_liabilities",
+    "total_liabilities", "equity", "shares",
+}
+# drivers that are averages over the period (weighted average share counts); annual values are the mean
+# of the quarters, and the annual EPS is the annual net income over them
+AVERAGE_DRIVERS = {"shares_diluted"}
+
+
+class SyntheticMarket:
+    """
+    A seeded synthetic universe of companies.
+
+    Parameters:
+    n_tickers (int): Number of companies, up to 10,000 or more.
+    n_years (int): Number of fiscal years of statements and prices, e.g. up to 30.
+    seed (int): Seed of the random generator; the same seed always gives the same data.
+    end_year (int): Last fiscal year. Fiscal years follow calendar years.
+    """
+
+    def __init__(self, n_tickers: int = 500, n_years: int = 10, seed: int = 0, end_year: int = 2023):
+        self.n_tickers = n_tickers
+        self.n_years = n_years
+        self.seed = seed
+        self.end_year = end_year
+        self.tickers = [f"SYN{i:05d}" for i in range(n_tickers)]
+        self.ciks = 1000000 + np.arange(n_tickers)
+        self.quarters = pd.date_range(end=f"{end_year}-12-31", periods=4 * n_years, freq="QE")
+        self.years = list(range(end_year - n_years + 1, end_year + 1))
+        self.days = pd.bdate_range(f"{self.years[0]}-01-01", f"{end_year}-12-31")
+        self._positions = {ticker: i for i, ticker in enumerate(self.tickers)}
+        # generated blocks, least recently used first; the lock makes concurrent provider threads share a block
+        self._blocks = {"drivers": OrderedDict(), "prices": OrderedDict()}
+        self._lock = threading.RLock()
+
+    def _locate(self, ticker: str):
+        position = self._positions[ticker]
+        return position // BLOCK_SIZE, position % BLOCK_SIZE
+
+    def _cached(self, kind: str, block: int, generate, maxsize: int) -> dict:
+        with self._lock:
+            cache = self._blocks[kind]
+            if block in cache:
+                cache.move_to_end(block)
+                return cache[block]
+            cache[block] = generate(block)
+            if len(cache) > maxsize:
+                cache.popitem(last=False)
+            return cache[block]
+
+    def _drivers(self, block: int) -> dict:
+        return self._cached("drivers", block, self._generate_drivers, maxsize=8)
+
+    def _generate_drivers(self, block: int) -> dict:
+        # quarterly statement drivers of one block of companies, each an array of (BLOCK_SIZE x quarters)
+        rng = np.random.default_rng([self.seed, 0, block])
+        n, q = BLOCK_SIZE, len(self.quarters)
+
+        def persistent(mean, spread, noise, low, high):
+            level = rng.normal(mean, spread, (n, 1)) + rng.normal(0, noise, (n, q))
+            return np.clip(level, low, high)
+
+        season = 1 + rng.uniform(0, 0.08, (n, 1)) * np.sin(np.arange(q) * np.pi / 2 + rng.uniform(0, 2 * np.pi, (n, 1)))
+        growth = rng.normal(0.012, 0.012, (n, 1)) + rng.normal(0, 0.04, (n, q))
+        revenue = np.exp(rng.normal(np.log(4e8), 1.3, (n, 1)) + np.cumsum(growth, axis=1)) * season
+        d = {"revenue": revenue}
+        d["gross_profit"] = revenue * persistent(0.42, 0.14, 0.015, 0.05, 0.9)
+        d["cost_of_revenue"] = revenue - d["gross_profit"]
+        d["research_and_development"] = revenue * persistent(0.05, 0.04, 0.004, 0.0, 0.3)
+        d["sga"] = revenue * persistent(0.16, 0.05, 0.01, 0.02, 0.5)
+        d["depreciation"] = revenue * persistent(0.04, 0.015, 0.002, 0.005, 0.15)
+        d["operating_income"] = d["gross_profit"] - d["research_and_development"] - d["sga"] - d["depreciation"]
+
+        # balance sheet, allocated from total assets with persistent company-specific proportions
+        total_assets = revenue / persistent(0.25, 0.08, 0.01, 0.05, 0.8)
+        shares = rng.dirichlet([2, 1, 3, 2, 1, 5, 2, 1.5, 3], n)[:, :, None] * (1 + rng.normal(0, 0.03, (n, 9, q)))
+        shares /= shares.sum(axis=1, keepdims=True)
+        (d["cash"], d["short_term_investments"], d["receivables"], d["inventory"], d["other_current_assets"],
+         d["ppe"], d["goodwill"], d["intangibles"], d["other_assets"]) = shares.transpose(1, 0, 2) * total_assets
+        d["current_assets"] = d["cash"] + d["short_term_investments"] + d["receivables"] + d["inventory"] + d["other_current_assets"]
+        d["total_assets"] = total_assets
+        total_liabilities = total_assets * persistent(0.5, 0.15, 0.02, 0.1, 0.95)
+        current_liabilities = total_liabilities * persistent(0.35, 0.1, 0.02, 0.1, 0.7)
+        d["accounts_payable"] = current_liabilities * 0.45
+        d["short_term_debt"] = current_liabilities * 0.2
+        d["taxes_payable"] = current_liabilities * 0.05
+        d["other_current_liabilities"] = current_liabilities * 0.3
+        d["current_liabilities"] = current_liabilities
+        d["long_term_debt"] = total_liabilities * persistent(0.45, 0.12, 0.02, 0.0, 0.85)
+        d["other_liabilities"] = total_liabilities - current_liabilities - d["long_term_debt"]
+        d["total_liabilities"] = total_liabilities
+        d["equity"] = total_assets - total_liabilities
+
+        d["interest_expense"] = (d["short_term_debt"] + d["long_term_debt"]) * persistent(0.012, 0.004, 0.001, 0.002, 0.03)
+        d["interest_income"] = (d["cash"] + d["short_term_investments"]) * 0.005
+        d["income_before_tax"] = d["operating_income"] - d["interest_expense"] + d["interest_income"]
+        d["income_tax"] = np.maximum(d["income_before_tax"], 0) * 0.21
+        d["net_income"] = d["income_before_tax"] - d["income_tax"]
+
+        # about 20 to 100 dollars of annual revenue per share
+        first_year_revenue = revenue[:, :4].sum(axis=1, keepdims=True)
+        d["shares"] = first_year_revenue / np.exp(rng.normal(np.log(40), 0.6, (n, 1))) * np.exp(np.cumsum(rng.normal(-0.002, 0.008, (n, q)), axis=1))
+        d["shares_diluted"] = d["shares"] * 1.01
+        d["eps"] = d["net_income"] / d["shares"]
+        d["eps_diluted"] = d["net_income"] / d["shares_diluted"]
+
+        d["stock_based_compensation"] = revenue * 0.01
+        d["change_in_working_capital"] = rng.normal(0, 0.02, (n, q)) * revenue
+        d["operating_cash_flow"] = d["net_income"] + d["depreciation"] + d["stock_based_compensation"] + d["change_in_working_capital"]
+        d["capital_expenditure"] = -revenue * persistent(0.05, 0.02, 0.005, 0.005, 0.2)
+        d["free_cash_flow"] = d["operating_cash_flow"] + d["capital_expenditure"]
+        d["dividends"] = np.maximum(d["net_income"], 0) * persistent(0.25, 0.2, 0.0, 0.0, 0.8)
+        d["repurchases"] = np.maximum(d["free_cash_flow"] - d["dividends"], 0) * rng.uniform(0, 0.6, (n, 1))
+        d["issuance"] = revenue * np.where(rng.random((n, q)) < 0.05, 0.02, 0.0)
+        d["sector"] = rng.integers(len(SECTORS), size=n)
+        d["initial_pe"] = rng.uniform(8, 35, n)
+        return d
+
+    def _ticker_drivers(self, ticker: str) -> dict:
+        block, row = self._locate(ticker)
+        return {name: values[row] for name, values in self._drivers(block).items()}
+
+    def _annual(self, drivers: dict) -> dict:
+        # flows summed over the four quarters of each year, stocks taken at year end, averages averaged
+        annual = {}
+        for name, values in drivers.items():
+            if np.ndim(values) != 1 or len(values) != len(self.quarters):
+                continue
+            by_year = values.reshape(self.n_years, 4)
+            if name in STOCK_DRIVERS:
+                annual[name] = by_year[:, -1]
+            elif name in AVERAGE_DRIVERS:
+                annual[name] = by_year.mean(axis=1)
+            else:
+                annual[name] = by_year.sum(axis=1)
+        # per share values are not additive: the annual net income over the average shares of the year
+        annual["eps"] = annual["net_income"] / drivers["shares"].reshape(self.n_years, 4).mean(axis=1)
+        annual["eps_diluted"] = annual["net_income"] / annual["shares_diluted"]
+        return annual
+
+    def _period_drivers(self, ticker: str, period: str):
+        drivers = self._ticker_drivers(ticker)
+        if period == "annual":
+            return self._annual(drivers), pd.to_datetime([f"{year}-12-31" for year in self.years])
+        return {name: values for name, values in drivers.items() if np.ndim(values) == 1 and len(values) == len(self.quarters)}, self.quarters
+
+    # financetoolkit layout
+
+    def income_statement(self, ticker: str, period: str = "annual") -> pd.DataFrame:
+        """Income statement in the layout of data/income_statement.csv (line items x years)."""
+        d, dates = self._period_drivers(ticker, period)
+        revenue = d["revenue"]
+        operating_expenses = d["research_and_development"] + d["sga"]
+        ebitda = d["operating_income"] + d["depreciation"]
+        items = {
+            "Revenue": revenue,
+            "Cost of Goods Sold": d["cost_of_revenue"],
+            "Gross Profit": d["gross_profit"],
+            "Gross Profit Ratio": d["gross_profit"] / revenue,
+            "Research and Development Expenses": d["research_and_development"],
+            "General and Administrative Expenses": d["sga"] * 0.4,
+            "Selling and Marketing Expenses": d["sga"] * 0.6,
+            "Selling, General and Administrative Expenses": d["sga"],
+            "Other Expenses": np.zeros_like(revenue),
+            "Operating Expenses": operating_expenses,
+            "Cost and Expenses": d["cost_of_revenue"] + operating_expenses,
+            "Interest Income": d["interest_income"],
+            "Interest Expense": d["interest_expense"],
+            "Depreciation and Amortization": d["depreciation"],
+            "EBITDA": ebitda,
+            "EBITDA Ratio": ebitda / revenue,
+            "Operating Income": d["operating_income"],
+            "Operating Income Ratio": d["operating_income"] / revenue,
+            "Total Other Income": d["interest_income"] - d["interest_expense"],
+            "Income Before Tax": d["income_before_tax"],
+            "Income Before Tax Ratio": d["income_before_tax"] / revenue,
+            "Income Tax Expense": d["income_tax"],
+            "Net Income": d["net_income"],
+            "Net Income Ratio": d["net_income"] / revenue,
+            "EPS": d["net_income"] / d["shares"],
+            "EPS Diluted": d["net_income"] / d["shares_diluted"],
+            "Weighted Average Shares": d["shares"],
+            "Weighted Average Shares Diluted": d["shares_diluted"],
+        }
+        return self._statement(items, dates, period)
+
+    def balance_sheet_statement(self, ticker: str, period: str = "annual") -> pd.DataFrame:
+        """Balance sheet in the layout of data/balance_sheet_statement.csv (line items x years)."""
+        d, dates = self._period_drivers(ticker, period)
+        fixed_assets = d["ppe"] + d["goodwill"] + d["intangibles"]
+        non_current_liabilities = d["long_term_debt"] + d["other_liabilities"]
+        total_debt = d["short_term_debt"] + d["long_term_debt"]
+        zeros = np.zeros_like(d["total_assets"])
+        items = {
+            "Cash and Cash Equivalents": d["cash"],
+            "Short Term Investments": d["short_term_investments"],
+            "Cash and Short Term Investments": d["cash"] + d["short_term_investments"],
+            "Accounts Receivable": d["receivables"],
+            "Inventory": d["inventory"],
+            "Other Current Assets": d["other_current_assets"],
+            "Total Current Assets": d["current_assets"],
+            "Property, Plant and Equipment": d["ppe"],
+            "Goodwill": d["goodwill"],
+            "Intangible Assets": d["intangibles"],
+            "Long Term Investments": zeros,
+            "Tax Assets": zeros,
+            "Other Fixed Assets": zeros,
+            "Fixed Assets": fixed_assets,
+            "Other Assets": d["other_assets"],
+            "Total Assets": d["total_assets"],
+            "Accounts Payable": d["accounts_payable"],
+            "Short Term Debt": d["short_term_debt"],
+            "Tax Payables": d["taxes_payable"],
+            "Deferred Revenue": zeros,
+            "Other Current Liabilities": d["other_current_liabilities"],
+            "Total Current Liabilities": d["current_liabilities"],
+            "Long Term Debt": d["long_term_debt"],
+            "Deferred Revenue Non Current": zeros,
+            "Deferred Tax Liabilities": zeros,
+            "Other Non Current Liabilities": d["other_liabilities"],
+            "Total Non Current Liabilities": non_current_liabilities,
+            "Other Liabilities": zeros,
+            "Capital Lease Obligations": zeros,
+            "Total Liabilities": d["total_liabilities"],
+            "Preferred Stock": zeros,
+            "Common Stock": d["equity"] * 0.3,
+            "Retained Earnings": d["equity"] * 0.7,
+            "Accumulated Other Comprehensive Income": zeros,
+            "Other Total Shareholder Equity": zeros,
+            "Total Shareholder Equity": d["equity"],
+            "Total Equity": d["equity"],
+            "Total Liabilities and Shareholder Equity": d["total_liabilities"] + d["equity"],
+            "Minority Interest": zeros,
+            "Total Liabilities and Equity": d["total_liabilities"] + d["equity"],
+            "Total Investments": d["short_term_investments"],
+            "Total Debt": total_debt,
+            "Net Debt": total_debt - d["cash"],
+        }
+        return self._statement(items, dates, period)
+
+    def cash_flow_statement(self, ticker: str, period: str = "annual") -> pd.DataFrame:
+        """Cash flow statement in the layout of data/cash_flow_statement.csv (line items x years)."""
+        d, dates = self._period_drivers(ticker, period)
+        zeros = np.zeros_like(d["revenue"])
+        investing = d["capital_expenditure"]
+        financing = d["issuance"] - d["repurchases"] - d["dividends"]
+        net_change = d["operating_cash_flow"] + investing + financing
+        items = {
+            "Net Income": d["net_income"],
+            "Depreciation and Amortization": d["depreciation"],
+            "Deferred Income Tax": zeros,
+            "Stock Based Compensation": d["stock_based_compensation"],
+            "Change in Working Capital": d["change_in_working_capital"],
+            "Accounts Receivables": d["change_in_working_capital"] * 0.5,
+            "Inventory": d["change_in_working_capital"] * 0.3,
+            "Accounts Payables": d["change_in_working_capital"] * 0.2,
+            "Other Working Capital": zeros,
+            "Other Non Cash Items": zeros,
+            "Cash Flow from Operations": d["operating_cash_flow"],
+            "Property, Plant and Equipment": d["capital_expenditure"],
+            "Acquisitions": zeros,
+            "Purchases of Investments": zeros,
+            "Sales of Investments": zeros,
+            "Other Investing Activities": zeros,
+            "Cash Flow from Investing": investing,
+            "Debt Repayment": zeros,
+            "Common Stock Issued": d["issuance"],
+            "Common Stock Purchased": -d["repurchases"],
+            "Dividends Paid": -d["dividends"],
+            "Other Financing Activities": zeros,
+            "Cash Flow from Financing": financing,
+            "Forex Changes on Cash": zeros,
+            "Net Change in Cash": net_change,
+            "Cash End of Period": d["cash"],
+            "Cash Beginning of Period": d["cash"] - net_change,
+            "Operating Cash Flow": d["operating_cash_flow"],
+            "Capital Expenditure": d["capital_expenditure"],
+            "Free Cash Flow": d["free_cash_flow"],
+        }
+        return self._statement(items, dates, period)
+
+    def _statement(self, items: dict, dates: pd.DatetimeIndex, period: str) -> pd.DataFrame:
+        columns = [str(date.year) for date in dates] if period == "annual" else [str(date.to_period("Q")) for date in dates]
+        return pd.DataFrame(np.vstack(list(items.values())), index=list(items.keys()), columns=columns)
+
+    # yfinance layout
+
+    def yfinance_statement(self, ticker: str, statement: str) -> pd.DataFrame:
+        """
+        A statement in the yfinance layout: line items as rows, period end dates as columns, latest first.
+        Unlike yfinance, which serves four years or five quarters, the full history is returned.
+
+        Parameters:
+        statement (str): 'financials', 'balance_sheet' or 'cash_flow', optionally prefixed with 'quarterly_'.
+        """
+        period = "quarterly" if statement.startswith("quarterly_") else "annual"
+        d, dates = self._period_drivers(ticker, period)
+        kind = statement.replace("quarterly_", "")
+        if kind == "financials":
+            items = {
+                "Total Revenue": d["revenue"], "Cost Of Revenue": d["cost_of_revenue"], "Gross Profit": d["gross_profit"],
+                "Research And Development": d["research_and_development"], "Selling General And Administration": d["sga"],
+                "EBIT": d["operating_income"], "Operating Income": d["operating_income"], "Interest Expense": d["interest_expense"],
+                "Pretax Income": d["income_before_tax"], "Tax Provision": d["income_tax"], "Net Income": d["net_income"],
+                "Net Income Continuous Operations": d["net_income"], "Basic EPS": d["eps"], "Diluted EPS": d["eps_diluted"],
+                "Diluted Average Shares": d["shares_diluted"],
+            }
+        elif kind == "balance_sheet":
+            total_debt = d["short_term_debt"] + d["long_term_debt"]
+            items = {
+                "Total Assets": d["total_assets"], "Current Assets": d["current_assets"], "Total Current Assets": d["current_assets"],
+                "Cash And Cash Equivalents": d["cash"], "Accounts Receivable": d["receivables"], "Inventory": d["inventory"],
+                "Net PPE": d["ppe"], "Goodwill": d["goodwill"], "Current Liabilities": d["current_liabilities"],
+                "Total Current Liabilities": d["current_liabilities"], "Accounts Payable": d["accounts_payable"],
+                "Income Taxes Payable": d["taxes_payable"], "Long Term Debt": d["long_term_debt"], "Total Debt": total_debt,
+                "Total Liab": d["total_liabilities"], "Total Liabilities Net Minority Interest": d["total_liabilities"],
+                "Total Stockholder Equity": d["equity"], "Stockholders Equity": d["equity"], "Ordinary Shares Number": d["shares"],
+            }
+        elif kind == "cash_flow":
+            items = {
+                "Operating Cash Flow": d["operating_cash_flow"], "Capital Expenditure": d["capital_expenditure"],
+                "Free Cash Flow": d["free_cash_flow"], "Depreciation": d["depreciation"],
+                "Depreciation And Amortization": d["depreciation"], "Stock Based Compensation": d["stock_based_compensation"],
+                "Repurchase Of Capital Stock": -d["repurchases"], "Issuance Of Capital Stock": d["issuance"],
+                "Cash Dividends Paid": -d["dividends"],
+            }
+        else:
+            raise ValueError(f"Invalid statement: {statement}")
+        # latest first, like yfinance, but with the full history so that long-horizon metrics (8yr_ROA, MG, ...) exist
+        return pd.DataFrame(np.vstack(list(items.values())), index=list(items.keys()), columns=dates).iloc[:, ::-1]
+
+    def info(self, ticker: str) -> dict:
+        """The scalar fields of yfinance's Ticker.info that the repository uses."""
+        block, row = self._locate(ticker)
+        drivers = self._drivers(block)
+        prices = self._prices(block)
+        close = prices["Close"][-1, row]
+        previous_close = prices["Close"][-2, row]
+        shares = drivers["shares"][row, -1]
+        trailing_net_income = drivers["net_income"][row, -4:].sum()
+        dividend_yield = drivers["dividends"][row, -4:].sum() / (close * shares)
+        return {
+            "symbol": ticker,
+            "shortName": f"Synthetic Corp {ticker[3:]}",
+            "sector": SECTORS[drivers["sector"][row]],
+            "currency": "USD",
+            "previousClose": previous_close,
+            "currentPrice": close,
+            "marketCap": close * shares,
+            "sharesOutstanding": shares,
+            "dividendYield": dividend_yield if dividend_yield > 0 else None,
+            "trailingPE": close * shares / trailing_net_income if trailing_net_income > 0 else None,
+            "totalRevenue": drivers["revenue"][row, -4:].sum(),
+            "netIncomeToCommon": trailing_net_income,
+        }
+
+    # prices
+
+    def _prices(self, block: int) -> dict:
+        return self._cached("prices", block, self._generate_prices, maxsize=2)
+
+    def _generate_prices(self, block: int) -> dict:
+        # daily OHLCV of one block of companies, each an array of (days x BLOCK_SIZE)
+        rng = np.random.default_rng([self.seed, 1, block])
+        n_days = len(self.days)
+        drivers = self._drivers(block)
+        volatility = rng.uniform(0.012, 0.035, BLOCK_SIZE)
+        market = rng.normal(0.0003, 0.01, (n_days, 1))
+        beta = rng.uniform(0.5, 1.5, BLOCK_SIZE)
+        returns = beta * market + rng.normal(0.0002, 1, (n_days, BLOCK_SIZE)) * volatility
+        # start at the first year's earnings times a company-specific multiple
+        first_year_earnings = np.maximum(drivers["net_income"][:, :4].sum(axis=1), drivers["revenue"][:, :4].sum(axis=1) * 0.02)
+        start = drivers["initial_pe"] * first_year_earnings / drivers["shares"][:, 0]
+        close = start * np.exp(np.cumsum(returns, axis=0))
+        gap = rng.normal(0, 0.3, (n_days, BLOCK_SIZE)) * volatility
+        open_ = close * np.exp(-returns + gap)
+        spread = np.abs(rng.normal(0, 0.6, (n_days, BLOCK_SIZE))) * volatility
+        high = np.maximum(open_, close) * np.exp(spread)
+        low = np.minimum(open_, close) * np.exp(-spread)
+        volume = (drivers["shares"][:, 0] * rng.uniform(0.002, 0.01, BLOCK_SIZE) * np.exp(rng.normal(0, 0.4, (n_days, BLOCK_SIZE)))).astype(np.int64)
+        return {"Open": open_, "High": high, "Low": low, "Close": close, "Adj Close": close, "Volume": volume}
+
+    def prices(self, ticker: str) -> pd.DataFrame:
+        """Daily OHLCV of one ticker in the layout of data/stock_data.csv."""
+        block, row = self._locate(ticker)
+        prices = self._prices(block)
+        frame = pd.DataFrame({field: values[:, row] for field, values in prices.items()}, index=self.days)
+        frame.index.name = "Date"
+        return frame
+
+    def iter_prices(self, tickers: list = None):
+        """Yield (ticker, OHLCV frame) pairs, generating one block of companies at a time."""
+        for ticker in tickers or self.tickers:
+            yield ticker, self.prices(ticker)
+
+    def close_panel(self, tickers: list = None, benchmark: str = "^GSPC") -> pd.DataFrame:
+        """Daily closing prices (date x ticker) plus an equally weighted benchmark, like fetching.download_prices."""
+        tickers = tickers or self.tickers
+        panel = pd.DataFrame({ticker: self.prices(ticker)["Adj Close"] for ticker in tickers})
+        panel[benchmark] = np.exp(np.log(panel).diff().mean(axis=1).fillna(0).cumsum()) * 100
+        return panel
+
+    # EDGAR financial statement and notes data sets
+
+    def company_tickers(self) -> pd.DataFrame:
+        """The ticker to CIK mapping, like the SEC's company_tickers.json."""
+        return pd.DataFrame({"cik": self.ciks, "ticker": self.tickers, "title": [self._edgar_name(ticker) for ticker in self.tickers]})
+
+    def _edgar_name(self, ticker: str) -> str:
+        return f"SYNTHETIC CORP {ticker[3:]}"
+
+    def edgar_quarter(self, year: int, quarter: int):
+        """
+        The `sub` and `num` tables of the {year}q{quarter} EDGAR data set: every filing made in that calendar quarter.
+
+        Each company files a 10-Q for its first three fiscal quarters and a 10-K for the year, about 35 and 60
+        days after period end. A few percent of filings are amended later with a 10-K/A or 10-Q/A.
+
+        Returns:
+        tuple: The `sub` and `num` DataFrames with the columns of the SEC files.
+        """
+        start = pd.Timestamp(year=year, month=3 * quarter - 2, day=1)
+        end = start + pd.offsets.QuarterEnd(0)
+        subs, nums = [], []
+        for block in range((self.n_tickers + BLOCK_SIZE - 1) // BLOCK_SIZE):
+            sub, num = self._edgar_block(block, start, end)
+            subs.append(sub)
+            nums.append(num)
+        return pd.concat(subs, ignore_index=True), pd.concat(nums, ignore_index=True)
+
+    def _edgar_block(self, block: int, start: pd.Timestamp, end: pd.Timestamp):
+        drivers = self._drivers(block)
+        rng = np.random.default_rng([self.seed, 2, block])
+        first = block * BLOCK_SIZE
+        rows = np.arange(min(BLOCK_SIZE, self.n_tickers - first))
+        filing_lag = rng.integers(25, 45, BLOCK_SIZE)
+        amended = rng.random((BLOCK_SIZE, len(self.quarters))) < 0.03
+        subs, nums = [], []
+        for q, period_end in enumerate(self.quarters):
+            annual = period_end.month == 12
+            original = period_end + pd.to_timedelta(filing_lag + (25 if annual else 0), unit="D")
+            for filed_dates, is_amendment in ((original, False), (original + pd.Timedelta(days=120), True)):
+                in_quarter = (filed_dates >= start) & (filed_dates <= end)
+                selected = rows[in_quarter[rows] & (amended[rows, q] if is_amendment else True)]
+                if len(selected) == 0:
+                    continue
+                form = ("10-K" if annual else "10-Q") + ("/A" if is_amendment else "")
+                sub, num = self._edgar_filings(drivers, first, selected, q, period_end, filed_dates[selected], form)
+                subs.append(sub)
+                nums.append(num)
+        if not subs:
+            return pd.DataFrame(columns=_SUB_COLUMNS), pd.DataFrame(columns=_NUM_COLUMNS)
+        return pd.concat(subs, ignore_index=True), pd.concat(nums, ignore_index=True)
+
+    def _edgar_filings(self, drivers, first, rows, q, period_end, filed, form):
+        positions = first + rows
+        ciks = self.ciks[positions]
+        sequence = q * 2 + (1 if form.endswith("/A") else 0)
+        adsh = [f"{cik:010d}-{period_end.year % 100:02d}-{sequence:06d}" for cik in ciks]
+        fiscal_quarter = period_end.quarter
+        sub = pd.DataFrame({
+            "adsh": adsh,
+            "cik": ciks,
+            "name": [self._edgar_name(self.tickers[p]) for p in positions],
+            "sic": np.take(SIC_CODES, drivers["sector"][rows]),
+            "countryba": "US",
+            "stprba": "NY",
+            "cityba": "NEW YORK",
+            "zipba": "10001",
+            "bas1": "1 SYNTHETIC PLAZA",
+            "form": form,
+            "period": int(period_end.strftime("%Y%m%d")),
+            "fy": period_end.year,
+            "fp": "FY" if form.startswith("10-K") else f"Q{fiscal_quarter}",
+            "filed": filed.strftime("%Y%m%d").astype(int),
+            "prevrpt": 0,
+            "instance": [f"syn{p:05d}-{period_end.strftime('%Y%m%d')}.xml" for p in positions],
+        })
+
+        # current period, same period a year earlier and, for 10-K, the full fiscal year (qtrs=4)
+        facts = []
+        for tag, driver, kind in EDGAR_TAGS:
+            values = drivers[driver][rows]
+            uom = EDGAR_UNITS.get(driver, "USD")
+            if kind == "stock":
+                for lag in (0, 4):
+                    if q - lag >= 0:
+                        facts.append((tag, uom, period_end - pd.DateOffset(years=lag // 4), 0, values[:, q - lag]))
+                continue
+            for lag in (0, 4):
+                if q - lag >= 0:
+                    facts.append((tag, uom, period_end - pd.DateOffset(years=lag // 4), 1, values[:, q - lag]))
+            if form.startswith("10-K") and q >= 3:
+                year_values = values[:, q - 3:q + 1]
+                total = year_values.mean(axis=1) if driver in AVERAGE_DRIVERS else year_values.sum(axis=1)
+                if driver in ("eps", "eps_diluted"):
+                    total = drivers["net_income"][rows, q - 3:q + 1].sum(axis=1) / drivers["shares" if driver == "eps" else "shares_diluted"][rows, q - 3:q + 1].mean(axis=1)
+                facts.append((tag, uom, period_end, 4, total))
+        num = pd.concat([
+            pd.DataFrame({
+                "adsh": adsh, "tag": tag, "version": f"us-gaap/{period_end.year}", "ddate": int(ddate.strftime("%Y%m%d")),
+                "qtrs": qtrs, "uom": uom, "dimh": "0x00000000", "iprx": 0, "value": np.round(values, 4 if "/" in uom else 0),
+            })
+            for tag, uom, ddate, qtrs, values in facts
+        ], ignore_index=True)
+        return sub, num
+
+    # model datasets
+
+    def eps_dataset(self, tickers: list = None) -> pd.DataFrame:
+        """
+        Quarterly ratio features per company in the layout of RevenueForecast's data/nn_data.pkl, ending with
+        the 'EPS' and 'change in EPS' columns that preprocess_data turns into the target.
+        """
+        frames = []
+        for ticker in tickers or self.tickers:
+            d = self._ticker_drivers(ticker)
+            revenue, assets, equity = d["revenue"], d["total_assets"], d["equity"]
+            ttm_ebitda = pd.Series(d["operating_income"] + d["depreciation"]).rolling(4).sum().to_numpy()
+            features = {
+                "Account Receivable Turnover": revenue / d["receivables"],
+                "Current Ratio": d["current_assets"] / d["current_liabilities"],
+                "Quick Ratio": (d["current_assets"] - d["inventory"]) / d["current_liabilities"],
+                "Inventory Turnover": d["cost_of_revenue"] / d["inventory"],
+                "Total Debt To Equity": (d["short_term_debt"] + d["long_term_debt"]) / equity,
+                "EBITDA Margin": (d["operating_income"] + d["depreciation"]) / revenue,
+                "ROA": d["net_income"] / assets,
+                "ROE": d["net_income"] / equity,
+                "Gross Profit Margin": d["gross_profit"] / revenue,
+                "Inventory to Sales": d["inventory"] / revenue,
+                "LT Debt to Total Equity": d["long_term_debt"] / equity,
+                "Sales to Total Assets": revenue / assets,
+                "EBIT to revenue": d["operating_income"] / revenue,
+                "Profit margin": d["net_income"] / revenue,
+                "Sales to Cash": revenue / d["cash"],
+                "Sales to Working capital": revenue / (d["current_assets"] - d["current_liabilities"]),
+                "Working capital to total Asset": (d["current_assets"] - d["current_liabilities"]) / assets,
+                "Operating Income to Total Assets": d["operating_income"] / assets,
+                "Trailing 12M EBITDA Margin": ttm_ebitda / pd.Series(revenue).rolling(4).sum().to_numpy(),
+                "Div as % of CF": d["dividends"] / d["operating_cash_flow"],
+            }
+            frame = pd.DataFrame(features, index=pd.MultiIndex.from_product([[ticker], self.quarters], names=["ticker", "date"]))
+            for name in ("Total Assets", "Revenue", "Long Term Debt", "Current Ratio", "Gross Margin"):
+                source = {"Total Assets": assets, "Revenue": revenue, "Long Term Debt": d["long_term_debt"],
+                          "Current Ratio": features["Current Ratio"], "Gross Margin": features["Gross Profit Margin"]}[name]
+                frame[f"change in {name}"] = pd.Series(source).pct_change().to_numpy()
+            frame["EPS"] = d["eps"]
+            frame["change in EPS"] = pd.Series(d["eps"]).pct_change().to_numpy()
+            frames.append(frame)
+        data = pd.concat(frames)
+        # missing data, as in the real data set
+        rng = np.random.default_rng([self.seed, 3])
+        feature_columns = data.columns[:-2]
+        data[feature_columns] = data[feature_columns].mask(rng.random((len(data), len(feature_columns))) < 0.08)
+        return data
+
+    def monthly_dataset(self, tickers: list = None) -> pd.DataFrame:
+        """
+        Monthly prices and fundamentals per company in the layout of AnalysisFundamental's data/dataset.csv.
+        """
+        frames = []
+        for ticker in tickers or self.tickers:
+            d = self._ticker_drivers(ticker)
+            prices = self.prices(ticker)
+            monthly = prices.resample("ME").agg({"Open": "first", "Adj Close": "last"})
+            quarter_of_month = np.clip(np.searchsorted(self.quarters.to_numpy(), monthly.index.to_numpy(), side="right") - 2, 0, None)
+            ttm = pd.Series(d["net_income"]).rolling(4, min_periods=1).sum().to_numpy()[quarter_of_month]
+            eps = (d["net_income"] / d["shares_diluted"])[quarter_of_month]
+            market_cap = monthly["Adj Close"].to_numpy() * d["shares"][quarter_of_month]
+            frame = pd.DataFrame({
+                "ticker": ticker,
+                "date": monthly.index,
+                "adjOpen": monthly["Open"].to_numpy(),
+                "adjClose": monthly["Adj Close"].to_numpy(),
+                "price_rate_of_change_1M": monthly["Adj Close"].pct_change(1).to_numpy(),
+                "price_rate_of_change_3M": monthly["Adj Close"].pct_change(3).to_numpy(),
+                "epsDil": eps,
+                "return_on_assets": ttm / d["total_assets"][quarter_of_month],
+                "return_on_equity": ttm / d["equity"][quarter_of_month],
+                "price_to_earnings_ratio": market_cap / ttm,
+                "debt_to_equity_ratio": (d["short_term_debt"] + d["long_term_debt"])[quarter_of_month] / d["equity"][quarter_of_month],
+            })
+            frames.append(frame)
+        return pd.concat(frames, ignore_index=True)
+
+
+_SUB_COLUMNS = ["adsh", "cik", "name", "sic", "countryba", "stprba", "cityba", "zipba", "bas1", "form", "period", "fy", "fp",
+                "filed", "prevrpt", "instance"]
+_NUM_COLUMNS = ["adsh", "tag", "version", "ddate", "qtrs", "uom", "dimh", "iprx", "value"]
+
+
+class SyntheticProvider:
+    """
+    Provider serving a SyntheticMarket through the interface of GatherFundamental.fetching.YFinanceProvider.
+
+    Parameters:
+    market (SyntheticMarket): The synthetic universe to serve.
+    """
+
+    name = "synthetic"
+    host = "localhost"
+
+    def __init__(self, market: SyntheticMarket):
+        self.market = market
+
+    def fetch(self, ticker: str, statement: str):
+        if ticker not in self.market._positions:
+            raise KeyError(f"Unknown ticker: {ticker}")
+        if statement == "info":
+            return self.market.info(ticker)
+        return self.market.yfinance_statement(ticker, statement)
+
+
+def write_dataset(directory, market: SyntheticMarket, edgar: bool = True, prices: bool = True):
+    """
+    Write a synthetic universe to disk in the layouts the repository reads.
+
+    - {directory}/income_statement.csv, balance_sheet_statement.csv, cash_flow_statement.csv: one block of
+      (ticker, line item) rows per company, like financetoolkit's multi-ticker output,
+    - {directory}/prices/{ticker}.csv: daily OHLCV per company, like data/stock_data.csv,
+    - {directory}/edgar/{year}_{quarter}/source/sub.tsv and num.tsv, like the EDGAR download in edgar.py,
+    - {directory}/nn_data.pkl and {directory}/dataset.csv: the model datasets.
+
+    Parameters:
+    directory (str or Path): Output directory.
+    market (SyntheticMarket): The synthetic universe to write.
+    edgar (bool): Whether to write the EDGAR data sets.
+    prices (bool): Whether to write daily prices.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in ("income_statement", "balance_sheet_statement", "cash_flow_statement"):
+        statements = {ticker: getattr(market, name)(ticker) for ticker in market.tickers}
+        pd.concat(statements).to_csv(directory / f"{name}.csv")
+    if prices:
+        (directory / "prices").mkdir(exist_ok=True)
+        for ticker, frame in market.iter_prices():
+            frame.to_csv(directory / "prices" / f"{ticker}.csv")
+    if edgar:
+        for year in market.years:
+            for quarter in range(1, 5):
+                path = directory / "edgar" / f"{year}_{quarter}" / "source"
+                path.mkdir(parents=True, exist_ok=True)
+                sub, num = market.edgar_quarter(year, quarter)
+                sub.to_csv(path / "sub.tsv", sep="\t", index=False)
+                num.to_csv(path / "num.tsv", sep="\t", index=False)
+    market.eps_dataset().to_pickle(directory / "nn_data.pkl")
+    market.monthly_dataset().to_csv(directory / "dataset.csv", index=False)
@@ -1,8 +1,11 @@
-import yfinance as yf
 import matplotlib.pyplot as plt
 import datetime as dt
 import os
+import sys
 from pathlib import Path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))) # add parent dir - for GatherPrices
+
+from GatherPrices.panel import load_panel
 
 def plot_returns_from_ticker(ticker):
     n_years_lookback = 10
@@ -10,8 +13,8 @@ def plot_returns_from_ticker(ticker):
     end = dt.date.today()
 
 
-    # Read data 
-    df = yf.download(ticker,start,end)
+    # Read data from the local memory-mapped price panel
+    df = load_panel([ticker], start, end).bars(ticker, start, end)
 
     # View Columns
     df.head()
@@ -1,5 +1,8 @@
 # workflows.py
+import functools
 import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))) # add parent dir - for GatherFundamental
 from financetoolkit import Toolkit
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -8,6 +11,8 @@ from sklearn.metrics import confusion_matrix, ConfusionMatrixDisplay
 
 from data_processing import load_data, preprocess_data, split_data, prepare_financial_data
 from models import train_model, evaluate_model, preprocess_training_data, train_linear_regression, evaluate_regression_model
+from GatherFundamental.cache import StatementCache
+from AnalysisFundamental.registry import ModelRegistry
 
 
 logger = get_logger(__name__)
@@ -36,6 +41,11 @@ class Workflows:
         accuracy, y_pred = evaluate_model(model, X_test, y_test)
         logger.info(f'Accuracy: {accuracy:.2f}')
 
+        # Save the model with its scaler, to score new data without retraining
+        version = ModelRegistry(self.config.get('registry_path')).save('eps_direction_mlp', model, list(data.columns[:-1]), scaler=sc, metadata={
+            'model_params': self.config['classification']['model_params'], 'accuracy': accuracy})
+        logger.info(f'Saved eps_direction_mlp version {version}')
+
         # Plot results as confusion matrix
         cm = confusion_matrix(y_test, y_pred)
         disp = ConfusionMatrixDisplay(confusion_matrix=cm)
@@ -80,10 +90,17 @@ class Workflows:
     def run_revenue_prediction(self):
         logger.info('Running revenue prediction workflow')
 
-        # Fetch financial data using finance_toolkit
-        companies = Toolkit(["AAPL", "MSFT"], api_key=os.getenv('FINANCIAL_MODELING_PREP_API_KEY'), start_date="2017-12-31")
-
-        income_statement = companies.get_income_statement()
+        # Fetch financial data using finance_toolkit, served per ticker from the statement cache while it is fresh
+        tickers = ["AAPL", "MSFT"]
+        companies = Toolkit(tickers, api_key=os.getenv('FINANCIAL_MODELING_PREP_API_KEY'), start_date="2017-12-31")
+
+        # one request for all tickers, made only if one of them is missing from the cache
+        fetch_all = functools.lru_cache(maxsize=None)(companies.get_income_statement)
+        cache = StatementCache()
+        income_statement = pd.concat({
+            ticker: cache.get_or_fetch('fmp', ticker, 'income_statement', lambda ticker=ticker: fetch_all().loc[ticker])
+            for ticker in tickers
+        })
         
 
         # Prepare the data for revenue prediction
@@ -98,6 +115,8 @@ class Workflows:
         model_lr = train_linear_regression(X_train, y_train)
         mse, y_pred_lr = evaluate_regression_model(model_lr, X_test, y_test)
         logger.info(f'Linear Regression MSE: {mse:.2f}')
+        version = ModelRegistry(self.config.get('registry_path')).save('revenue_linear_regression', model_lr, list(X.columns), scaler=sc, metadata={'mse': mse})
+        logger.info(f'Saved revenue_linear_regression version {version}')
 
         # Plot results
         plt.scatter(y_test, y_pred_lr)
@@ -3,13 +3,17 @@ In order to optimally allocate money to each asset, one must maximize return (in
 
 This project maximizes the Sharpe ratio using the riskfolio module.
 """
-import yfinance as yf
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))) # add parent dir - for GatherPrices
 import riskfolio as rf
 import pandas as pd
 import warnings
 import seaborn as sns
 import matplotlib.pyplot as plt
 
+from GatherPrices.panel import load_panel
+
 
 pd.options.display.float_format = "{:.4%}".format
 warnings.filterwarnings("ignore")
@@ -44,27 +48,12 @@ factors = ["MTUM", "QUAL", "VLUE", "SIZE", "USMV"]
 start = "2020-01-01"
 end = "2024-07-31"
 
-port_returns = (
-    yf
-    .download(
-        berkshire_tickers, 
-        start=start, 
-        end=end
-    )["Adj Close"]
-    .pct_change()
-    .dropna()
-)
-
-factor_returns = (
-    yf
-    .download(
-        factors, 
-        start=start, 
-        end=end
-    )["Adj Close"]
-    .pct_change()
-    .dropna()
-)
+# prices come from the local memory-mapped panel, downloading only what it is missing
+# (end is exclusive, like yf.download)
+panel = load_panel(berkshire_tickers + factors, start=start, end=end)
+last = pd.Timestamp(end) - pd.Timedelta(days=1)
+port_returns = panel.returns("Adj Close", berkshire_tickers, start, last).dropna()
+factor_returns = panel.returns("Adj Close", factors, start, last).dropna()
 
 port = rf.Portfolio(returns=port_returns)
 
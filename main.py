@@ -3,7 +3,9 @@ from dotenv import load_dotenv
 import pandas as pd
 
 from financetoolkit import Toolkit
-import yfinance as yf
+
+from GatherFundamental.cache import StatementCache
+from GatherPrices.store import PriceStore
 
 load_dotenv()
 
@@ -15,27 +17,31 @@ def main():
     ticker = 'AAPL'
     start_date = '2021-01-01'
     end_date = '2021-12-31'
+    price_store = PriceStore()
     if LOAD_NEW_DATA:
-        # Load stock data from yfinance
-        stock_data = yf.download(ticker, start=start_date, end=end_date)
+        # Download the bars after the last stored one from yfinance
+        price_store.update([ticker], start=start_date, end=end_date)
+        stock_data = price_store.read(ticker, start_date, end_date)
         print(stock_data.head())
 
         # Load financial statement data from financetoolkit
         companies = Toolkit([ticker], api_key=os.getenv('FINANCIAL_MODELING_PREP_API_KEY'), start_date=start_date)
         
-        # Obtain different financial statements
-        income_statement = companies.get_income_statement()
-        balance_sheet_statement = companies.get_balance_sheet_statement()
-        cash_flow_statement = companies.get_cash_flow_statement()
+        # Obtain different financial statements, served from the statement cache while they are fresh
+        cache = StatementCache()
+        income_statement = cache.get_or_fetch('fmp', ticker, 'income_statement', companies.get_income_statement)
+        balance_sheet_statement = cache.get_or_fetch('fmp', ticker, 'balance_sheet_statement', companies.get_balance_sheet_statement)
+        cash_flow_statement = cache.get_or_fetch('fmp', ticker, 'cash_flow_statement', companies.get_cash_flow_statement)
         
         # Save to CSV
-        stock_data.to_csv('data/stock_data.csv')
         income_statement.to_csv('data/income_statement.csv')
         balance_sheet_statement.to_csv('data/balance_sheet_statement.csv')
         cash_flow_statement.to_csv('data/cash_flow_statement.csv')
     else:
-        # Load stock data from CSV
-        stock_data = pd.read_csv('data/stock_data.csv', index_col=0)
+        # Load stock data from the price store, seeded from the CSV on a fresh checkout
+        if not price_store.years(ticker):
+            price_store.append(ticker, pd.read_csv('data/stock_data.csv', index_col='Date', parse_dates=True))
+        stock_data = price_store.read(ticker, start_date, end_date)
 
         # Load financial statement data from CSV
         income_statement = pd.read_csv('data/income_statement.csv', index_col=0)
@@ -0,0 +1,28 @@
+import pandas as pd
+import pytest
+
+from GatherFundamental.cache import StatementCache
+
+
+@pytest.mark.parametrize("columns", [
+    pd.period_range("2019", periods=3, freq="Y"),
+    pd.period_range("2019Q1", periods=3, freq="Q"),
+    pd.to_datetime(["2021-09-30", "2022-09-30", "2023-09-30"]),
+])
+def test_statement_round_trips_its_period_columns(tmp_path, columns):
+    cache = StatementCache(tmp_path)
+    statement = pd.DataFrame([[1.0, 2.0, 3.0], [4.0, None, 6.0]], index=["Revenue", "Net Income"], columns=columns)
+
+    fetched = cache.get_or_fetch("fmp", "AAPL", "income_statement", lambda: statement)
+    cached = cache.get_or_fetch("fmp", "AAPL", "income_statement", lambda: pytest.fail("fetched again"))
+
+    assert cache.stats["hits"] == 1
+    pd.testing.assert_frame_equal(cached, fetched)
+    assert cached.columns.dtype == statement.columns.dtype
+
+
+def test_info_round_trips_as_a_dict(tmp_path):
+    cache = StatementCache(tmp_path)
+    cache.put("yfinance", "AAPL", "info", {"marketCap": 3e12, "sector": "Technology", "officers": []})
+
+    assert cache.get("yfinance", "AAPL", "info") == {"marketCap": 3e12, "sector": "Technology"}
@@ -0,0 +1,142 @@
+import io
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from GatherAlternative.edgar_ingest import download_archive, ingest_quarter
+
+
+class ArchiveServer:
+    """Local stand-in for the SEC file server, honouring Range requests and recording every request."""
+
+    def __init__(self):
+        self.files = {}
+        self.requests = []
+        # number of responses to cut off after half of their body
+        self.truncate = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.requests.append((self.path, self.headers.get("Range")))
+                body = server.files.get(self.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                start = 0
+                if self.headers.get("Range"):
+                    start = int(self.headers["Range"].split("=")[1].rstrip("-"))
+                    if start >= len(body):
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(body)}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+                else:
+                    self.send_response(200)
+                payload = body[start:]
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                if server.truncate:
+                    server.truncate -= 1
+                    self.wfile.write(payload[:len(payload) // 2])
+                    self.close_connection = True
+                    return
+                self.wfile.write(payload)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    with ArchiveServer() as server:
+        yield server
+
+
+def _zip(members: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def test_resumes_partial_download_with_range(server, tmp_path):
+    body = bytes(range(256)) * 1000
+    server.files["/file.zip"] = body
+    destination = tmp_path / "file.zip"
+    (tmp_path / "file.zip.part").write_bytes(body[:100000])
+
+    download_archive(server.url + "file.zip", destination, chunk_size=4096)
+
+    assert server.requests == [("/file.zip", "bytes=100000-")]
+    assert destination.read_bytes() == body
+    assert not (tmp_path / "file.zip.part").exists()
+
+
+def test_retries_interrupted_download_from_where_it_stopped(server, tmp_path):
+    body = bytes(range(256)) * 1000
+    server.files["/file.zip"] = body
+    server.truncate = 1
+
+    download_archive(server.url + "file.zip", tmp_path / "file.zip", chunk_size=4096, backoff=0)
+
+    assert len(server.requests) == 2
+    assert server.requests[0] == ("/file.zip", None)
+    resumed_from = int(server.requests[1][1].split("=")[1].rstrip("-"))
+    assert 0 < resumed_from < len(body)
+    assert (tmp_path / "file.zip").read_bytes() == body
+
+
+def test_complete_partial_file_answered_with_416(server, tmp_path):
+    body = b"complete archive"
+    server.files["/file.zip"] = body
+    (tmp_path / "file.zip.part").write_bytes(body)
+
+    download_archive(server.url + "file.zip", tmp_path / "file.zip")
+
+    assert server.requests == [("/file.zip", f"bytes={len(body)}-")]
+    assert (tmp_path / "file.zip").read_bytes() == body
+
+
+def test_missing_archive_is_not_retried(server, tmp_path):
+    with pytest.raises(Exception):
+        download_archive(server.url + "missing.zip", tmp_path / "missing.zip", backoff=0)
+    assert len(server.requests) == 1
+
+
+def test_rerun_skips_completed_work(server, tmp_path):
+    server.files["/2020q1_notes.zip"] = _zip({"sub.tsv": "adsh\tcik\n1\t2\n", "num.tsv": "adsh\ttag\n1\tRevenues\n"})
+
+    extracted = ingest_quarter(2020, 1, tmp_path, base_url=server.url)
+    assert sorted(path.name for path in extracted) == ["num.tsv", "sub.tsv"]
+    assert (tmp_path / "2020_1" / "ingested").exists()
+    assert not (tmp_path / "archives" / "2020q1_notes.zip").exists()
+    assert len(server.requests) == 1
+
+    # the marker skips the quarter, even after its extracted files were converted and removed
+    (tmp_path / "2020_1" / "source" / "num.tsv").unlink()
+    assert ingest_quarter(2020, 1, tmp_path, base_url=server.url) == extracted
+    assert len(server.requests) == 1
+
+    # a downloaded archive is not requested again
+    kept = download_archive(server.url + "2020q1_notes.zip", tmp_path / "kept.zip")
+    download_archive(server.url + "2020q1_notes.zip", kept)
+    assert len(server.requests) == 2
@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from GatherFundamental import fetching
+from GatherFundamental.fetching import HostRateLimiter, fetch_universe
+
+
+class FakeProvider:
+    """Local stand-in for a statements provider: fails some requests a number of times, records every call."""
+
+    name = "fake"
+    host = "fake.local"
+
+    def __init__(self, failures: dict = None):
+        # (ticker, statement) -> number of failures before succeeding, -1 to always fail
+        self.failures = dict(failures or {})
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def fetch(self, ticker, statement):
+        with self._lock:
+            self.calls.append((time.monotonic(), ticker, statement))
+            remaining = self.failures.get((ticker, statement), 0)
+            if remaining:
+                self.failures[(ticker, statement)] = remaining - 1
+                raise ConnectionError(f"{ticker} {statement} unavailable")
+        if statement == "info":
+            return {"symbol": ticker}
+        return pd.DataFrame({"2023": [1.0]}, index=[ticker])
+
+    def attempts(self, ticker, statement):
+        return sum(1 for _, t, s in self.calls if (t, s) == (ticker, statement))
+
+
+def test_retries_with_exponential_backoff(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(fetching.random, "random", lambda: 0.0)
+    monkeypatch.setattr(fetching.time, "sleep", sleeps.append)
+    provider = FakeProvider({("AAPL", "financials"): 2})
+
+    raw_data, errors = fetch_universe(["AAPL"], provider, ["financials"], retries=3, backoff=0.5)
+
+    assert errors == {}
+    assert provider.attempts("AAPL", "financials") == 3
+    assert sleeps == [0.5, 1.0]
+    assert list(raw_data["AAPL"]["financials"].index) == ["AAPL"]
+
+
+def test_gives_up_after_retries(monkeypatch):
+    monkeypatch.setattr(fetching.time, "sleep", lambda seconds: None)
+    provider = FakeProvider({("AAPL", "info"): -1})
+
+    raw_data, errors = fetch_universe(["AAPL"], provider, ["info"], retries=2)
+
+    assert provider.attempts("AAPL", "info") == 3
+    assert isinstance(errors[("AAPL", "info")], ConnectionError)
+    assert raw_data["AAPL"]["info"] == {}
+
+
+def test_failing_ticker_does_not_affect_others(monkeypatch):
+    monkeypatch.setattr(fetching.time, "sleep", lambda seconds: None)
+    tickers = ["AAPL", "MSFT", "BAD", "GOOG"]
+    statements = ["financials", "info"]
+    provider = FakeProvider({("BAD", statement): -1 for statement in statements})
+
+    raw_data, errors = fetch_universe(tickers, provider, statements, max_workers=4, retries=1)
+
+    assert set(errors) == {("BAD", "financials"), ("BAD", "info")}
+    assert raw_data["BAD"]["financials"].empty and raw_data["BAD"]["info"] == {}
+    for ticker in ["AAPL", "MSFT", "GOOG"]:
+        assert list(raw_data[ticker]["financials"].index) == [ticker]
+        assert raw_data[ticker]["info"] == {"symbol": ticker}
+        assert provider.attempts(ticker, "financials") == 1
+
+
+def test_per_host_rate_limit_holds_across_workers():
+    rate = 50.0
+    provider = FakeProvider()
+    tickers = [f"T{i}" for i in range(12)]
+
+    fetch_universe(tickers, provider, ["financials"], max_workers=8, requests_per_second=rate)
+
+    times = sorted(call[0] for call in provider.calls)
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    assert len(times) == len(tickers)
+    # small tolerance for the clock granularity of sleep
+    assert min(gaps) >= 1 / rate * 0.9
+    assert times[-1] - times[0] >= (len(tickers) - 1) / rate * 0.9
+
+
+def test_rate_limiter_spaces_hosts_independently():
+    limiter = HostRateLimiter(requests_per_second=10)
+    started = time.monotonic()
+    for host in ["a.local", "b.local", "c.local"]:
+        limiter.acquire(host)
+    assert time.monotonic() - started < 0.05
+
+    limiter.acquire("a.local")
+    assert time.monotonic() - started >= 0.1 * 0.9
+
+
+@pytest.mark.parametrize("requests_per_second", [None, 0])
+def test_rate_limiter_disabled(requests_per_second):
+    limiter = HostRateLimiter(requests_per_second)
+    started = time.monotonic()
+    for _ in range(100):
+        limiter.acquire("a.local")
+    assert time.monotonic() - started < 0.05